@@ -0,0 +1,146 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from pymongo import DESCENDING
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from db import get_db
+from spelling import strip_accents
+
+# Caché de respuestas de /query: LRU en memoria delante de la colección respuestas_cache
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", "1024"))
+# Similitud TF-IDF mínima para reutilizar la respuesta de una pregunta casi igual; 0 la desactiva
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("ANSWER_CACHE_SIMILARITY", "0"))
+# Preguntas guardadas de un documento que se comparan como máximo al buscar una casi igual
+ANSWER_CACHE_CANDIDATES = int(os.environ.get("ANSWER_CACHE_CANDIDATES", "200"))
+
+STOPWORDS = {
+    "a", "al", "como", "con", "cual", "cuales", "cuantos", "cuantas", "de", "del", "dime", "el", "en", "es",
+    "esta", "este", "fue", "la", "las", "lo", "los", "me", "mi", "por", "para", "que", "quien", "quienes",
+    "se", "ser", "son", "su", "sus", "tesis", "un", "una", "unos", "unas", "y", "o"
+}
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize_question(pregunta):
+    """Forma canónica de una pregunta: sin tildes, mayúsculas, signos ni palabras vacías.
+
+    Los plurales simples se reducen al singular, así "¿Cuáles son los jurados?" y
+    "quienes son el jurado" comparten la misma clave ("jurado").
+    """
+    words = []
+    for word in _WORD.findall(strip_accents(pregunta.lower())):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("es"):
+            word = word[:-2]
+        elif len(word) > 3 and word.endswith("s"):
+            word = word[:-1]
+        words.append(word)
+    return " ".join(words)
+
+
+def _numbers(normalized):
+    return sorted(word for word in normalized.split() if word.isdigit())
+
+
+class AnswerCache:
+    """Respuestas por (hash del documento, versión del análisis, pregunta normalizada).
+
+    La versión es el id de la consulta guardada, así que al reprocesar un documento las
+    entradas anteriores dejan de coincidir en todos los procesos; ``invalidate`` además
+    las borra. Los errores de MongoDB se tratan como fallos de caché.
+    """
+
+    def __init__(self, size=ANSWER_CACHE_SIZE, similarity=ANSWER_CACHE_SIMILARITY):
+        self.size = size
+        self.similarity = similarity
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _remember(self, key, entry):
+        with self.lock:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            if len(self.memory) > self.size:
+                self.memory.popitem(last=False)
+
+    def get(self, pdf_hash, version, pregunta):
+        """Respuesta guardada como {"respuesta", "source", "tier"}, o None."""
+        normalized = normalize_question(pregunta)
+        if not normalized:
+            # Solo palabras vacías: no hay nada que identifique la pregunta
+            return None
+        key = (pdf_hash, version, normalized)
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                return {**entry, "tier": "memory"}
+        try:
+            collection = get_db()["respuestas_cache"]
+            doc = collection.find_one({"pdf_hash": pdf_hash, "version": version, "key": normalized})
+            tier = "mongo"
+            if doc is None and self.similarity > 0:
+                doc = self._similar(collection, pdf_hash, version, normalized)
+                tier = "similar"
+        except Exception as e:
+            print(f"Error leyendo la caché de respuestas: {e}")
+            return None
+        if doc is None:
+            return None
+        entry = {"respuesta": doc["respuesta"], "source": doc.get("source")}
+        self._remember(key, entry)
+        return {**entry, "tier": tier}
+
+    def _similar(self, collection, pdf_hash, version, normalized):
+        """Pregunta guardada más parecida (TF-IDF por palabras) si supera el umbral."""
+        candidates = list(collection.find({"pdf_hash": pdf_hash, "version": version},
+                                          {"key": 1, "respuesta": 1, "source": 1})
+                          .sort("timestamp", DESCENDING).limit(ANSWER_CACHE_CANDIDATES))
+        if not candidates:
+            return None
+        # Solo preguntas con los mismos números: "jurado 1" y "jurado 2" no son casi iguales
+        numbers = _numbers(normalized)
+        candidates = [doc for doc in candidates if _numbers(doc["key"]) == numbers]
+        if not candidates:
+            return None
+        # Tokens de un carácter incluidos (el patrón por defecto descarta dígitos sueltos)
+        vectorizer = TfidfVectorizer(token_pattern=r"(?u)\b\w+\b")
+        try:
+            matrix = vectorizer.fit_transform([doc["key"] for doc in candidates] + [normalized])
+        except ValueError:
+            return None
+        scores = (matrix[:-1] @ matrix[-1].T).toarray().ravel()
+        best = scores.argmax()
+        return candidates[best] if scores[best] >= self.similarity else None
+
+    def put(self, pdf_hash, version, pregunta, respuesta, source=None):
+        normalized = normalize_question(pregunta)
+        if not normalized:
+            return
+        self._remember((pdf_hash, version, normalized), {"respuesta": respuesta, "source": source})
+        try:
+            get_db()["respuestas_cache"].update_one(
+                {"pdf_hash": pdf_hash, "version": version, "key": normalized},
+                {"$set": {"pregunta": pregunta, "respuesta": respuesta, "source": source,
+                          "timestamp": datetime.now()}},
+                upsert=True)
+        except Exception as e:
+            print(f"Error guardando en la caché de respuestas: {e}")
+
+    def invalidate(self, pdf_hash):
+        """Descartar todas las respuestas de un documento (al reprocesarlo)."""
+        with self.lock:
+            for key in [key for key in self.memory if key[0] == pdf_hash]:
+                del self.memory[key]
+        try:
+            get_db()["respuestas_cache"].delete_many({"pdf_hash": pdf_hash})
+        except Exception as e:
+            print(f"Error invalidando la caché de respuestas: {e}")
+
+
+answer_cache = AnswerCache()
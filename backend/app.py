@@ -1,36 +1,206 @@
-from flask import Flask, request, jsonify, send_file
+import models  # primero, para medir el tiempo de arranque completo
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
 from pdf_processor import process_pdf, process_query
-from db import save_consulta, save_pregunta
+from db import ensure_indexes, latest_consulta, save_archivo, save_consulta, save_pregunta
+from artifacts import hash_file, load_artifacts
+from jobs import QueueFullError, job_queue
+from ingest import extract_zip, fatal_errors, ingest, reanalyze_corpus
+from export import export_filter, iter_consultas, iter_csv, iter_xlsx, parse_date
+from search_index import SEARCH_COLUMNS, search
+from upload_store import UPLOAD_FOLDER, hash_lock, store_stream
+from metrics import PROFILE_REQUESTS, DocumentMetrics, profiled, registry
 import os
 import pandas as pd
 import io
+import zipfile
+from datetime import datetime
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "http://localhost:3000"}})
 
-UPLOAD_FOLDER = "uploads"
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+try:
+    ensure_indexes()
+except Exception:
+    print("Continuando sin crear índices; se reintentará en el próximo arranque")
+
+# Precargar modelos antes del fork de los workers (gunicorn.conf.py activa PRELOAD_MODELS)
+if os.environ.get("PRELOAD_MODELS") == "1":
+    models.preload()
+startup = models.report()
+print(f"Backend iniciado en {startup['uptime_seconds']:.1f}s, RSS {startup['rss_mb']:.0f} MB, "
+      f"modelos cargados: {startup['models_loaded'] or 'ninguno (carga diferida)'}")
+
 
 @app.route("/upload", methods=["POST"])
 def upload_pdf():
-    if "file" not in request.files:
-        return jsonify({"error": "No file provided"}), 400
-    file = request.files["file"]
-    if file.filename == "":
+    """Subir un PDF (campo ``file``, o el cuerpo crudo con Content-Type application/pdf y ``?filename=``).
+
+    El archivo se guarda por contenido mientras se calcula su hash; si ese contenido ya se
+    analizó, se devuelve el análisis existente sin volver a procesarlo.
+    """
+    if request.mimetype == "application/pdf":
+        # Cuerpo crudo: se lee directo del socket, sin el archivo temporal del multipart
+        stream = request.stream
+        filename = request.args.get("filename", "")
+    else:
+        if "file" not in request.files:
+            return jsonify({"error": "No file provided"}), 400
+        file = request.files["file"]
+        stream = file.stream
+        filename = file.filename
+    pdf_name = os.path.basename(filename or "")
+    if pdf_name == "":
         return jsonify({"error": "No file selected"}), 400
-    if file and file.filename.endswith(".pdf"):
-        pdf_path = os.path.join(UPLOAD_FOLDER, file.filename)
-        file.save(pdf_path)
+    if not pdf_name.lower().endswith(".pdf"):
+        return jsonify({"error": "Invalid file format"}), 400
+    try:
+        pdf_hash, pdf_path, size = store_stream(stream, UPLOAD_FOLDER)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    profile = PROFILE_REQUESTS or request.args.get("profile") == "1"
+    try:
+        save_archivo(pdf_name, pdf_hash, size)
+        existing = stored_analysis(pdf_hash, pdf_name)
+        if existing:
+            return jsonify(existing)
+        # Modo trabajo: encolar el análisis y responder de inmediato con el id del trabajo
+        if request.args.get("async") == "1":
+            try:
+                job_id = job_queue.submit(analyze_pdf, pdf_path, pdf_name, profile=profile, pdf_hash=pdf_hash)
+            except QueueFullError as e:
+                return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+            return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
+        return jsonify(analyze_pdf(pdf_path, pdf_name, profile=profile, pdf_hash=pdf_hash))
+    except Exception as e:
+        return jsonify({"error": f"Error procesando el PDF: {str(e)}"}), 500
+
+
+def stored_analysis(pdf_hash, pdf_name):
+    """Respuesta con el análisis guardado de este contenido, o None si no hay uno sin errores fatales."""
+    consulta = latest_consulta(pdf_hash=pdf_hash)
+    if not consulta or fatal_errors((consulta.get("metrics") or {}).get("errors")):
+        return None
+    return {"results": consulta["results"], "observations": consulta["observations"], "pdf_name": pdf_name,
+            "pdf_hash": pdf_hash, "metrics": consulta.get("metrics"), "duplicate": True}
+
+
+def analyze_pdf(pdf_path, pdf_name, progress=None, profile=False, pdf_hash=None):
+    """Procesar un PDF subido y guardar la consulta en MongoDB con el desglose de tiempos.
+
+    Un análisis anterior del mismo contenido que falló se vuelve a hacer y se reemplaza por uno nuevo.
+    """
+    metrics = DocumentMetrics("process_pdf")
+    if pdf_hash is None:
+        with metrics.span("hash"):
+            pdf_hash = hash_file(pdf_path)
+    with hash_lock(pdf_hash):
+        # Otra subida del mismo contenido pudo terminar mientras se esperaba el lock
+        existing = stored_analysis(pdf_hash, pdf_name)
+        if existing:
+            return existing
+        failed = latest_consulta(pdf_hash=pdf_hash)
+        with profiled(f"upload-{pdf_name}", enabled=profile) as profile_info:
+            results, observations = process_pdf(pdf_path, pdf_hash, progress=progress, metrics=metrics)
+            breakdown = metrics.to_dict()
+            breakdown["profile"] = profile_info["path"]
+            with metrics.span("mongo_write"):
+                save_consulta(pdf_name, results, observations, "user_id_placeholder", pdf_hash, metrics=breakdown,
+                              replaces=failed["_id"] if failed else None)
+    metrics.finish()
+    return {"results": results, "observations": observations, "pdf_name": pdf_name, "metrics": breakdown}
+
+
+@app.route("/upload_batch", methods=["POST"])
+def upload_batch():
+    """Ingesta de varios PDFs (campo ``files``, se admiten zips) como trabajo en segundo plano.
+
+    Cada PDF se guarda por contenido y el lote se encola; la respuesta trae el id del trabajo.
+    """
+    files = request.files.getlist("files")
+    if not files:
+        return jsonify({"error": "No files provided"}), 400
+    names = {}
+    for file in files:
+        name = os.path.basename(file.filename or "")
+        try:
+            if name.lower().endswith(".pdf"):
+                stored = [(name, *store_stream(file.stream, UPLOAD_FOLDER))]
+            elif name.lower().endswith(".zip"):
+                stored = extract_zip(file.stream, UPLOAD_FOLDER)
+            else:
+                continue
+        except zipfile.BadZipFile:
+            return jsonify({"error": f"Zip inválido: {name}"}), 400
+        except ValueError as e:
+            return jsonify({"error": f"{name}: {str(e)}"}), 400
+        for pdf_name, pdf_hash, pdf_path, size in stored:
+            save_archivo(pdf_name, pdf_hash, size)
+            names[pdf_path] = pdf_name
+    if not names:
+        return jsonify({"error": "No se encontraron PDFs"}), 400
+    try:
+        job_id = job_queue.submit(ingest, list(names), user_id="user_id_placeholder", names=names)
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+    return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
+
+
+@app.route("/reanalyze", methods=["POST"])
+def reanalyze_pdfs():
+    """Reanalizar documentos ya procesados (``pdf_names``, o todos) recalculando solo las etapas que cambiaron.
+
+    Sin ``pdf_names`` (todo el corpus) se encola como trabajo salvo con ``?async=0``; con
+    nombres se hace dentro de la petición salvo con ``?async=1``.
+    """
+    data = request.get_json(silent=True) or {}
+    pdf_names = data.get("pdf_names")
+    if request.args.get("async", "0" if pdf_names else "1") == "1":
         try:
-            results, observations = process_pdf(pdf_path)
-            save_consulta(file.filename, results, observations, "user_id_placeholder")
-            return jsonify({"results": results, "observations": observations, "pdf_name": file.filename})
-        except Exception as e:
-            return jsonify({"error": f"Error procesando el PDF: {str(e)}"}), 500
-    return jsonify({"error": "Invalid file format"}), 400
+            job_id = job_queue.submit(reanalyze_corpus, pdf_names, user_id="user_id_placeholder",
+                                      upload_folder=UPLOAD_FOLDER)
+        except QueueFullError as e:
+            return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+        return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
+    try:
+        return jsonify(reanalyze_corpus(pdf_names, user_id="user_id_placeholder", upload_folder=UPLOAD_FOLDER))
+    except Exception as e:
+        return jsonify({"error": f"Error reanalizando: {str(e)}"}), 500
+
+
+@app.route("/status", methods=["GET"])
+def status():
+    return jsonify(models.report())
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Métricas del proceso en formato de texto de Prometheus."""
+    process = models.report()
+    gauges = {
+        "analyzer_process_resident_memory_bytes": (process["rss_mb"] * 1024 * 1024, "Memoria residente del proceso"),
+        "analyzer_process_uptime_seconds": (process["uptime_seconds"], "Segundos desde el arranque del proceso"),
+        "analyzer_models_loaded": (len(process["models_loaded"]), "Modelos cargados en memoria")
+    }
+    if process["pss_mb"] is not None:
+        gauges["analyzer_process_pss_bytes"] = (process["pss_mb"] * 1024 * 1024,
+                                                "Memoria proporcional (PSS): las páginas compartidas se reparten entre procesos")
+        gauges["analyzer_process_uss_bytes"] = (process["uss_mb"] * 1024 * 1024, "Memoria exclusiva del proceso (USS)")
+    jobs = job_queue.counts()
+    for state in ("queued", "running", "done", "failed"):
+        gauges[f"analyzer_jobs_{state}"] = (jobs.get(state, 0), f"Trabajos en estado {state}")
+    return Response(registry.render(gauges), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Trabajo no encontrado"}), 404
+    return jsonify(job)
 
 
 @app.route("/query", methods=["POST"])
@@ -41,8 +211,12 @@ def query_pdf():
         pregunta = data.get("pregunta")
         if not pdf_name or not pregunta:
             return jsonify({"error": "Faltan pdf_name o pregunta"}), 400
-        respuesta = process_query(pdf_name, pregunta)
-        save_pregunta(pdf_name, pregunta, respuesta, "user_id_placeholder")
+        metrics = DocumentMetrics("process_query")
+        with profiled(f"query-{pdf_name}", enabled=PROFILE_REQUESTS or request.args.get("profile") == "1"):
+            respuesta = process_query(pdf_name, pregunta, metrics=metrics)
+            with metrics.span("mongo_write"):
+                save_pregunta(pdf_name, pregunta, respuesta, "user_id_placeholder")
+        metrics.finish()
         return jsonify({"respuesta": respuesta})
     except Exception as e:
         return jsonify({"error": f"Error procesando la pregunta: {str(e)}"}), 500
@@ -51,8 +225,7 @@ def query_pdf():
 @app.route("/download_excel/<pdf_name>", methods=["GET"])
 def download_excel(pdf_name):
     try:
-        db = get_db()
-        consulta = db["consultas"].find_one({"pdf_name": pdf_name})
+        consulta = latest_consulta(pdf_name)
         if not consulta:
             return jsonify({"error": "Consulta no encontrada"}), 404
         results = consulta["results"]
@@ -64,12 +237,68 @@ def download_excel(pdf_name):
         output = io.BytesIO()
         with pd.ExcelWriter(output, engine='openpyxl') as writer:
             df.to_excel(writer, index=False, sheet_name='Resultados')
+            # Texto extraído por página desde el almacén de artefactos
+            artifacts = load_artifacts(consulta["pdf_hash"]) if consulta.get("pdf_hash") else None
+            if artifacts:
+                pd.DataFrame([{
+                    "Página": page["page"],
+                    "Texto": page["text"],
+                    "OCR": "\n".join(img["ocr"] for img in page["images"] if "ocr" in img)
+                } for page in artifacts["pages"]]).to_excel(writer, index=False, sheet_name='Texto')
         output.seek(0)
         return send_file(output, download_name=f'resultados_{pdf_name}.xlsx', as_attachment=True)
     except Exception as e:
         return jsonify({"error": f"Error generando Excel: {str(e)}"}), 500
 
 
+@app.route("/export", methods=["GET"])
+def export_consultas():
+    """Exportar muchas consultas a la vez (xlsx o csv), filtradas por fechas, usuario o asesor."""
+    formato = request.args.get("formato", "xlsx")
+    if formato not in ("xlsx", "csv"):
+        return jsonify({"error": "Formato no soportado (xlsx o csv)"}), 400
+    try:
+        query = export_filter(request.args.get("desde"), request.args.get("hasta"),
+                              request.args.get("user_id"), request.args.get("asesor"))
+    except ValueError:
+        return jsonify({"error": "Fecha inválida, usa el formato AAAA-MM-DD"}), 400
+    consultas = iter_consultas(query)
+    name = f"consultas_{datetime.now():%Y%m%d_%H%M%S}"
+    if formato == "csv":
+        sheet = request.args.get("hoja", "resultados")
+        if sheet not in ("resultados", "observaciones"):
+            return jsonify({"error": "Hoja no soportada (resultados u observaciones)"}), 400
+        body = iter_csv(consultas, sheet)
+        mimetype = "text/csv; charset=utf-8"
+        name = f"{name}_{sheet}.csv"
+    else:
+        body = iter_xlsx(consultas)
+        mimetype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        name = f"{name}.xlsx"
+    return Response(body, mimetype=mimetype, headers={"Content-Disposition": f"attachment; filename={name}"})
+
+
+@app.route("/search", methods=["GET"])
+def search_documents():
+    """Buscar entre las tesis analizadas: texto libre (``q``), filtros por campo, fechas y paginación."""
+    filters = {column: request.args[column] for column in SEARCH_COLUMNS if request.args.get(column)}
+    try:
+        desde = parse_date(request.args["desde"]) if request.args.get("desde") else None
+        hasta = parse_date(request.args["hasta"], end=True) if request.args.get("hasta") else None
+    except ValueError:
+        return jsonify({"error": "Fecha inválida, usa el formato AAAA-MM-DD"}), 400
+    try:
+        page = int(request.args.get("page", 1))
+        per_page = int(request.args.get("per_page", 20))
+    except ValueError:
+        return jsonify({"error": "page y per_page deben ser números"}), 400
+    try:
+        return jsonify(search(request.args.get("q"), filters, request.args.get("user_id"), desde, hasta,
+                              page, per_page))
+    except Exception as e:
+        return jsonify({"error": f"Error buscando: {str(e)}"}), 500
+
+
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
     
\ No newline at end of file
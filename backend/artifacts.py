@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import tempfile
+
+# Almacén de artefactos de extracción por documento (direccionado por contenido).
+# Cada artefacto es un JSON Lines (cabecera, una línea por página y líneas de campos) para
+# poder escribirlo y recorrerlo página a página sin cargarlo entero en memoria. Los resultados
+# intermedios del análisis se agregan como líneas de etapa, cada una con la versión de las
+# reglas o modelos que la produjeron; la última línea de cada etapa es la vigente.
+ARTIFACTS_FOLDER = os.environ.get("ARTIFACTS_FOLDER", "artifacts")
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Calcular el SHA-256 del contenido de un archivo."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def fingerprint(*parts):
+    """Huella corta de una configuración (reglas, modelo, parámetros) para versionar etapas."""
+    data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def artifact_path(pdf_hash):
+    """Ruta del artefacto de un documento, repartida en subcarpetas por prefijo."""
+    return os.path.join(ARTIFACTS_FOLDER, pdf_hash[:2], f"{pdf_hash}.jsonl")
+
+
+def iter_segments(pages):
+    """Segmentos de texto del documento en orden: texto de página y OCR de sus imágenes."""
+    for page in pages:
+        yield page["text"]
+        for img in page["images"]:
+            if "ocr" in img:
+                yield img["ocr"]
+
+
+def document_segments(pages):
+    return list(iter_segments(pages))
+
+
+def iter_text(pages):
+    """Texto en minúsculas de "\\n".join(document_segments(pages)), en trozos y sin construirlo entero."""
+    for i, segment in enumerate(iter_segments(pages)):
+        yield f"\n{segment.lower()}" if i else segment.lower()
+
+
+class ArtifactWriter:
+    """Escribe el artefacto de un documento página a página en un archivo temporal.
+
+    ``close`` agrega los campos adicionales y mueve el archivo a su ruta final.
+    """
+
+    def __init__(self, pdf_hash):
+        self.path = artifact_path(pdf_hash)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Un temporal propio por escritor (hilo o proceso); solo os.replace publica el artefacto
+        fd, self.tmp_path = tempfile.mkstemp(suffix=".tmp", prefix=f"{pdf_hash}.", dir=os.path.dirname(self.path))
+        self.file = os.fdopen(fd, "w", encoding="utf-8")
+        self.offset = 0
+        self.page_count = 0
+        self._write({"header": {"pdf_hash": pdf_hash}})
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def add_page(self, page):
+        # Límites de la página dentro de "\n".join(document_segments(pages))
+        length = len("\n".join(iter_segments([page])))
+        page["start"] = self.offset
+        page["end"] = self.offset + length
+        self.offset += length + 1
+        self.page_count += 1
+        self._write({"page": page})
+
+    def close(self, **fields):
+        self._write({"fields": {"page_count": self.page_count, **fields}})
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def save_artifacts(pdf_hash, pages, **fields):
+    """Guardar texto de página, OCR por imagen y límites de página de un documento.
+
+    Los campos adicionales (p. ej. estadísticas de OCR) se guardan junto a las páginas.
+    """
+    try:
+        writer = ArtifactWriter(pdf_hash)
+        try:
+            for page in pages:
+                writer.add_page(page)
+        except Exception:
+            writer.abort()
+            raise
+        writer.close(**fields)
+    except Exception as e:
+        print(f"Error guardando artefactos: {e}")
+        raise
+
+
+def _append_record(pdf_hash, record):
+    # Una sola escritura por línea: con varios escritores a la vez las líneas no se mezclan
+    line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+    fd = os.open(artifact_path(pdf_hash), os.O_WRONLY | os.O_APPEND)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def append_artifact_fields(pdf_hash, **fields):
+    """Agregar campos a un artefacto ya guardado sin reescribir sus páginas."""
+    _append_record(pdf_hash, {"fields": fields})
+
+
+def append_stage(pdf_hash, name, version, data):
+    """Guardar el resultado de una etapa del análisis junto con la versión que lo produjo."""
+    _append_record(pdf_hash, {"stage": {"name": name, "version": version, "data": data}})
+
+
+def stored_stage(artifacts, name, version):
+    """Datos guardados de una etapa si los produjo la misma versión; None si hay que recalcularla."""
+    stage = ((artifacts or {}).get("stages") or {}).get(name)
+    if stage is None or stage["version"] != version:
+        return None
+    return stage["data"]
+
+
+def _iter_records(pdf_hash):
+    with open(artifact_path(pdf_hash), encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_pages(pdf_hash):
+    """Páginas de un artefacto leídas del disco de una en una."""
+    if not os.path.exists(artifact_path(pdf_hash)):
+        return
+    for record in _iter_records(pdf_hash):
+        if "page" in record:
+            yield record["page"]
+
+
+class StoredPages:
+    """Páginas de un documento guardadas en disco; se pueden recorrer varias veces."""
+
+    def __init__(self, pdf_hash):
+        self.pdf_hash = pdf_hash
+
+    def __iter__(self):
+        return iter_pages(self.pdf_hash)
+
+
+def load_artifacts(pdf_hash, pages=True):
+    """Cargar los artefactos de un documento; None si aún no existen.
+
+    Con ``pages=False`` solo se cargan los campos adicionales, no las páginas.
+    """
+    path = artifact_path(pdf_hash)
+    try:
+        if not os.path.exists(path):
+            return None
+        artifacts = {"pdf_hash": pdf_hash}
+        if pages:
+            artifacts["pages"] = []
+        for record in _iter_records(pdf_hash):
+            if "page" in record:
+                if pages:
+                    artifacts["pages"].append(record["page"])
+            elif "fields" in record:
+                artifacts.update(record["fields"])
+            elif "stage" in record:
+                artifacts.setdefault("stages", {})[record["stage"]["name"]] = record["stage"]
+        return artifacts
+    except Exception as e:
+        print(f"Error leyendo artefactos: {e}")
+        return None
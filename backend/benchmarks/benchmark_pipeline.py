@@ -0,0 +1,225 @@
+"""Benchmark de extremo a extremo de process_pdf y process_query sobre tesis sintéticas.
+
+Genera una matriz de tesis (páginas × fracción escaneada × imágenes por página), mide
+las etapas del pipeline real (DocumentMetrics de process_pdf y process_query) y guarda un reporte JSON que se puede comparar entre ejecuciones.
+Por defecto los artefactos y la caché de OCR van a una carpeta temporal (ejecución en frío)
+y MongoDB es la base en memoria de mongomock (pip install mongomock).
+
+Uso (desde backend/):
+    python -m benchmarks.benchmark_pipeline --pages 20 100 --scanned-ratio 0 0.3 --images 0 1 --output actual.json
+    python -m benchmarks.benchmark_pipeline --pages 20 100 --compare actual.json --max-regression 0.2
+    python -m benchmarks.benchmark_pipeline uploads/TS_WCQG_2022.pdf --skip-qa
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import artifacts
+import db
+import ocr
+import pdf_processor
+import search_index
+from artifacts import StoredPages, hash_file, iter_text, load_artifacts
+from benchmarks.synthetic_thesis import generate_thesis
+from db import save_consulta
+from field_rules import get_field_extractor
+from metrics import DocumentMetrics
+from models import get_model, report as models_report, rss_mb
+from pdf_processor import process_pdf, process_query
+from spelling import get_spelling_checker
+
+# Preguntas de process_query: una se responde con los resultados guardados y otra
+# recorre entidades, reglas y QA
+QUERIES = {
+    "stored": "¿Quién es el asesor?",
+    "fallback": "¿Cuál es el tamaño de la muestra estudiada?"
+}
+# Diferencia mínima (s) para considerar una regresión; evita falsos positivos en etapas muy cortas
+MIN_REGRESSION_SECONDS = 0.05
+
+
+@contextmanager
+def without_qa(skip_qa):
+    """Con ``skip_qa``, process_pdf registra la etapa de QA como error en lugar de cargar el modelo."""
+    if not skip_qa:
+        yield
+        return
+
+    def unavailable():
+        raise RuntimeError("QA omitido en el benchmark (--skip-qa)")
+    original = pdf_processor.get_qa_pipeline
+    pdf_processor.get_qa_pipeline = unavailable
+    try:
+        yield
+    finally:
+        pdf_processor.get_qa_pipeline = original
+
+
+def time_process_pdf(pdf_path, pdf_name, skip_qa):
+    """Ejecutar process_pdf en frío y de nuevo con los artefactos guardados, con sus tiempos por etapa."""
+    metrics = DocumentMetrics("process_pdf")
+    with metrics.span("hash"):
+        pdf_hash = hash_file(pdf_path)
+    with without_qa(skip_qa):
+        results, observations = process_pdf(pdf_path, pdf_hash, metrics=metrics)
+    with metrics.span("mongo_write"):
+        save_consulta(pdf_name, results, observations, "benchmark", pdf_hash, metrics.to_dict())
+    stages = dict(metrics.stages)
+    stages["total"] = metrics.finish()
+
+    # Reanálisis completo con los artefactos ya guardados
+    warm = DocumentMetrics("process_pdf")
+    with without_qa(skip_qa):
+        process_pdf(pdf_path, pdf_hash, metrics=warm)
+    stages["process_pdf_warm"] = warm.finish()
+
+    stored = load_artifacts(pdf_hash, pages=False) or {}
+    return pdf_hash, {
+        "stages": stages,
+        "counters": metrics.counters,
+        "tags": metrics.tags,
+        "errors": metrics.errors,
+        "chars": sum(len(piece) for piece in iter_text(StoredPages(pdf_hash))),
+        "observations": len(observations),
+        "fields_found": sum(value not in ("", "No identificado") for value in results.values()),
+        "ocr": stored.get("ocr_stats", {})
+    }
+
+
+def time_process_query(pdf_name, skip_qa):
+    """Medir process_query por pregunta; las etapas de todas las preguntas se suman."""
+    queries = {}
+    stages = {}
+    for name, question in QUERIES.items():
+        if skip_qa and name == "fallback":
+            continue
+        metrics = DocumentMetrics("process_query")
+        answer = process_query(pdf_name, question, metrics=metrics)
+        queries[name] = {"seconds": metrics.finish(), "answer": answer[:200], "source": metrics.tags.get("source"),
+                         "stages": metrics.stages}
+        for stage, seconds in metrics.stages.items():
+            stages[stage] = stages.get(stage, 0.0) + seconds
+    return {"queries": queries, "stages": stages}
+
+
+def benchmark_document(pdf_path, name, config, skip_qa):
+    _, pdf_report = time_process_pdf(pdf_path, name, skip_qa)
+    query_report = time_process_query(name, skip_qa)
+    pages = pdf_report["counters"].get("pages", 0)
+    return {
+        "name": name,
+        "config": config,
+        "pages": pages,
+        "pages_per_second": pages / pdf_report["stages"]["total"] if pdf_report["stages"]["total"] else None,
+        "rss_mb": rss_mb(),
+        "process_pdf": pdf_report,
+        "process_query": query_report
+    }
+
+
+def environment():
+    """Datos de la ejecución para poder comparar reportes."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    settings = ["PDF_WORKERS", "PDF_STREAMING", "NLP_PROCESSES", "NLP_BATCH_SIZE", "QA_BACKEND", "QA_BATCH_SIZE",
+                "SPACY_EXCLUDE", "MONGO_URI"]
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {key: os.environ[key] for key in settings if key in os.environ}
+    }
+
+
+def compare(report, baseline, max_regression):
+    """Imprimir la variación por etapa frente a un reporte anterior y devolver las regresiones."""
+    reference = {doc["name"]: doc for doc in baseline["documents"]}
+    regressions = []
+    for doc in report["documents"]:
+        ref = reference.get(doc["name"])
+        if ref is None:
+            continue
+        for section in ("process_pdf", "process_query"):
+            for stage, seconds in doc[section]["stages"].items():
+                ref_seconds = ref[section]["stages"].get(stage)
+                if not ref_seconds:
+                    continue
+                change = seconds / ref_seconds - 1
+                print(f"{doc['name']} {section}.{stage}: {ref_seconds:.3f}s → {seconds:.3f}s ({change:+.0%})")
+                if change > max_regression and seconds - ref_seconds > MIN_REGRESSION_SECONDS:
+                    regressions.append(f"{doc['name']} {section}.{stage} {change:+.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="PDFs reales a evaluar además de las tesis sintéticas")
+    parser.add_argument("--pages", nargs="*", type=int, default=[20, 100])
+    parser.add_argument("--scanned-ratio", nargs="*", type=float, default=[0.0, 0.3])
+    parser.add_argument("--images", nargs="*", type=int, default=[0, 1], help="Figuras con texto por página digital")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-qa", action="store_true", help="No cargar ni medir el modelo de QA")
+    parser.add_argument("--warm", action="store_true", help="Usar las carpetas de artefactos y caché de OCR configuradas")
+    parser.add_argument("--mongo-uri", default=os.environ.get("BENCHMARK_MONGO_URI", "mongomock://"))
+    parser.add_argument("--output", help="Guardar el reporte JSON en este archivo")
+    parser.add_argument("--compare", help="Reporte JSON anterior con el que comparar")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Aumento máximo tolerado por etapa (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as workdir:
+        if not args.warm:
+            # Ejecución en frío: artefactos y caché de OCR propios (también para los procesos de extracción)
+            artifacts.ARTIFACTS_FOLDER = os.environ["ARTIFACTS_FOLDER"] = os.path.join(workdir, "artifacts")
+            ocr.OCR_CACHE_FOLDER = os.environ["OCR_CACHE_FOLDER"] = os.path.join(workdir, "ocr_cache")
+        # Las consultas del benchmark no se indexan en el índice de búsqueda real
+        search_index.SEARCH_INDEX_PATH = os.path.join(workdir, "search_index.sqlite3")
+        db.MONGO_URI = args.mongo_uri
+        db.MONGO_DB = os.environ.get("MONGO_DB", "tesis_analizador_benchmark")
+
+        # Cargar modelos, reglas y diccionario antes de medir
+        start = time.perf_counter()
+        get_model("nlp")
+        if not args.skip_qa:
+            get_model("qa")
+        get_field_extractor()
+        get_spelling_checker()
+        report = {"environment": environment(), "model_load_seconds": models_report()["load_seconds"], "documents": []}
+
+        documents = []
+        for pages, scanned_ratio, images in itertools.product(args.pages, args.scanned_ratio, args.images):
+            name = f"sintetica_p{pages}_s{scanned_ratio:g}_i{images}.pdf"
+            pdf_path = os.path.join(workdir, name)
+            documents.append((pdf_path, name, generate_thesis(pdf_path, pages, scanned_ratio, images, args.seed)))
+        documents += [(pdf_path, os.path.basename(pdf_path), {"pdf": pdf_path}) for pdf_path in args.pdfs]
+
+        for pdf_path, name, config in documents:
+            doc = benchmark_document(pdf_path, name, config, args.skip_qa)
+            report["documents"].append(doc)
+            stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in doc["process_pdf"]["stages"].items())
+            print(f"{name}: {stages}")
+        report["seconds"] = time.perf_counter() - start
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        if regressions:
+            print("Regresiones:\n" + "\n".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
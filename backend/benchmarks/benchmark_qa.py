@@ -0,0 +1,105 @@
+"""Comparar backends de QA (eager, int8, onnx) contra el pipeline actual.
+
+Uso (desde backend/):
+    python -m benchmarks.benchmark_qa uploads/TS_WCQG_2022.pdf --backends eager int8 onnx
+"""
+import argparse
+import json
+import time
+
+from artifacts import hash_file, load_artifacts, save_artifacts
+from qa_engine import FIELD_QUESTIONS, answer_questions, load_qa_pipeline
+from retrieval import get_passage_index
+
+
+def load_pages(pdf_path):
+    """Páginas del documento desde el almacén de artefactos, extrayéndolas si hace falta."""
+    pdf_hash = hash_file(pdf_path)
+    artifacts = load_artifacts(pdf_hash)
+    if artifacts:
+        return pdf_hash, artifacts["pages"]
+    from pdf_processor import extract_pages
+    pages = extract_pages(pdf_path)
+    save_artifacts(pdf_hash, pages)
+    return pdf_hash, pages
+
+
+def answer_sequentially(qa_pipeline, index, questions):
+    """Una llamada al modelo por pregunta y pasaje, como el pipeline sin lotes."""
+    best = {}
+    for key, question in questions.items():
+        for passage in index.search(question):
+            answer = qa_pipeline(question=question, context=passage["text"])
+            if key not in best or answer["score"] > best[key]["score"]:
+                best[key] = answer
+    return best
+
+
+def compare(answers, baseline):
+    """Coincidencia de respuestas y diferencia media de puntajes frente a la referencia."""
+    keys = [key for key in baseline if key in answers]
+    if not keys:
+        return {"agreement": None, "mean_score_diff": None}
+    same = sum(answers[key]["answer"].strip() == baseline[key]["answer"].strip() for key in keys)
+    diff = sum(abs(answers[key]["score"] - baseline[key]["score"]) for key in keys)
+    return {"agreement": same / len(keys), "mean_score_diff": diff / len(keys)}
+
+
+def run(pdf_path, backends, batch_size):
+    pdf_hash, pages = load_pages(pdf_path)
+    index = get_passage_index(pdf_hash, pages)
+    report = {"pdf": pdf_path, "questions": len(FIELD_QUESTIONS), "passages": len(index.passages), "runs": []}
+
+    baseline = None
+    for backend in ["eager"] + [b for b in backends if b != "eager"]:
+        start = time.perf_counter()
+        qa_pipeline = load_qa_pipeline(backend)
+        load_seconds = time.perf_counter() - start
+
+        if baseline is None:
+            # Referencia: el pipeline actual, fp32 y una llamada por pregunta
+            start = time.perf_counter()
+            baseline = answer_sequentially(qa_pipeline, index, FIELD_QUESTIONS)
+            report["runs"].append({
+                "backend": "eager",
+                "mode": "sequential",
+                "load_seconds": load_seconds,
+                "seconds": time.perf_counter() - start,
+                "answers": baseline
+            })
+
+        start = time.perf_counter()
+        answers = answer_questions(qa_pipeline, index, FIELD_QUESTIONS, batch_size=batch_size)
+        report["runs"].append({
+            "backend": backend,
+            "mode": "batched",
+            "load_seconds": load_seconds,
+            "seconds": time.perf_counter() - start,
+            "answers": answers,
+            **compare(answers, baseline)
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+", help="PDFs a evaluar")
+    parser.add_argument("--backends", nargs="+", default=["eager", "int8"], choices=["eager", "int8", "onnx"])
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--output", help="Guardar el reporte JSON en este archivo")
+    args = parser.parse_args()
+
+    reports = [run(pdf_path, args.backends, args.batch_size) for pdf_path in args.pdfs]
+    for report in reports:
+        for result in report["runs"]:
+            agreement = result.get("agreement")
+            print(f"{report['pdf']} {result['backend']:>5} {result['mode']:>10}: "
+                  f"{result['seconds']:.2f}s (carga {result['load_seconds']:.2f}s)"
+                  + (f", coincidencia {agreement:.0%}" if agreement is not None else ""))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Generar tesis sintéticas en español para los benchmarks.
+
+Cada tesis tiene una carátula y un capítulo de metodología con los encabezados que
+buscan las reglas de field_rules.json, seguidos de páginas de relleno. Se puede variar
+el número de páginas, la fracción de páginas escaneadas (solo imagen, sin capa de
+texto) y el número de imágenes con texto por página digital.
+
+Uso (desde backend/):
+    python -m benchmarks.synthetic_thesis tesis.pdf --pages 120 --scanned-ratio 0.25 --images 1
+"""
+import argparse
+import io
+import random
+import textwrap
+import zlib
+
+from PIL import Image, ImageDraw, ImageFont
+
+from spelling import PREFIX_MARKER, load_dictionary
+
+# Página A4 en puntos, márgenes y tipografía del texto digital
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 72
+FONT_SIZE = 11
+LEADING = 14
+LINE_CHARS = 85
+# Resolución de las páginas escaneadas
+SCAN_DPI = 150
+
+NAMES = ["Weslay Chain Quispe García", "María Elena Torres Ramírez", "José Luis Paredes Huamán",
+         "Rosa Amelia Vásquez Ríos", "Carlos Alberto Mendoza Flores", "Lucía Fernanda Castillo Soto",
+         "Jorge Enrique Salazar Ponce", "Ana Cecilia Rojas Villanueva"]
+SUBJECTS = ["la cooperativa", "el consejo de administración", "la asamblea general", "el socio productor",
+            "la gestión financiera", "el comité de educación", "la liquidez corriente", "el capital social"]
+VERBS = ["influye en", "determina", "se relaciona con", "afecta", "explica", "condiciona", "fortalece"]
+OBJECTS = ["el desfinanciamiento interno", "los estados financieros", "el reparto de excedentes",
+           "la rentabilidad del periodo", "las aportaciones de los socios", "el endeudamiento a corto plazo",
+           "la toma de decisiones", "los ratios financieros"]
+COMPLEMENTS = ["durante el periodo 2016 al 2020", "en la provincia de Leoncio Prado", "según los registros contables",
+               "de acuerdo con el estatuto", "en el marco de la Ley General de Cooperativas",
+               "tal como se observa en la tabla", "en comparación con el año anterior"]
+
+
+def front_matter(rng):
+    """Carátula, jurados y capítulo de metodología con los encabezados de field_rules.json."""
+    author, advisor, *jurors = rng.sample(NAMES, 5)
+    return [
+        "UNIVERSIDAD NACIONAL AGRARIA DE LA SELVA",
+        "FACULTAD DE CIENCIAS CONTABLES",
+        "",
+        "Título: Los principios cooperativos y el desfinanciamiento interno de la Cooperativa "
+        "Agroindustrial Cacao Alto Huallaga, Castillo Grande",
+        "",
+        f"Tesis para optar el título de Contador Público elaborado por {author}",
+        "",
+        f"Asesor: Dr. {advisor}",
+        f"Jurado 1: Mg. {jurors[0]}",
+        f"Jurado 2: Mg. {jurors[1]}",
+        f"Jurado 3: CPC. {jurors[2]}",
+        "",
+        "Lugar: Tingo María, Perú",
+        "Fecha de publicación: 2022",
+    ], [
+        "CAPÍTULO I. PLANTEAMIENTO DEL PROBLEMA",
+        "",
+        "Problema general: ¿De qué manera la inadecuada aplicación de los principios cooperativos influye en el "
+        "desfinanciamiento interno de la Cooperativa Agroindustrial Cacao Alto Huallaga, Castillo Grande?",
+        "",
+        "Problema específico 1: ¿De qué manera el principio de control democrático influye en el desfinanciamiento "
+        "interno de la Cooperativa Agroindustrial Cacao Alto Huallaga, Castillo Grande?",
+        "",
+        "Problema específico 2: ¿De qué manera el principio de reparto de excedentes influye en el desfinanciamiento "
+        "interno de la Cooperativa Agroindustrial Cacao Alto Huallaga, Castillo Grande?",
+        "",
+        "Objetivo específico 1: Determinar de qué manera el principio de control democrático influye en la "
+        "Cooperativa Agroindustrial Cacao Alto Huallaga, Castillo Grande",
+        "",
+        "Hipótesis general: La inadecuada aplicación de los principios cooperativos influye en el desfinanciamiento "
+        "interno de la Cooperativa Agroindustrial Cacao Alto Huallaga, Castillo Grande",
+        "",
+        "Variable independiente: inadecuada aplicación de los principios cooperativos",
+        "Variable dependiente: desfinanciamiento interno",
+        "Enfoque: longitudinal",
+        "Nivel o alcance: explicativo",
+        "Diseño de investigación: no experimental – ex post facto",
+        "Línea de investigación: finanzas",
+        "Cantidad de la población: Estados de Situación Financiera y Resultados de los años 2016 al 2020",
+        "Cantidad de la muestra: Estados de Situación Financiera y Resultados de los últimos 5 años",
+        "Prueba estadística: Chi cuadrado de Pearson",
+    ]
+
+
+def sentence(rng, mistakes):
+    """Oración de relleno; algunas son largas y sin comas y otras llevan errores del diccionario."""
+    parts = [rng.choice(SUBJECTS), rng.choice(VERBS), rng.choice(OBJECTS)]
+    if rng.random() < 0.3:
+        parts += ["y", rng.choice(SUBJECTS), rng.choice(VERBS), rng.choice(OBJECTS), rng.choice(COMPLEMENTS)]
+    else:
+        parts.append(rng.choice(COMPLEMENTS))
+    if mistakes and rng.random() < 0.05:
+        parts.insert(1, rng.choice(mistakes))
+    text = " ".join(parts)
+    return f"{text[0].upper()}{text[1:]}."
+
+
+def filler(rng, mistakes, lines):
+    """Párrafos de relleno ajustados al ancho de línea, hasta ``lines`` líneas."""
+    out = []
+    while len(out) < lines:
+        paragraph = " ".join(sentence(rng, mistakes) for _ in range(rng.randint(3, 7)))
+        out.extend(textwrap.wrap(paragraph, LINE_CHARS))
+        out.append("")
+    return out[:lines]
+
+
+def wrap(lines):
+    wrapped = []
+    for line in lines:
+        wrapped.extend(textwrap.wrap(line, LINE_CHARS) or [""])
+    return wrapped
+
+
+def _font(size):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size)
+        except TypeError:
+            # Pillow < 10.1: fuente por defecto de tamaño fijo
+            return ImageFont.load_default()
+
+
+def render_text(lines, width, height, font_size, margin):
+    """Imagen en escala de grises con las líneas de texto, como una página o figura escaneada."""
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    font = _font(font_size)
+    y = margin
+    for line in lines:
+        if y + font_size > height - margin:
+            break
+        draw.text((margin, y), line, fill=0, font=font)
+        y += int(font_size * 1.3)
+    return image
+
+
+def jpeg(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=75)
+    return buffer.getvalue()
+
+
+def _pdf_string(text):
+    data = text.encode("cp1252", "replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class PdfWriter:
+    """Escritor mínimo de PDF: texto Helvetica (WinAnsi) e imágenes JPEG en escala de grises."""
+
+    def __init__(self):
+        self.objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+        self.page_ids = []
+
+    def add(self, data):
+        self.objects.append(data)
+        return len(self.objects)
+
+    def add_stream(self, data, extra=b""):
+        return self.add(b"<< " + extra + b" /Length " + str(len(data)).encode() + b" >>\nstream\n" + data + b"\nendstream")
+
+    def add_page(self, lines=(), images=()):
+        """Agregar una página con líneas de texto y una lista de (imagen, x, y, ancho, alto) en puntos."""
+        content = []
+        xobjects = []
+        for i, (image, x, y, width, height) in enumerate(images, 1):
+            image_id = self.add_stream(jpeg(image), f"/Type /XObject /Subtype /Image /Width {image.width} "
+                                                    f"/Height {image.height} /ColorSpace /DeviceGray "
+                                                    f"/BitsPerComponent 8 /Filter /DCTDecode".encode())
+            xobjects.append(f"/Im{i} {image_id} 0 R".encode())
+            content.append(f"q {width} 0 0 {height} {x} {y} cm /Im{i} Do Q".encode())
+        if lines:
+            content.append(f"BT /F1 {FONT_SIZE} Tf {LEADING} TL {MARGIN} {PAGE_HEIGHT - MARGIN} Td".encode())
+            content.extend(_pdf_string(line) + b" Tj T*" for line in lines)
+            content.append(b"ET")
+        content_id = self.add_stream(zlib.compress(b"\n".join(content)), b"/Filter /FlateDecode")
+        resources = b"<< /Font << /F1 3 0 R >> /XObject << " + b" ".join(xobjects) + b" >> >>"
+        self.page_ids.append(self.add(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] /Contents {content_id} 0 R "
+            f"/Resources ".encode() + resources + b" >>"))
+
+    def write(self, path):
+        self.objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self.objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode()
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, data in enumerate(self.objects, 1):
+            offsets.append(len(out))
+            out += f"{number} 0 obj\n".encode() + data + b"\nendobj\n"
+        xref = len(out)
+        out += f"xref\n0 {len(self.objects) + 1}\n0000000000 65535 f \n".encode()
+        out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+        out += f"trailer\n<< /Size {len(self.objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+        with open(path, "wb") as f:
+            f.write(out)
+
+
+def generate_thesis(path, pages=50, scanned_ratio=0.0, images_per_page=0, seed=0):
+    """Escribir una tesis sintética en ``path`` y devolver su descripción.
+
+    ``scanned_ratio`` es la fracción de páginas que se guardan como una imagen de página
+    completa; las demás son digitales y llevan ``images_per_page`` figuras con texto.
+    """
+    rng = random.Random(seed)
+    mistakes = [mistake.rstrip(PREFIX_MARKER) for mistake in load_dictionary()]
+    lines_per_page = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+    cover, methodology = front_matter(rng)
+    contents = [wrap(cover), wrap(methodology)][:pages]
+    contents += [filler(rng, mistakes, lines_per_page) for _ in range(pages - len(contents))]
+    scanned = set(rng.sample(range(pages), round(pages * scanned_ratio)))
+
+    writer = PdfWriter()
+    scale = SCAN_DPI / 72
+    for page_num, lines in enumerate(contents):
+        if page_num in scanned:
+            image = render_text(lines, int(PAGE_WIDTH * scale), int(PAGE_HEIGHT * scale),
+                                int(FONT_SIZE * scale), int(MARGIN * scale))
+            writer.add_page(images=[(image, 0, 0, PAGE_WIDTH, PAGE_HEIGHT)])
+            continue
+        if not images_per_page:
+            writer.add_page(lines)
+            continue
+        # Texto en la mitad superior y figuras apiladas en la inferior
+        area_height = (PAGE_HEIGHT - 2 * MARGIN) // 2
+        figure_height = area_height // images_per_page
+        figures = []
+        for i in range(images_per_page):
+            caption = [f"Figura {page_num + 1}.{i + 1}: {rng.choice(OBJECTS)} {rng.choice(COMPLEMENTS)}"]
+            image = render_text(caption + filler(rng, [], 6), int((PAGE_WIDTH - 2 * MARGIN) * scale),
+                                int(figure_height * scale), int(FONT_SIZE * scale), int(FONT_SIZE * scale))
+            figures.append((image, MARGIN, MARGIN + i * figure_height, PAGE_WIDTH - 2 * MARGIN, figure_height))
+        writer.add_page(lines[:lines_per_page // 2 - 1], figures)
+    writer.write(path)
+    return {"pages": pages, "scanned_ratio": scanned_ratio, "scanned_pages": len(scanned),
+            "images_per_page": images_per_page, "seed": seed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="Ruta del PDF a generar")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--scanned-ratio", type=float, default=0.0)
+    parser.add_argument("--images", type=int, default=0, help="Figuras con texto por página digital")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(generate_thesis(args.output, args.pages, args.scanned_ratio, args.images, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,328 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
 from datetime import datetime
+import atexit
+import os
+import threading
+import time
+
+# Conexión a MongoDB: un único cliente con pool compartido por todo el proceso
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_DB = os.environ.get("MONGO_DB", "tesis_analizador")
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_TIMEOUT_MS = int(os.environ.get("MONGO_TIMEOUT_MS", "5000"))
+# Inserción en bloque de preguntas: tamaño del buffer (1 = insertar de inmediato) y espera máxima
+PREGUNTAS_BUFFER_SIZE = int(os.environ.get("PREGUNTAS_BUFFER_SIZE", "1"))
+PREGUNTAS_BUFFER_SECONDS = float(os.environ.get("PREGUNTAS_BUFFER_SECONDS", "5"))
+# Preguntas retenidas como máximo mientras MongoDB no responde; las más antiguas se descartan
+PREGUNTAS_BUFFER_MAX = int(os.environ.get("PREGUNTAS_BUFFER_MAX", "10000"))
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Obtener el cliente de MongoDB del proceso, creándolo en el primer uso."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if MONGO_URI.startswith("mongomock://"):
+                    # Base de datos en memoria para desarrollo y pruebas
+                    import mongomock
+                    _client = mongomock.MongoClient()
+                else:
+                    _client = MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE,
+                                          serverSelectionTimeoutMS=MONGO_TIMEOUT_MS)
+    return _client
 
 
 def get_db():
     try:
-        client = MongoClient("mongodb://localhost:27017/")
-        db = client["tesis_analizador"]
-        return db
+        return get_client()[MONGO_DB]
     except Exception as e:
         print(f"Error conectando a MongoDB: {e}")
         raise
 
 
-def save_consulta(pdf_name, results, observations, user_id):
+def ensure_indexes():
+    """Crear los índices de las colecciones consultadas por el backend."""
+    try:
+        db = get_db()
+        db["consultas"].create_index([("pdf_name", ASCENDING)])
+        db["consultas"].create_index([("pdf_hash", ASCENDING)])
+        db["consultas"].create_index([("timestamp", ASCENDING)])
+        db["consultas"].create_index([("user_id", ASCENDING), ("timestamp", ASCENDING)])
+        db["archivos"].create_index([("pdf_name", ASCENDING)], unique=True)
+        db["preguntas"].create_index([("pdf_name", ASCENDING), ("timestamp", DESCENDING)])
+        db["respuestas_cache"].create_index([("pdf_hash", ASCENDING), ("version", ASCENDING), ("key", ASCENDING)], unique=True)
+        db["jobs"].create_index([("finished", ASCENDING)])
+    except Exception as e:
+        print(f"Error creando índices: {e}")
+        raise
+
+
+def consulta_document(pdf_name, results, observations, user_id, pdf_hash=None, metrics=None):
+    return {
+        "pdf_name": pdf_name,
+        "pdf_hash": pdf_hash,
+        "results": results,
+        "observations": observations,
+        "metrics": metrics,
+        "user_id": user_id,
+        "timestamp": datetime.now()
+    }
+
+
+def _invalidate_answers(pdf_hashes):
+    # El documento se reprocesó: las respuestas guardadas ya no corresponden
+    from answer_cache import answer_cache
+    for pdf_hash in pdf_hashes:
+        if pdf_hash:
+            answer_cache.invalidate(pdf_hash)
+
+
+def _index_for_search(consultas):
+    # El índice de búsqueda es secundario: si falla, la consulta ya quedó guardada
+    try:
+        from search_index import index_consultas
+        index_consultas(consultas)
+    except Exception as e:
+        print(f"Error actualizando el índice de búsqueda: {e}")
+
+
+def save_consulta(pdf_name, results, observations, user_id, pdf_hash=None, metrics=None, replaces=None):
+    """Guardar el análisis de un PDF; ``metrics`` es el desglose de tiempos y contadores.
+
+    Con ``replaces`` (el _id de una consulta fallida) esa consulta se borra tras guardar la
+    nueva; la nueva tiene su propio _id para que ninguna caché de respuestas la confunda.
+    """
     try:
         db = get_db()
         consultas = db["consultas"]
-        consultas.insert_one({
-            "pdf_name": pdf_name,
-            "results": results,
-            "observations": observations,
-            "user_id": user_id,
-            "timestamp": datetime.now()
-        })
+        consulta = consulta_document(pdf_name, results, observations, user_id, pdf_hash, metrics)
+        consultas.insert_one(consulta)
+        if replaces is not None:
+            consultas.delete_one({"_id": replaces})
     except Exception as e:
         print(f"Error guardando consulta: {e}")
         raise
+    _invalidate_answers([pdf_hash])
+    _index_for_search([consulta])
 
 
-def save_pregunta(pdf_name, pregunta, respuesta, user_id):
+def save_consultas_bulk(consultas):
+    """Guardar varias consultas (armadas con consulta_document) en una sola operación."""
+    if not consultas:
+        return
+    try:
+        get_db()["consultas"].insert_many(consultas, ordered=False)
+    except Exception as e:
+        print(f"Error guardando consultas: {e}")
+        raise
+    _invalidate_answers({consulta["pdf_hash"] for consulta in consultas})
+    _index_for_search(consultas)
+
+
+def latest_consulta(pdf_name=None, pdf_hash=None):
+    """Último análisis de un documento, por hash o por nombre (resuelto con el mapeo de archivos subidos)."""
+    pdf_hash = pdf_hash or archivo_hash(pdf_name)
+    query = {"pdf_hash": pdf_hash} if pdf_hash else {"pdf_name": pdf_name}
+    try:
+        return get_db()["consultas"].find_one(query, sort=[("timestamp", DESCENDING)])
+    except Exception as e:
+        print(f"Error consultando el análisis: {e}")
+        raise
+
+
+def save_archivo(pdf_name, pdf_hash, size):
+    """Asociar el nombre de un PDF subido al hash de su contenido; una subida nueva con el mismo nombre lo reemplaza."""
+    try:
+        get_db()["archivos"].update_one(
+            {"pdf_name": pdf_name},
+            {"$set": {"pdf_hash": pdf_hash, "size": size, "timestamp": datetime.now()}},
+            upsert=True)
+    except Exception as e:
+        print(f"Error guardando archivo: {e}")
+        raise
+
+
+def archivo_hash(pdf_name):
+    """Hash del último PDF subido con este nombre, o None si se subió antes del almacén por contenido."""
+    try:
+        archivo = get_db()["archivos"].find_one({"pdf_name": pdf_name}, {"pdf_hash": 1})
+    except Exception as e:
+        print(f"Error consultando archivo: {e}")
+        raise
+    return archivo["pdf_hash"] if archivo else None
+
+
+def analyzed_documents(pdf_names=None):
+    """Pares (hash, nombre del PDF) de los documentos analizados, con el nombre de su última consulta."""
+    match = {"pdf_hash": {"$ne": None}}
+    if pdf_names:
+        match["pdf_name"] = {"$in": list(pdf_names)}
+    try:
+        documents = get_db()["consultas"].aggregate([
+            {"$match": match},
+            {"$sort": {"timestamp": DESCENDING}},
+            {"$group": {"_id": "$pdf_hash", "pdf_name": {"$first": "$pdf_name"}}}
+        ])
+        return [(doc["_id"], doc["pdf_name"]) for doc in documents]
+    except Exception as e:
+        print(f"Error listando documentos analizados: {e}")
+        raise
+
+
+def known_hashes(pdf_hashes, fatal_stages=()):
+    """Hashes de la lista que ya tienen una consulta guardada.
+
+    No cuentan las consultas con un error en alguna de ``fatal_stages`` (análisis fallidos).
+    """
+    query = {"pdf_hash": {"$in": list(pdf_hashes)}}
+    if fatal_stages:
+        query["metrics.errors.stage"] = {"$nin": list(fatal_stages)}
+    try:
+        return set(get_db()["consultas"].distinct("pdf_hash", query))
+    except Exception as e:
+        print(f"Error consultando documentos procesados: {e}")
+        raise
+
+
+def save_job(job):
+    """Guardar el estado de un trabajo de la cola, visible desde cualquier worker del servidor."""
+    try:
+        get_db()["jobs"].replace_one({"_id": job["id"]}, job, upsert=True)
+    except Exception as e:
+        print(f"Error guardando el trabajo {job['id']}: {e}")
+        raise
+
+
+def find_job(job_id):
+    """Estado guardado de un trabajo, o None si no existe."""
+    try:
+        return get_db()["jobs"].find_one({"_id": job_id}, {"_id": 0})
+    except Exception as e:
+        print(f"Error consultando el trabajo {job_id}: {e}")
+        raise
+
+
+def job_counts():
+    """Número de trabajos guardados por estado."""
+    try:
+        return {row["_id"]: row["count"] for row in get_db()["jobs"].aggregate(
+            [{"$group": {"_id": "$state", "count": {"$sum": 1}}}])}
+    except Exception as e:
+        print(f"Error contando trabajos: {e}")
+        raise
+
+
+def delete_jobs(finished_before):
+    """Borrar los trabajos terminados antes de ``finished_before`` (segundos epoch)."""
+    try:
+        get_db()["jobs"].delete_many({"finished": {"$ne": None, "$lt": finished_before}})
+    except Exception as e:
+        print(f"Error borrando trabajos: {e}")
+        raise
+
+
+class PreguntaBuffer:
+    """Acumula preguntas y las guarda con insert_many al llenarse o al pasar el tiempo máximo.
+
+    Si la inserción falla, las preguntas vuelven al buffer y se reintentan en el siguiente
+    vaciado (no antes de ``max_seconds``); el error no llega a quien hizo la pregunta.
+    """
+
+    def __init__(self, max_size=PREGUNTAS_BUFFER_SIZE, max_seconds=PREGUNTAS_BUFFER_SECONDS,
+                 max_pending=PREGUNTAS_BUFFER_MAX):
+        self.max_size = max_size
+        self.max_seconds = max_seconds
+        self.max_pending = max_pending
+        self.pending = []
+        self.oldest = None
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+        # Un vaciado a la vez, para que las preguntas devueltas al buffer conserven su orden
+        self.flush_lock = threading.Lock()
+        self.flusher = None
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.max_seconds)
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def add(self, pregunta):
+        with self.lock:
+            if self.flusher is None:
+                # Hilo que vacía el buffer aunque no lleguen más preguntas
+                self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+                self.flusher.start()
+            if not self.pending:
+                self.oldest = time.monotonic()
+            self.pending.append(pregunta)
+            full = len(self.pending) >= self.max_size
+            expired = time.monotonic() - self.oldest >= self.max_seconds
+            waiting = time.monotonic() < self.retry_at
+        if (full or expired) and not waiting:
+            self.flush()
+
+    def flush(self):
+        """Guardar las preguntas pendientes; devuelve False si quedaron en el buffer para reintentar."""
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, []
+            if not pending:
+                return True
+            try:
+                save_preguntas_bulk(pending)
+                return True
+            except BulkWriteError as e:
+                # Con ordered=False el resto se insertó; las repetidas (11000) ya estaban guardadas
+                failed = [pending[error["index"]] for error in e.details.get("writeErrors", [])
+                          if error.get("code") != 11000]
+            except Exception:
+                failed = pending
+            with self.lock:
+                self.pending = failed + self.pending
+                if len(self.pending) > self.max_pending:
+                    print(f"Buffer de preguntas lleno: se descartan {len(self.pending) - self.max_pending} preguntas")
+                    self.pending = self.pending[-self.max_pending:]
+                if self.pending:
+                    self.oldest = time.monotonic()
+                self.retry_at = time.monotonic() + self.max_seconds
+            return not failed
+
+
+def save_preguntas_bulk(preguntas):
+    """Guardar varias preguntas en una sola operación."""
     try:
         db = get_db()
-        preguntas = db["preguntas"]
-        preguntas.insert_one({
+        db["preguntas"].insert_many(preguntas, ordered=False)
+    except Exception as e:
+        print(f"Error guardando preguntas: {e}")
+        raise
+
+
+preguntas_buffer = PreguntaBuffer()
+atexit.register(preguntas_buffer.flush)
+
+
+def save_pregunta(pdf_name, pregunta, respuesta, user_id):
+    """Registrar una pregunta respondida; un fallo de MongoDB se registra sin interrumpir la respuesta."""
+    try:
+        documento = {
             "pdf_name": pdf_name,
             "pregunta": pregunta,
             "respuesta": respuesta,
             "user_id": user_id,
             "timestamp": datetime.now()
-        })
+        }
+        if PREGUNTAS_BUFFER_SIZE > 1:
+            preguntas_buffer.add(documento)
+        else:
+            get_db()["preguntas"].insert_one(documento)
     except Exception as e:
         print(f"Error guardando pregunta: {e}")
-        raise
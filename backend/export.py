@@ -0,0 +1,132 @@
+import csv
+import io
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from db import get_db
+from pdf_processor import RESULT_FIELDS, format_observation
+
+# Exportación masiva de consultas: documentos leídos de MongoDB por lote y bytes enviados por bloque
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "200"))
+EXPORT_CHUNK_SIZE = 64 * 1024
+# Límite de caracteres de una celda de Excel
+EXCEL_CELL_LIMIT = 32767
+
+RESULT_COLUMNS = ["PDF", "Fecha de análisis", "Usuario", *RESULT_FIELDS]
+OBSERVATION_COLUMNS = ["PDF", "Fecha de análisis", "Usuario", "Observación"]
+
+
+def parse_date(value, end=False):
+    """Fecha u hora ISO; una fecha sola como límite superior (``end``) incluye todo ese día."""
+    date = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        date += timedelta(days=1)
+    return date
+
+
+def export_filter(desde=None, hasta=None, user_id=None, asesor=None):
+    """Filtro de MongoDB para exportar consultas; lanza ValueError si una fecha no es válida."""
+    query = {}
+    if desde or hasta:
+        query["timestamp"] = {}
+        if desde:
+            query["timestamp"]["$gte"] = parse_date(desde)
+        if hasta:
+            query["timestamp"]["$lt"] = parse_date(hasta, end=True)
+    if user_id:
+        query["user_id"] = user_id
+    if asesor:
+        query["results.Asesor"] = {"$regex": re.escape(asesor), "$options": "i"}
+    return query
+
+
+def iter_consultas(query):
+    """Consultas que cumplen el filtro, leídas de MongoDB por lotes y en orden cronológico."""
+    cursor = get_db()["consultas"].find(query, {"pdf_name": 1, "timestamp": 1, "user_id": 1, "results": 1,
+                                                 "observations": 1})
+    return cursor.sort("timestamp", 1).batch_size(EXPORT_BATCH_SIZE)
+
+
+def _rows(consulta):
+    # Fila de resultados y filas de observaciones de una consulta; las observaciones guardadas
+    # como dicts (consultas antiguas o fallidas) se formatean como en process_pdf
+    base = [consulta.get("pdf_name"), consulta.get("timestamp"), consulta.get("user_id")]
+    results = consulta.get("results") or {}
+    result_row = base + [results.get(field, "") for field in RESULT_FIELDS]
+    observation_rows = [base + [format_observation(observation)] for observation in consulta.get("observations") or []]
+    return result_row, observation_rows
+
+
+def _iter_rows(consultas):
+    # Un documento que no se puede convertir se omite (y se registra) sin cortar la exportación
+    for consulta in consultas:
+        try:
+            yield _rows(consulta)
+        except Exception as e:
+            print(f"Error exportando la consulta de '{consulta.get('pdf_name')}': {e}")
+
+
+def iter_csv(consultas, sheet="resultados"):
+    """CSV (UTF-8 con BOM, para que Excel respete las tildes) generado fila a fila.
+
+    Un CSV tiene una sola hoja: ``sheet`` elige "resultados" u "observaciones".
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(OBSERVATION_COLUMNS if sheet == "observaciones" else RESULT_COLUMNS)
+    for result_row, observation_rows in _iter_rows(consultas):
+        if sheet == "observaciones":
+            writer.writerows(observation_rows)
+        else:
+            writer.writerow(result_row)
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _cell(value):
+    # openpyxl rechaza caracteres de control y tipos que no son de celda; Excel corta las celdas largas
+    if value is not None and not isinstance(value, (str, int, float, datetime)):
+        value = str(value)
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)[:EXCEL_CELL_LIMIT]
+    return value
+
+
+def write_xlsx(consultas, path):
+    """Escribir el libro en modo write-only: las filas van a disco y la memoria no crece con ellas."""
+    workbook = Workbook(write_only=True)
+    results_sheet = workbook.create_sheet("Resultados")
+    observations_sheet = workbook.create_sheet("Observaciones")
+    results_sheet.append(RESULT_COLUMNS)
+    observations_sheet.append(OBSERVATION_COLUMNS)
+    for result_row, observation_rows in _iter_rows(consultas):
+        results_sheet.append([_cell(value) for value in result_row])
+        for row in observation_rows:
+            observations_sheet.append([_cell(value) for value in row])
+    workbook.save(path)
+
+
+def iter_xlsx(consultas):
+    """Contenido del xlsx por bloques; el libro se arma en un archivo temporal que se borra al terminar.
+
+    Un xlsx es un zip que solo se cierra al final, así que el envío empieza cuando el libro
+    está completo, pero ni las filas ni el archivo se mantienen en memoria.
+    """
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        write_xlsx(consultas, path)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(EXPORT_CHUNK_SIZE), b""):
+                yield chunk
+    finally:
+        os.remove(path)
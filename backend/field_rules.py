@@ -0,0 +1,188 @@
+import json
+import os
+import re
+import time
+
+from artifacts import fingerprint
+
+# Reglas de extracción de campos; se pueden cambiar sin tocar el código
+FIELD_RULES_PATH = os.environ.get("FIELD_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "field_rules.json"))
+# Tamaño del búfer (caracteres) al extraer campos de un texto en trozos (modo streaming)
+STREAM_CHUNK_CHARS = int(os.environ.get("STREAM_CHUNK_CHARS", "200000"))
+
+
+# Unidades de un ancla: clase de caracteres, escape o carácter literal
+ANCHOR_UNIT = re.compile(r"\[[^\]]*\]|\\.|.", re.DOTALL)
+# Unidades de un patrón: además, repeticiones explícitas {n}, {n,} o {n,m}
+PATTERN_UNIT = re.compile(r"\[(?:\\.|[^\]])*\]|\\.|\{\d*(?:,\d*)?\}|.", re.DOTALL)
+
+
+def anchor_trie(anchors):
+    """Expresión regular en forma de trie que reconoce todas las anclas.
+
+    Las anclas son frases simples (se admiten clases ``[..]`` y escapes). Cada una termina
+    en un grupo vacío ``a<i>`` para saber cuál coincidió; ante prefijos comunes se prefiere
+    la más larga.
+    """
+    trie = {}
+    for i, anchor in enumerate(anchors):
+        node = trie
+        for unit in ANCHOR_UNIT.findall(anchor):
+            node = node.setdefault(unit, {})
+        node[""] = i
+
+    def emit(node):
+        branches = [unit + emit(child) for unit, child in node.items() if unit != ""]
+        if "" in node:
+            branches.append(f"(?P<a{node['']}>)")
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return emit(trie)
+
+
+def bound_pattern(pattern, limit):
+    """Acotar a ``limit`` repeticiones cada ``*``, ``+`` o ``{n,}`` del patrón.
+
+    Devuelve el patrón acotado y una cota de los caracteres que puede leer una coincidencia
+    (incluidas las búsquedas anticipadas). Los patrones se evalúan sobre el texto completo,
+    sin ``endpos``, para que ``$`` y las búsquedas anticipadas no coincidan en un final de
+    ventana artificial; el límite de la ventana va dentro del propio patrón.
+    """
+    units = []
+    max_length = 0
+    for unit in PATTERN_UNIT.findall(pattern):
+        if unit in ("*", "+") or unit.startswith("{") and unit.endswith(",}"):
+            low = {"*": "0", "+": "1"}.get(unit) or unit[1:-2] or "0"
+            unit = f"{{{low},{max(limit, int(low))}}}"
+        if unit.startswith("{") and len(unit) > 2:
+            # La unidad anterior ya contó un carácter
+            max_length += int(unit[1:-1].split(",")[-1]) - 1
+        else:
+            max_length += 1
+        units.append(unit)
+    return "".join(units), max_length
+
+
+class FieldExtractor:
+    """Motor de extracción de campos con reglas precompiladas.
+
+    Cada regla tiene anclas (encabezados o frases clave) y un patrón con un grupo de
+    captura. Una sola pasada sobre el texto localiza todas las anclas; luego el patrón
+    de cada regla se evalúa solo en sus anclas, con cada repetición (``.*``, ``.+?``...)
+    acotada a ``window`` caracteres, lo que limita el retroceso. Si las ventanas de una
+    regla superan ``budget_ms`` se deja de evaluar esa regla.
+
+    Si dos anclas distintas empiezan en la misma posición solo se registra la más
+    larga; las reglas que necesiten la misma frase deben compartir el ancla.
+    """
+
+    def __init__(self, config):
+        self.version = config.get("version", 1)
+        # Versión del contenido de las reglas: los campos guardados con otra se recalculan
+        self.fingerprint = fingerprint(config)
+        self.max_windows = config.get("max_windows", 100)
+        self.rules = []
+        anchor_rules = {}
+        for rule in config["rules"]:
+            pattern, max_length = bound_pattern(rule["pattern"], rule.get("window", config.get("window", 1500)))
+            self.rules.append({
+                "field": rule["field"],
+                "regex": re.compile(pattern, re.IGNORECASE | re.DOTALL),
+                "max_length": max_length,
+                "budget": rule.get("budget_ms", config.get("budget_ms", 50)) / 1000
+            })
+            for anchor in rule["anchors"]:
+                anchor_rules.setdefault(anchor, []).append(len(self.rules) - 1)
+
+        # Una sola expresión (en forma de trie) con todas las anclas; la búsqueda
+        # anticipada permite anclas solapadas
+        anchors = list(anchor_rules)
+        self.anchor_rules = {f"a{i}": anchor_rules[anchor] for i, anchor in enumerate(anchors)}
+        self.scanner = re.compile(f"(?={anchor_trie(anchors)})", re.IGNORECASE)
+
+    @classmethod
+    def from_file(cls, path=FIELD_RULES_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def find_anchors(self, text):
+        """Posiciones de las anclas de cada regla, en orden, en una sola pasada."""
+        positions = [[] for _ in self.rules]
+        for match in self.scanner.finditer(text):
+            for rule_idx in self.anchor_rules[match.lastgroup]:
+                if len(positions[rule_idx]) < self.max_windows:
+                    positions[rule_idx].append(match.start())
+        return positions
+
+    def extract(self, text, default="No identificado", fields=None, stats=None):
+        """Extraer los campos del texto; devuelve {campo: valor} para todas las reglas (o las indicadas).
+
+        Si se pasa ``stats`` (dict), se completa con ventanas evaluadas y tiempo por regla.
+        """
+        return self.extract_stream([text], default, fields, stats, chunk_chars=len(text))
+
+    def extract_stream(self, pieces, default="No identificado", fields=None, stats=None, chunk_chars=STREAM_CHUNK_CHARS):
+        """Igual que ``extract`` pero sobre el texto dado en trozos, sin unirlo entero.
+
+        El texto se acumula en un búfer de ``chunk_chars`` caracteres que conserva al final
+        un solape mayor que la coincidencia más larga posible: solo se evalúan las anclas
+        anteriores al solape, cuyas coincidencias no llegan al final del búfer, así que el
+        resultado es el mismo que con el texto completo.
+        """
+        selected = [i for i, rule in enumerate(self.rules) if fields is None or rule["field"] in fields]
+        results = {self.rules[i]["field"]: default for i in selected}
+        windows = {i: 0 for i in selected}
+        elapsed = {i: 0.0 for i in selected}
+        pending = set(selected)
+        # Un carácter más: "$" también coincide antes de un salto de línea final
+        overlap = max((rule["max_length"] for rule in self.rules), default=0) + 1
+
+        def scan(buffer, limit):
+            for rule_idx, positions in enumerate(self.find_anchors(buffer)):
+                if rule_idx not in pending:
+                    continue
+                rule = self.rules[rule_idx]
+                start = time.perf_counter()
+                for pos in positions:
+                    if pos >= limit or windows[rule_idx] >= self.max_windows or elapsed[rule_idx] > rule["budget"]:
+                        break
+                    windows[rule_idx] += 1
+                    match = rule["regex"].match(buffer, pos)
+                    if match:
+                        results[rule["field"]] = match.group(1).strip()[:500]
+                        pending.discard(rule_idx)
+                        break
+                    if elapsed[rule_idx] + time.perf_counter() - start > rule["budget"]:
+                        break
+                elapsed[rule_idx] += time.perf_counter() - start
+
+        buffer = ""
+        for piece in pieces:
+            buffer += piece
+            if pending and len(buffer) >= chunk_chars + overlap:
+                limit = len(buffer) - overlap
+                scan(buffer, limit)
+                buffer = buffer[limit:]
+        if pending:
+            scan(buffer, len(buffer))
+
+        if stats is not None:
+            for rule_idx in selected:
+                rule = self.rules[rule_idx]
+                stats[rule["field"]] = {
+                    "windows": windows[rule_idx],
+                    "ms": elapsed[rule_idx] * 1000,
+                    "budget_exceeded": elapsed[rule_idx] > rule["budget"]
+                }
+        return results
+
+
+_extractor = None
+
+
+def get_field_extractor():
+    """Motor de extracción compartido, cargado una sola vez desde FIELD_RULES_PATH."""
+    global _extractor
+    if _extractor is None:
+        _extractor = FieldExtractor.from_file()
+    return _extractor
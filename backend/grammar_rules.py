@@ -0,0 +1,238 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from artifacts import fingerprint
+
+# Reglas de gramática y estilo; se pueden cambiar sin tocar el código
+GRAMMAR_RULES_PATH = os.environ.get("GRAMMAR_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "grammar_rules.json"))
+# Caracteres alrededor de un token que se guardan como contexto de la observación
+GRAMMAR_CONTEXT_CHARS = 40
+
+
+class TokenArrays:
+    """Columnas de un Doc como arreglos de NumPy, más el id de oración de cada token."""
+
+    def __init__(self, doc):
+        # spaCy se importa al usarse, como en models.py
+        from spacy.attrs import IDX, IS_ALPHA, IS_LOWER, IS_PUNCT, IS_SPACE, LENGTH, LOWER, SENT_START, SPACY
+
+        # Todas las columnas con una sola llamada a to_array, en este orden
+        array = doc.to_array([LOWER, IS_ALPHA, IS_PUNCT, IS_SPACE, SPACY, SENT_START, IDX, IS_LOWER, LENGTH])
+        self.lower = array[:, 0]
+        self.alpha = array[:, 1].astype(bool)
+        self.punct = array[:, 2].astype(bool)
+        self.space = array[:, 3].astype(bool)
+        self.trailing_space = array[:, 4].astype(bool)
+        self.idx = array[:, 6].astype(np.int64)
+        self.is_lower = array[:, 7].astype(bool)
+        self.length = array[:, 8].astype(np.int64)
+        # SENT_START vale 1 en el primer token de cada oración (-1 o 0 en los demás)
+        starts = array[:, 5].astype(np.int64) == 1
+        starts[0] = True
+        self.sent_id = np.cumsum(starts) - 1
+        self.sent_starts = np.flatnonzero(starts)
+        self.sents = len(self.sent_starts)
+
+
+class GrammarEngine:
+    """Motor de reglas de gramática y estilo evaluadas sobre arreglos de tokens.
+
+    Cada Doc se exporta una sola vez con ``Doc.to_array`` y cada regla es una operación
+    vectorizada sobre esas columnas (comparaciones, ``np.isin`` y conteos por oración con
+    ``np.bincount``); solo se recorre en Python la lista de coincidencias para armar las
+    observaciones. Tipos de regla:
+
+    - ``sentence``: oraciones con al menos ``min_tokens`` palabras (o tokens de cualquier
+      clase, espacios incluidos, con ``"count": "tokens"``), que contienen alguno de
+      ``requires_any``, ninguno de ``forbids_any`` y, con ``starts_lowercase``, que empiezan
+      con minúscula. ``requires_text``/``forbids_text`` son subcadenas buscadas en el texto
+      de la oración en minúsculas; se evalúan solo sobre las oraciones que pasan lo anterior.
+    - ``repeated_token``: la misma palabra dos veces seguida (o el mismo signo de ``tokens``
+      con ``punctuation``), salvo ``exceptions``; una serie ("muy muy muy") es una sola
+      observación.
+    - ``space_before`` / ``no_space_after``: espacio antes, o falta de espacio después
+      seguido de una palabra, de los signos de ``tokens``.
+    - ``token_in``: palabras de ``words`` (en minúsculas), con su corrección sugerida.
+    """
+
+    def __init__(self, config):
+        self.version = config.get("version", 1)
+        # Versión del contenido de las reglas: las observaciones guardadas con otra se recalculan
+        self.fingerprint = fingerprint(config)
+        self.rules = [rule for rule in config["rules"] if rule.get("enabled", True)]
+        for rule in self.rules:
+            if rule["type"] not in _CHECKS:
+                raise ValueError(f"Tipo de regla gramatical desconocido: '{rule['type']}'")
+        self.hashes = None
+
+    @classmethod
+    def from_file(cls, path=GRAMMAR_RULES_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _hash_words(self, strings):
+        # Hashes de las palabras de cada regla, comparables con la columna LOWER
+        def hashes(words):
+            return np.array([strings[word.lower()] for word in words], dtype=np.uint64)
+
+        self.hashes = []
+        for rule in self.rules:
+            self.hashes.append({
+                key: hashes(rule.get(key, []))
+                for key in ("requires_any", "forbids_any", "exceptions", "tokens")
+            })
+            if rule["type"] == "token_in":
+                words = rule["words"]
+                self.hashes[-1]["words"] = hashes(words)
+                self.hashes[-1]["suggestions"] = {strings[word.lower()]: suggestion for word, suggestion in words.items()}
+
+    def check(self, doc, page_num, stats=None, text=None):
+        """Observaciones de todas las reglas sobre un Doc; ``stats`` acumula tokens y segundos.
+
+        ``text`` es el texto con el que se creó el Doc, si se tiene a mano.
+        """
+        start = time.perf_counter()
+        issues = []
+        if len(doc):
+            if self.hashes is None:
+                self._hash_words(doc.vocab.strings)
+            tokens = TokenArrays(doc)
+            # doc.text se reconstruye token a token en cada acceso
+            if text is None:
+                text = doc.text
+            for rule, hashes in zip(self.rules, self.hashes):
+                kind, matches = _CHECKS[rule["type"]](rule, hashes, tokens)
+                if kind == "sentence" and ("requires_text" in rule or "forbids_text" in rule):
+                    matches = _filter_sentence_text(rule, tokens, text, matches)
+                format_match = _format_sentence if kind == "sentence" else _format_token
+                for match in np.flatnonzero(matches):
+                    issues.append(format_match(rule, hashes, tokens, text, int(match), page_num))
+        if stats is not None:
+            stats["tokens"] = stats.get("tokens", 0) + len(doc)
+            stats["seconds"] = stats.get("seconds", 0.0) + time.perf_counter() - start
+        return issues
+
+
+def _per_sentence(tokens, mask):
+    # Número de tokens de cada oración que cumplen la máscara
+    return np.bincount(tokens.sent_id[mask], minlength=tokens.sents)
+
+
+def _sentence_text(tokens, doc_text, sent):
+    first = tokens.sent_starts[sent]
+    last = tokens.sent_starts[sent + 1] - 1 if sent + 1 < tokens.sents else len(tokens.lower) - 1
+    return doc_text[tokens.idx[first]:tokens.idx[last] + tokens.length[last]].strip()
+
+
+def _filter_sentence_text(rule, tokens, doc_text, matches):
+    # Subcadenas en el texto de la oración (como sent.text.strip().lower()), solo en las candidatas
+    matches = matches.copy()
+    for sent in np.flatnonzero(matches):
+        text = _sentence_text(tokens, doc_text, sent).lower()
+        if "requires_text" in rule and not any(value in text for value in rule["requires_text"]):
+            matches[sent] = False
+        elif any(value in text for value in rule.get("forbids_text", [])):
+            matches[sent] = False
+    return matches
+
+
+def _check_sentence(rule, hashes, tokens):
+    if rule.get("count") == "tokens":
+        counted = np.bincount(tokens.sent_id, minlength=tokens.sents)
+    else:
+        counted = _per_sentence(tokens, ~tokens.space & ~tokens.punct)
+    matches = counted >= rule.get("min_tokens", 0)
+    if len(hashes["requires_any"]):
+        matches &= _per_sentence(tokens, np.isin(tokens.lower, hashes["requires_any"])) > 0
+    if len(hashes["forbids_any"]):
+        matches &= _per_sentence(tokens, np.isin(tokens.lower, hashes["forbids_any"])) == 0
+    if rule.get("starts_lowercase"):
+        # Primer token que no es espacio de cada oración
+        content = np.flatnonzero(~tokens.space)
+        sent_ids, first = np.unique(tokens.sent_id[content], return_index=True)
+        lowercase = np.zeros(tokens.sents, dtype=bool)
+        first = content[first]
+        lowercase[sent_ids] = tokens.alpha[first] & tokens.is_lower[first]
+        matches &= lowercase
+    return "sentence", matches
+
+
+def _check_repeated_token(rule, hashes, tokens):
+    # Se comparan tokens consecutivos sin contar los saltos de línea y espacios
+    content = np.flatnonzero(~tokens.space)
+    kind = tokens.punct if rule.get("punctuation") else tokens.alpha
+    lower = tokens.lower[content]
+    repeated = (lower[1:] == lower[:-1]) & kind[content[1:]]
+    if len(hashes["tokens"]):
+        repeated &= np.isin(lower[1:], hashes["tokens"])
+    if len(hashes["exceptions"]):
+        repeated &= ~np.isin(lower[1:], hashes["exceptions"])
+    # Solo la primera repetición de cada serie
+    repeated[1:] &= ~repeated[:-1]
+    matches = np.zeros(len(tokens.lower), dtype=bool)
+    matches[content[1:][repeated]] = True
+    return "token", matches
+
+
+def _check_space_before(rule, hashes, tokens):
+    matches = np.zeros(len(tokens.lower), dtype=bool)
+    matches[1:] = np.isin(tokens.lower[1:], hashes["tokens"]) & tokens.trailing_space[:-1] & ~tokens.space[:-1]
+    return "token", matches
+
+
+def _check_no_space_after(rule, hashes, tokens):
+    matches = np.zeros(len(tokens.lower), dtype=bool)
+    matches[:-1] = np.isin(tokens.lower[:-1], hashes["tokens"]) & ~tokens.trailing_space[:-1] & tokens.alpha[1:]
+    return "token", matches
+
+
+def _check_token_in(rule, hashes, tokens):
+    return "token", np.isin(tokens.lower, hashes["words"])
+
+
+_CHECKS = {
+    "sentence": _check_sentence,
+    "repeated_token": _check_repeated_token,
+    "space_before": _check_space_before,
+    "no_space_after": _check_no_space_after,
+    "token_in": _check_token_in
+}
+
+
+def _format_sentence(rule, hashes, tokens, doc_text, sent, page_num):
+    first = tokens.sent_starts[sent]
+    last = tokens.sent_starts[sent + 1] - 1 if sent + 1 < tokens.sents else len(tokens.lower) - 1
+    text = _sentence_text(tokens, doc_text, sent)
+    count = int(np.count_nonzero(~tokens.space[first:last + 1] & ~tokens.punct[first:last + 1]))
+    return {
+        'type': rule.get("category", "Gramatical"),
+        'error': rule["message"].format(sentence=text[:100], count=count),
+        'page': page_num,
+        'context': text[:200]
+    }
+
+
+def _format_token(rule, hashes, tokens, doc_text, i, page_num):
+    start = tokens.idx[i]
+    end = start + tokens.length[i]
+    suggestion = hashes.get("suggestions", {}).get(int(tokens.lower[i]), "")
+    return {
+        'type': rule.get("category", "Gramatical"),
+        'error': rule["message"].format(token=doc_text[start:end], suggestion=suggestion),
+        'page': page_num,
+        'context': doc_text[max(0, start - GRAMMAR_CONTEXT_CHARS):end + GRAMMAR_CONTEXT_CHARS]
+    }
+
+
+_engine = None
+
+
+def get_grammar_engine():
+    """Motor de reglas compartido, cargado una sola vez desde GRAMMAR_RULES_PATH."""
+    global _engine
+    if _engine is None:
+        _engine = GrammarEngine.from_file()
+    return _engine
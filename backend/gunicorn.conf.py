@@ -0,0 +1,30 @@
+# Configuración de Gunicorn: los modelos se cargan en el proceso maestro antes del fork
+# para que todos los workers compartan su memoria. Uso: gunicorn app:app
+import os
+
+import db
+from models import report
+
+os.environ.setdefault("PRELOAD_MODELS", "1")
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("WEB_THREADS", "4"))
+timeout = int(os.environ.get("WEB_TIMEOUT", "600"))
+preload_app = True
+
+
+def when_ready(server):
+    server.log.info(f"Maestro listo: {report()}")
+
+
+def post_fork(server, worker):
+    # ensure_indexes() creó el cliente de MongoDB en el maestro; pymongo no admite usarlo tras un fork
+    db._client = None
+    # El RSS cuenta los modelos compartidos en cada worker; PSS y USS muestran lo que ocupa de verdad
+    memory = report()
+    if memory["pss_mb"] is None:
+        server.log.info(f"Worker {worker.pid} iniciado, RSS {memory['rss_mb']:.0f} MB")
+    else:
+        server.log.info(f"Worker {worker.pid} iniciado, PSS {memory['pss_mb']:.0f} MB, "
+                        f"USS {memory['uss_mb']:.0f} MB")
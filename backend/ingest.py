@@ -0,0 +1,296 @@
+"""Ingesta por lotes de un corpus de tesis.
+
+Analiza muchos PDFs con un pool de procesos, omite los documentos cuyo hash ya tiene una
+consulta guardada, escribe las consultas en MongoDB por lotes y devuelve un resumen de
+rendimiento y fallos. El avance se anota en un diario JSON Lines: si la ejecución se
+interrumpe, al relanzarla con el mismo diario se retoma donde quedó.
+
+Uso (desde backend/):
+    python ingest.py corpus/ --workers 4
+    python ingest.py corpus/ otra_carpeta/tesis.pdf --journal corpus.journal.jsonl --output resumen.json
+
+Tras cambiar reglas, diccionario o modelos, --reanalyze vuelve a analizar los documentos ya
+procesados desde sus artefactos y solo recalcula las etapas afectadas:
+    python ingest.py --reanalyze --workers 4
+    python ingest.py --reanalyze --pdf-name TS_WCQG_2022.pdf
+"""
+import argparse
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from artifacts import hash_file
+from db import analyzed_documents, consulta_document, known_hashes, save_consultas_bulk
+from metrics import DocumentMetrics
+from pdf_processor import process_pdf, reanalyze
+from upload_store import UPLOAD_FOLDER, resolve_pdf_path, store_stream
+
+# Documentos que se analizan a la vez (cada proceso carga sus propios modelos)
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "2"))
+# Consultas que se acumulan antes de cada escritura en MongoDB
+INGEST_BULK_SIZE = int(os.environ.get("INGEST_BULK_SIZE", "20"))
+INGEST_JOURNAL = os.environ.get("INGEST_JOURNAL", "ingest_journal.jsonl")
+INGEST_USER_ID = "ingest"
+# Errores de process_pdf que dejan el documento sin analizar
+FATAL_STAGES = {"extraction", "memory"}
+
+
+class IngestJournal:
+    """Diario de la ingesta: una línea por documento terminado, omitido o fallido.
+
+    Cada línea se escribe después de guardar la consulta en MongoDB y se fuerza al disco,
+    así un documento anotado como terminado nunca se pierde ni se repite.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Última línea a medio escribir de una ejecución interrumpida
+                        continue
+                    self.entries[entry["path"]] = entry
+        self.file = open(path, "a", encoding="utf-8")
+
+    def finished(self, path, stat):
+        """Entrada del documento si ya se terminó u omitió y el archivo no cambió desde entonces."""
+        entry = self.entries.get(path)
+        if entry and entry["status"] in ("done", "skipped") and entry["size"] == stat.st_size \
+                and entry["mtime"] == stat.st_mtime:
+            return entry
+        return None
+
+    def record(self, path, stat, status, **fields):
+        entry = {"path": path, "size": stat.st_size, "mtime": stat.st_mtime, "status": status, **fields}
+        self.entries[path] = entry
+        self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+def find_pdfs(paths):
+    """PDFs de las rutas indicadas; las carpetas se recorren recursivamente."""
+    pdfs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                pdfs += [os.path.join(root, name) for name in sorted(files) if name.lower().endswith(".pdf")]
+        elif path.lower().endswith(".pdf"):
+            pdfs.append(path)
+    return pdfs
+
+
+def extract_zip(file, folder=UPLOAD_FOLDER):
+    """Guardar los PDFs de un zip en el almacén por contenido de ``folder``.
+
+    Devuelve (nombre, hash, ruta, bytes) de cada PDF; el nombre es el base de la entrada,
+    sin carpetas. Lanza ValueError si una entrada .pdf no es un PDF.
+    """
+    stored = []
+    with zipfile.ZipFile(file) as archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name.lower().endswith(".pdf") or info.filename.startswith("__MACOSX/"):
+                continue
+            with archive.open(info) as src:
+                try:
+                    stored.append((name, *store_stream(src, folder)))
+                except ValueError as e:
+                    raise ValueError(f"{name}: {e}")
+    return stored
+
+
+def fatal_errors(errors):
+    """Mensajes de los errores (de DocumentMetrics) que dejan el documento sin analizar."""
+    return [error["error"] for error in errors or [] if error["stage"] in FATAL_STAGES]
+
+
+def analyze_document(pdf_path, pdf_hash, reanalysis=False):
+    """Analizar un documento en un proceso del pool; los errores se devuelven, no se lanzan.
+
+    Al reanalizar el corpus (``reanalysis``) se parte de los artefactos y el PDF solo se usa,
+    tras comprobar su hash, si hay que extraerlo de nuevo.
+    """
+    metrics = DocumentMetrics("process_pdf")
+    try:
+        if reanalysis:
+            results, observations = reanalyze(pdf_hash, pdf_path, metrics=metrics)
+        else:
+            results, observations = process_pdf(pdf_path, pdf_hash, workers=1, metrics=metrics)
+    except Exception as e:
+        return {"path": pdf_path, "pdf_hash": pdf_hash, "error": str(e), "seconds": metrics.finish()}
+    fatal = fatal_errors(metrics.errors)
+    if fatal:
+        return {"path": pdf_path, "pdf_hash": pdf_hash, "error": fatal[0], "seconds": metrics.finish()}
+    metrics.finish()
+    return {"path": pdf_path, "pdf_hash": pdf_hash, "results": results, "observations": observations,
+            "metrics": metrics.to_dict()}
+
+
+def _analyze_all(documents, workers, reanalysis=False):
+    # Resultados en el orden en que terminan; con un solo worker, en este mismo proceso
+    if workers <= 1:
+        for pdf_path, pdf_hash, _, _ in documents:
+            yield analyze_document(pdf_path, pdf_hash, reanalysis)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(analyze_document, pdf_path, pdf_hash, reanalysis)
+                   for pdf_path, pdf_hash, _, _ in documents]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _analyze_and_save(documents, workers, user_id, summary, journal=None, progress=None, reanalysis=False):
+    # Analizar los documentos (ruta, hash, nombre, stat) y guardar sus consultas por lotes
+    names = {pdf_path: pdf_name for pdf_path, _, pdf_name, _ in documents}
+    stats = {pdf_path: stat for pdf_path, _, _, stat in documents}
+    total = len(documents)
+    if progress:
+        progress(0, total)
+
+    def fail(pdf_path, pdf_hash, error):
+        summary["failed"] += 1
+        summary["failures"].append({"path": pdf_path, "error": error})
+        if journal:
+            journal.record(pdf_path, stats[pdf_path], "failed", pdf_hash=pdf_hash, error=error)
+
+    batch = []
+
+    def flush():
+        consultas = [consulta_document(names[doc["path"]], doc["results"], doc["observations"], user_id,
+                                       doc["pdf_hash"], doc["metrics"]) for doc in batch]
+        try:
+            save_consultas_bulk(consultas)
+        except Exception as e:
+            for doc in batch:
+                fail(doc["path"], doc["pdf_hash"], f"Error guardando la consulta: {str(e)}")
+        else:
+            for doc in batch:
+                summary["processed"] += 1
+                summary["pages"] += doc["metrics"]["counters"].get("pages", 0)
+                if journal:
+                    journal.record(doc["path"], stats[doc["path"]], "done", pdf_hash=doc["pdf_hash"],
+                                   seconds=doc["metrics"]["total_seconds"])
+        batch.clear()
+
+    done = 0
+    for doc in _analyze_all(documents, workers, reanalysis):
+        if "error" in doc:
+            print(f"Error analizando '{doc['path']}': {doc['error']}")
+            fail(doc["path"], doc["pdf_hash"], doc["error"])
+        else:
+            batch.append(doc)
+            if len(batch) >= INGEST_BULK_SIZE:
+                flush()
+        done += 1
+        if progress:
+            progress(done, total)
+    flush()
+
+
+def _finish_summary(summary, start):
+    seconds = time.perf_counter() - start
+    summary["seconds"] = seconds
+    summary["documents_per_second"] = summary["processed"] / seconds if seconds else None
+    summary["pages_per_second"] = summary["pages"] / seconds if seconds else None
+    return summary
+
+
+def ingest(paths, workers=None, journal_path=None, user_id=INGEST_USER_ID, progress=None, names=None):
+    """Analizar y guardar un lote de PDFs; devuelve el resumen de la ejecución.
+
+    ``names`` asocia una ruta a su nombre original (PDFs del almacén por contenido); si no,
+    se usa el nombre del archivo. Se omiten los documentos ya anotados en el diario (si se indica ``journal_path``),
+    los que ya tienen una consulta sin errores fatales con el mismo hash y los repetidos dentro del lote.
+    """
+    start = time.perf_counter()
+    journal = IngestJournal(journal_path) if journal_path else None
+    summary = {"documents": len(paths), "processed": 0, "skipped": 0, "resumed": 0, "failed": 0,
+               "pages": 0, "failures": []}
+    try:
+        pending = []
+        for pdf_path in paths:
+            stat = os.stat(pdf_path)
+            if journal and journal.finished(pdf_path, stat):
+                summary["resumed"] += 1
+                continue
+            pending.append((pdf_path, hash_file(pdf_path), stat))
+
+        # Un análisis fallido (p. ej. de /upload) no cuenta: ese documento se vuelve a analizar
+        known = known_hashes({pdf_hash for _, pdf_hash, _ in pending}, FATAL_STAGES) if pending else set()
+        documents = []
+        for pdf_path, pdf_hash, stat in pending:
+            if pdf_hash in known:
+                summary["skipped"] += 1
+                if journal:
+                    journal.record(pdf_path, stat, "skipped", pdf_hash=pdf_hash)
+                continue
+            known.add(pdf_hash)
+            documents.append((pdf_path, pdf_hash, (names or {}).get(pdf_path, os.path.basename(pdf_path)), stat))
+        _analyze_and_save(documents, workers or INGEST_WORKERS, user_id, summary, journal, progress)
+    finally:
+        if journal:
+            journal.close()
+    return _finish_summary(summary, start)
+
+
+def reanalyze_corpus(pdf_names=None, workers=None, user_id=INGEST_USER_ID, progress=None, upload_folder=UPLOAD_FOLDER):
+    """Reanalizar los documentos ya procesados (todos o los de ``pdf_names``) tras cambiar reglas o modelos.
+
+    Cada documento parte de sus artefactos y solo recalcula las etapas cuya versión cambió;
+    el PDF (del almacén de ``upload_folder``) solo hace falta si cambió la versión de la
+    extracción. Se guarda una consulta nueva por documento.
+    """
+    start = time.perf_counter()
+    analyzed = analyzed_documents(pdf_names)
+    summary = {"documents": len(analyzed), "processed": 0, "failed": 0, "pages": 0, "failures": []}
+    documents = [(resolve_pdf_path(pdf_name, pdf_hash, upload_folder), pdf_hash, pdf_name, None)
+                 for pdf_hash, pdf_name in analyzed]
+    _analyze_and_save(documents, workers or INGEST_WORKERS, user_id, summary, progress=progress, reanalysis=True)
+    return _finish_summary(summary, start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="Carpetas (se recorren recursivamente) o PDFs")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Documentos analizados a la vez")
+    parser.add_argument("--journal", default=INGEST_JOURNAL, help="Diario para retomar una ejecución interrumpida")
+    parser.add_argument("--user-id", default=INGEST_USER_ID)
+    parser.add_argument("--output", help="Guardar el resumen JSON en este archivo")
+    parser.add_argument("--reanalyze", action="store_true", help="Reanalizar los documentos ya procesados")
+    parser.add_argument("--pdf-name", nargs="*", help="Con --reanalyze, solo estos documentos")
+    args = parser.parse_args()
+    if not args.paths and not args.reanalyze:
+        parser.error("indica carpetas o PDFs, o --reanalyze")
+
+    def progress(done, total):
+        print(f"\r{done}/{total} documentos analizados", end="" if done < total else "\n", flush=True)
+
+    if args.reanalyze:
+        summary = reanalyze_corpus(args.pdf_name, args.workers, args.user_id, progress)
+    else:
+        pdfs = find_pdfs(args.paths)
+        print(f"{len(pdfs)} PDFs encontrados")
+        summary = ingest(pdfs, args.workers, args.journal, args.user_id, progress)
+    print(f"Procesados {summary['processed']}, omitidos {summary.get('skipped', 0)} (ya analizados) y "
+          f"{summary.get('resumed', 0)} (diario), fallidos {summary['failed']} en {summary['seconds']:.1f}s: "
+          f"{summary['documents_per_second'] or 0:.2f} documentos/s, {summary['pages_per_second'] or 0:.1f} páginas/s")
+    for failure in summary["failures"]:
+        print(f"  {failure['path']}: {failure['error']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+
+from db import delete_jobs, find_job, job_counts, save_job
+
+# Trabajos en segundo plano: número de workers, tamaño máximo de la cola y tiempo que se conservan
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "20"))
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", "3600"))
+
+
+class QueueFullError(Exception):
+    """La cola de trabajos está llena; el cliente debe reintentar más tarde."""
+
+
+class JobQueue:
+    """Cola acotada de trabajos atendida por un pool de hilos en segundo plano.
+
+    Cada trabajo es una función que recibe un argumento ``progress(done, total)``
+    para informar su avance; su valor de retorno queda como resultado del trabajo.
+    Con ``persist`` el estado se copia en MongoDB: un trabajo corre en el worker de gunicorn
+    que lo recibió, pero ``get`` y ``counts`` responden igual desde cualquier worker.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE, persist=True):
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.threads = []
+        self.persist = persist
+
+    def _start(self):
+        # Los hilos se crean en el primer uso (después de un posible fork del servidor)
+        if not self.threads:
+            for _ in range(self.workers):
+                thread = threading.Thread(target=self._work, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, fn, *args, **kwargs):
+        """Encolar un trabajo y devolver su id; lanza QueueFullError si no hay espacio."""
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "state": "queued",
+            "progress": {"done": 0, "total": None},
+            "result": None,
+            "error": None,
+            "created": time.time(),
+            "started": None,
+            "finished": None
+        }
+        with self.lock:
+            self._start()
+            self._prune()
+            # Solo se encola bajo el lock, así la cola no puede llenarse entre la comprobación y el put
+            if self.queue.full():
+                raise QueueFullError("La cola de trabajos está llena")
+            self.jobs[job_id] = job
+            # Guardado antes de encolar para que el estado "running" no quede pisado por "queued"
+            self._save(_copy(job))
+            self.queue.put_nowait((job_id, fn, args, kwargs))
+        return job_id
+
+    def get(self, job_id):
+        """Copia del estado de un trabajo, o None si no existe."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job:
+                return _copy(job)
+        if self.persist:
+            # Trabajo de otro worker del servidor
+            try:
+                return find_job(job_id)
+            except Exception:
+                return None
+        return None
+
+    def counts(self):
+        """Número de trabajos conservados por estado (de todos los workers si se guardan en MongoDB)."""
+        if self.persist:
+            try:
+                return job_counts()
+            except Exception:
+                pass
+        with self.lock:
+            states = {}
+            for job in self.jobs.values():
+                states[job["state"]] = states.get(job["state"], 0) + 1
+            return states
+
+    def _save(self, job):
+        if self.persist:
+            try:
+                save_job(job)
+            except Exception:
+                pass  # save_job ya registró el error; el estado sigue disponible en este worker
+
+    def _update(self, job_id, **fields):
+        with self.lock:
+            job = self.jobs[job_id]
+            job.update(fields)
+            snapshot = _copy(job)
+        # Las actualizaciones de un trabajo vienen siempre de su hilo, en orden
+        self._save(snapshot)
+
+    def _prune(self):
+        limit = time.time() - JOB_TTL_SECONDS
+        for job_id in [j for j, job in self.jobs.items() if job["finished"] and job["finished"] < limit]:
+            del self.jobs[job_id]
+        if self.persist:
+            try:
+                delete_jobs(limit)
+            except Exception:
+                pass
+
+    def _work(self):
+        while True:
+            job_id, fn, args, kwargs = self.queue.get()
+
+            def progress(done, total, job_id=job_id):
+                self._update(job_id, progress={"done": done, "total": total})
+
+            self._update(job_id, state="running", started=time.time())
+            try:
+                result = fn(*args, progress=progress, **kwargs)
+                self._update(job_id, state="done", result=result, finished=time.time())
+            except Exception as e:
+                traceback.print_exc()
+                self._update(job_id, state="failed", error=str(e), finished=time.time())
+            finally:
+                self.queue.task_done()
+
+
+def _copy(job):
+    return {**job, "progress": dict(job["progress"])}
+
+
+job_queue = JobQueue()
@@ -0,0 +1,181 @@
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Perfilado por solicitud: activarlo para todas (PROFILE_REQUESTS=1) o con ?profile=1
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS") == "1"
+PROFILE_FOLDER = os.environ.get("PROFILE_FOLDER", "profiles")
+# Límites (segundos) de los histogramas de duración por etapa
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value):
+    # Escapes del formato de texto de Prometheus para valores de etiquetas
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items())) + "}"
+
+
+class Registry:
+    """Contadores e histogramas del proceso en formato de texto de Prometheus.
+
+    Con varios workers de gunicorn cada proceso tiene su propio registro.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+
+    def inc(self, name, value=1, help="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.help.setdefault(name, help)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, help="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.help.setdefault(name, help)
+            buckets, total, count = self.histograms.get(key, ([0] * len(STAGE_BUCKETS), 0.0, 0))
+            buckets = [n + (value <= bound) for n, bound in zip(buckets, STAGE_BUCKETS)]
+            self.histograms[key] = (buckets, total + value, count + 1)
+
+    def render(self, gauges=None):
+        """Texto de exposición de Prometheus con los contadores, histogramas y gauges indicados."""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+            help = dict(self.help)
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {name} {help.get(name, '')}", f"# TYPE {name} counter"]
+            lines.append(f"{name}{_labels(dict(labels))} {value}")
+        for (name, labels), (buckets, total, count) in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {name} {help.get(name, '')}", f"# TYPE {name} histogram"]
+            for bound, n in zip(STAGE_BUCKETS, buckets):
+                lines.append(f"{name}_bucket{_labels({**dict(labels), 'le': bound})} {n}")
+            lines.append(f"{name}_bucket{_labels({**dict(labels), 'le': '+Inf'})} {count}")
+            lines.append(f"{name}_sum{_labels(dict(labels))} {total}")
+            lines.append(f"{name}_count{_labels(dict(labels))} {count}")
+        for name, (value, gauge_help) in (gauges or {}).items():
+            lines += [f"# HELP {name} {gauge_help}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class DocumentMetrics:
+    """Tiempos por etapa y contadores de una operación (análisis de un PDF o una pregunta).
+
+    Cada etapa y contador se publica también en el registro del proceso; ``to_dict``
+    devuelve el desglose que se guarda junto a la consulta.
+    """
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.stages = {}
+        self.counters = {}
+        self.tags = {}
+        self.errors = []
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def span(self, stage):
+        """Medir el bloque como la etapa ``stage`` (los tiempos de una etapa repetida se suman)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def add_time(self, stage, seconds):
+        """Registrar segundos medidos en otro lugar (p. ej. en los procesos de extracción)."""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        registry.observe("analyzer_stage_seconds", seconds, "Duración de cada etapa del análisis",
+                         operation=self.operation, stage=stage)
+
+    def count(self, name, value=1):
+        if not value:
+            return
+        self.counters[name] = self.counters.get(name, 0) + value
+        registry.inc(f"analyzer_{name}_total", value, f"Total acumulado de '{name}'")
+
+    def tag(self, key, value):
+        """Anotar un atributo de la operación, p. ej. de dónde salió la respuesta de una pregunta."""
+        self.tags[key] = value
+        registry.inc(f"analyzer_{self.operation}_{key}_total", 1, f"Operaciones {self.operation} por {key}",
+                     **{key: value})
+
+    def error(self, stage, message):
+        self.errors.append({"stage": stage, "error": message})
+        registry.inc("analyzer_errors_total", 1, "Errores por etapa", operation=self.operation, stage=stage)
+
+    def finish(self):
+        """Cerrar la operación y publicar su duración total."""
+        seconds = time.perf_counter() - self.started
+        registry.inc("analyzer_operations_total", 1, "Operaciones completadas", operation=self.operation)
+        registry.observe("analyzer_operation_seconds", seconds, "Duración total de cada operación",
+                         operation=self.operation)
+        return seconds
+
+    def to_dict(self):
+        return {
+            "total_seconds": time.perf_counter() - self.started,
+            "stages": dict(self.stages),
+            "counters": dict(self.counters),
+            "tags": dict(self.tags),
+            "errors": list(self.errors)
+        }
+
+
+@contextmanager
+def profiled(label, enabled=PROFILE_REQUESTS):
+    """Perfilar el bloque y guardar el reporte en PROFILE_FOLDER.
+
+    Usa pyinstrument (perfilador por muestreo, reporte HTML) si está instalado y si no
+    cProfile (archivo .prof para snakeviz o pstats). Entrega un dict con la ruta ``path``.
+    """
+    info = {"path": None}
+    if not enabled:
+        yield info
+        return
+    try:
+        # Dependencia opcional: pip install pyinstrument
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+    os.makedirs(PROFILE_FOLDER, exist_ok=True)
+    name = "".join(c if c.isalnum() or c in "-_." else "_" for c in label)
+    base = os.path.join(PROFILE_FOLDER, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}")
+    profiler = Profiler() if Profiler else cProfile.Profile()
+    if Profiler:
+        profiler.start()
+    else:
+        profiler.enable()
+    try:
+        yield info
+    finally:
+        if Profiler:
+            profiler.stop()
+            info["path"] = f"{base}.html"
+            with open(info["path"], "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        else:
+            profiler.disable()
+            info["path"] = f"{base}.prof"
+            profiler.dump_stats(info["path"])
+        print(f"Perfil de '{label}' guardado en {info['path']}")
@@ -0,0 +1,108 @@
+import gc
+import os
+import resource
+import threading
+import time
+
+# Registro de modelos: se cargan una sola vez por proceso y solo cuando se usan
+SPACY_MODEL = os.environ.get("SPACY_MODEL", "es_core_news_md")
+# Componentes de spaCy que no se usan: solo hacen falta NER (entidades) y oraciones (gramática).
+# En es_core_news_md el NER tiene su propio tok2vec, por eso el compartido también se excluye.
+SPACY_EXCLUDE = os.environ.get("SPACY_EXCLUDE", "tok2vec,morphologizer,parser,attribute_ruler,lemmatizer")
+
+_models = {}
+_load_seconds = {}
+_lock = threading.Lock()
+_process_start = time.time()
+
+
+def _load_nlp():
+    import spacy
+    nlp = spacy.load(SPACY_MODEL, exclude=[name for name in SPACY_EXCLUDE.split(",") if name])
+    if not any(name in nlp.pipe_names for name in ("parser", "senter", "sentencizer")):
+        # Segmentación de oraciones por puntuación en lugar del parser de dependencias
+        nlp.add_pipe("sentencizer")
+    return nlp
+
+
+def _load_qa_pipeline():
+    from qa_engine import load_qa_pipeline
+    return load_qa_pipeline()
+
+
+_loaders = {
+    "nlp": _load_nlp,
+    "qa": _load_qa_pipeline
+}
+
+
+def get_model(name):
+    """Devolver el modelo indicado, cargándolo en el primer uso."""
+    model = _models.get(name)
+    if model is None:
+        with _lock:
+            model = _models.get(name)
+            if model is None:
+                start = time.perf_counter()
+                model = _loaders[name]()
+                _load_seconds[name] = time.perf_counter() - start
+                _models[name] = model
+                print(f"Modelo '{name}' cargado en {_load_seconds[name]:.1f}s (RSS {rss_mb():.0f} MB)")
+    return model
+
+
+def get_nlp():
+    return get_model("nlp")
+
+
+def get_qa_pipeline():
+    return get_model("qa")
+
+
+def preload():
+    """Cargar todos los modelos antes de crear los workers del servidor.
+
+    Tras la carga se congela el recolector de basura para que los objetos de los
+    modelos no se reescriban en los workers y sus páginas se compartan (copy-on-write).
+    """
+    for name in _loaders:
+        get_model(name)
+    gc.freeze()
+
+
+def rss_mb():
+    """Memoria residente actual del proceso en MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        # Sin /proc (macOS): usar el pico de memoria, en bytes en macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024)
+
+
+def shared_memory_mb(path="/proc/self/smaps_rollup"):
+    """PSS y USS del proceso en MB; None si el sistema no expone smaps_rollup.
+
+    Con workers que comparten los modelos del maestro, el RSS cuenta las páginas compartidas
+    en cada worker; el PSS las reparte entre los procesos y el USS cuenta solo las propias.
+    """
+    try:
+        with open(path) as f:
+            fields = {line.split(":")[0]: int(line.split()[1]) for line in f if line.endswith("kB\n")}
+    except (OSError, ValueError, IndexError):
+        return {"pss_mb": None, "uss_mb": None}
+    return {"pss_mb": fields.get("Pss", 0) / 1024,
+            "uss_mb": (fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024}
+
+
+def report():
+    """Estado de los modelos y de la memoria del proceso."""
+    return {
+        "pid": os.getpid(),
+        "uptime_seconds": time.time() - _process_start,
+        "models_loaded": sorted(_models),
+        "load_seconds": dict(_load_seconds),
+        "rss_mb": rss_mb(),
+        **shared_memory_mb(),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
@@ -0,0 +1,106 @@
+import importlib.metadata
+import json
+import os
+import time
+from collections import namedtuple
+
+from artifacts import fingerprint, iter_segments, stored_stage
+from grammar_rules import get_grammar_engine
+from models import SPACY_EXCLUDE, SPACY_MODEL, get_nlp
+
+# Análisis con nlp.pipe: documentos por lote y procesos (n_process) de spaCy
+NLP_BATCH_SIZE = int(os.environ.get("NLP_BATCH_SIZE", "32"))
+NLP_PROCESSES = int(os.environ.get("NLP_PROCESSES", "1"))
+
+# Caracteres previos a cada entidad que se guardan como contexto (en minúsculas)
+ENTITY_CONTEXT_CHARS = 50
+
+# Entidad con su posición en el texto del documento ("\n".join de los segmentos) y el texto
+# que la precede, para no tener que reconstruir el documento completo
+Entity = namedtuple("Entity", ["label_", "text", "start_char", "end_char", "page", "context"], defaults=[""])
+
+
+def _segments_with_context(pages):
+    """Pares (segmento, (página, desplazamiento, texto previo, segmento)) recorriendo las páginas una sola vez.
+
+    El segmento va también en el contexto porque doc.text se reconstruye token a token.
+    """
+    offset = 0
+    tail = ""
+    for page in pages:
+        for segment in iter_segments([page]):
+            yield segment, (page["page"], offset, tail, segment)
+            offset += len(segment) + 1
+            tail = f"{tail}{segment}\n"[-ENTITY_CONTEXT_CHARS:]
+
+
+def run_nlp(pages, grammar=True, stats=None):
+    """Analizar cada segmento (texto de página y OCR) una sola vez con nlp.pipe.
+
+    Devuelve las observaciones gramaticales (motor de reglas de grammar_rules.json) y las
+    entidades de todo el documento, con posiciones relativas al texto completo, para no
+    volver a analizarlo entero. Las páginas se recorren una sola vez, así que pueden venir
+    de un generador o del disco. Con ``stats`` se devuelven ahí los segmentos analizados y
+    el rendimiento (docs/s de spaCy, tokens/s del motor de reglas).
+    """
+    nlp = get_nlp()
+    engine = get_grammar_engine()
+    grammar_stats = {}
+    observations = []
+    entities = []
+    segments = 0
+    start = time.perf_counter()
+    docs = nlp.pipe(_segments_with_context(pages), as_tuples=True, batch_size=NLP_BATCH_SIZE, n_process=NLP_PROCESSES)
+    for doc, (page_num, offset, tail, text) in docs:
+        segments += 1
+        if grammar:
+            observations.extend(engine.check(doc, page_num, grammar_stats, text))
+        for ent in doc.ents:
+            context = f"{tail}{text[:ent.start_char]}"[-ENTITY_CONTEXT_CHARS:].lower()
+            entities.append(Entity(ent.label_, ent.text, offset + ent.start_char, offset + ent.end_char, page_num, context))
+    elapsed = time.perf_counter() - start
+    grammar_seconds = grammar_stats.get("seconds", 0.0)
+    if stats is not None:
+        stats.update({"docs": segments, "seconds": elapsed,
+                      "docs_per_second": segments / elapsed if elapsed else 0.0,
+                      "grammar_tokens": grammar_stats.get("tokens", 0), "grammar_seconds": grammar_seconds,
+                      "grammar_tokens_per_second": grammar_stats.get("tokens", 0) / grammar_seconds if grammar_seconds else 0.0,
+                      "grammar_rules": len(engine.rules) if grammar else 0})
+    return observations, entities
+
+
+def _model_version():
+    # Versión del paquete del modelo, o la de su meta.json si se carga desde una carpeta
+    try:
+        return importlib.metadata.version(SPACY_MODEL)
+    except (importlib.metadata.PackageNotFoundError, ValueError):
+        meta_path = os.path.join(SPACY_MODEL, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                return json.load(f).get("version")
+        return None
+
+
+def nlp_version():
+    """Versión de la etapa de spaCy (modelo, componentes y reglas gramaticales), sin cargar el modelo."""
+    return fingerprint(SPACY_MODEL, _model_version(), SPACY_EXCLUDE, ENTITY_CONTEXT_CHARS,
+                       get_grammar_engine().fingerprint)
+
+
+def nlp_stage_data(observations, entities):
+    """Resultado de run_nlp tal como se guarda en la etapa "nlp" del artefacto."""
+    return {"observations": observations, "entities": [list(ent) for ent in entities]}
+
+
+def load_nlp_stage(artifacts):
+    """(observaciones gramaticales, entidades) guardadas con la versión actual, o None."""
+    data = stored_stage(artifacts, "nlp", nlp_version())
+    if data is None:
+        return None
+    return data["observations"], [Entity(*ent) for ent in data["entities"]]
+
+
+def load_entities(artifacts):
+    """Entidades guardadas con la versión actual de la etapa, o None si hay que calcularlas."""
+    stage = load_nlp_stage(artifacts)
+    return stage[1] if stage else None
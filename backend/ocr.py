@@ -0,0 +1,244 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+import pytesseract
+from PIL import Image
+
+from artifacts import fingerprint
+
+# Caché de OCR por imagen (hash de los bytes del stream): en memoria y en disco
+OCR_CACHE_FOLDER = os.environ.get("OCR_CACHE_FOLDER", "ocr_cache")
+OCR_MEMORY_CACHE_SIZE = int(os.environ.get("OCR_MEMORY_CACHE_SIZE", "512"))
+# Reglas para omitir imágenes sin texto útil: lado mínimo, área mínima (px) y entropía mínima (bits)
+OCR_MIN_SIDE = int(os.environ.get("OCR_MIN_SIDE", "32"))
+OCR_MIN_AREA = int(os.environ.get("OCR_MIN_AREA", "10000"))
+OCR_MIN_ENTROPY = float(os.environ.get("OCR_MIN_ENTROPY", "1.0"))
+# OCR de las imágenes incrustadas: preprocesamiento, idioma y configuración de Tesseract
+IMAGE_PREPROCESS = "adaptive_threshold+nlmeans"
+OCR_LANG = "spa"
+IMAGE_OCR_CONFIG = "--psm 6 --dpi 300"
+# Las entradas de la caché dependen de esa configuración: al cambiarla no se reutilizan
+OCR_CACHE_SETTINGS = fingerprint(IMAGE_PREPROCESS, OCR_LANG, IMAGE_OCR_CONFIG, OCR_MIN_ENTROPY)
+
+# Clasificación de páginas: densidad mínima de texto (caracteres por pulgada cuadrada) para
+# considerar que la página tiene capa de texto, y cobertura de imágenes (fracción de la página)
+PAGE_MIN_TEXT_DENSITY = float(os.environ.get("PAGE_MIN_TEXT_DENSITY", "2"))
+PAGE_SCANNED_COVERAGE = float(os.environ.get("PAGE_SCANNED_COVERAGE", "0.3"))
+PAGE_MIXED_COVERAGE = float(os.environ.get("PAGE_MIXED_COVERAGE", "0.15"))
+# Resolución del OCR de página completa: ancho objetivo en píxeles (A4 a 300 dpi) y límites
+OCR_TARGET_WIDTH_PX = int(os.environ.get("OCR_TARGET_WIDTH_PX", "2480"))
+OCR_MIN_DPI = int(os.environ.get("OCR_MIN_DPI", "150"))
+OCR_MAX_DPI = int(os.environ.get("OCR_MAX_DPI", "400"))
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def preprocess_image(image, fast=False):
+    """Preprocesar imagen para mejorar el OCR.
+
+    Con ``fast`` (páginas rasterizadas completas) el ruido del umbral se quita con un filtro
+    de mediana: fastNlMeansDenoising tarda unos 12 s en una página A4 a 300 dpi.
+    """
+    try:
+        gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
+        thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+        denoised = cv2.medianBlur(thresh, 3) if fast else cv2.fastNlMeansDenoising(thresh)
+        return Image.fromarray(denoised)
+    except Exception as e:
+        return image
+
+
+def _cache_path(key):
+    return os.path.join(OCR_CACHE_FOLDER, key[:2], f"{key}.json")
+
+
+def cache_get(key):
+    """Entrada de la caché para una clave (imagen y configuración), primero en memoria y luego en disco."""
+    with _memory_lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            _memory.move_to_end(key)
+            return entry
+    path = _cache_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+    except Exception:
+        return None
+    _remember(key, entry)
+    return entry
+
+
+def cache_put(key, entry):
+    _remember(key, entry)
+    path = _cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Un temporal propio por escritor (hilo o proceso); solo os.replace publica la entrada
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", prefix=f"{key}.", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    except Exception as e:
+        print(f"Error guardando caché de OCR: {e}")
+
+
+def _remember(key, entry):
+    with _memory_lock:
+        _memory[key] = entry
+        _memory.move_to_end(key)
+        if len(_memory) > OCR_MEMORY_CACHE_SIZE:
+            _memory.popitem(last=False)
+
+
+def clear_memory_cache():
+    """Vaciar la caché de OCR en memoria (la de disco se conserva)."""
+    with _memory_lock:
+        _memory.clear()
+
+
+def skip_reason(width, height):
+    """Motivo para omitir una imagen por su tamaño, o None si debe procesarse."""
+    if width < OCR_MIN_SIDE or height < OCR_MIN_SIDE or width * height < OCR_MIN_AREA:
+        return "tamaño"
+    return None
+
+
+def ocr_image(img):
+    """OCR de una imagen de pdfplumber usando la caché y las reglas de omisión.
+
+    Devuelve el registro de la imagen: ``ocr`` con el texto (o ``skipped`` con el motivo),
+    el ``hash`` del stream y ``cache`` ("hit", "miss" o "skip") con los segundos de OCR
+    gastados (``seconds``, de ellos ``preprocess_seconds`` en el preprocesamiento) o
+    ahorrados (``saved_seconds``).
+    """
+    width, height = img.get("srcsize") or (img["width"], img["height"])
+    reason = skip_reason(width, height)
+    if reason:
+        return {"skipped": reason, "cache": "skip"}
+
+    stream = img['stream']
+    raw_data = stream.get_rawdata() or stream.get_data()
+    image_hash = hashlib.sha256(raw_data).hexdigest()
+    cache_key = f"{image_hash}-{OCR_CACHE_SETTINGS}"
+    entry = cache_get(cache_key)
+    if entry is not None:
+        record = {"hash": image_hash, "cache": "hit", "saved_seconds": entry.get("seconds", 0.0)}
+        if "skipped" in entry:
+            record["skipped"] = entry["skipped"]
+        else:
+            record["ocr"] = entry["text"]
+        return record
+
+    start = time.perf_counter()
+    image = Image.open(io.BytesIO(stream.get_data())).convert('RGB')
+    if image.convert('L').entropy() < OCR_MIN_ENTROPY:
+        entry = {"skipped": "entropía", "seconds": time.perf_counter() - start}
+        cache_put(cache_key, entry)
+        return {"hash": image_hash, "skipped": "entropía", "cache": "skip"}
+    preprocess_start = time.perf_counter()
+    image = preprocess_image(image)
+    preprocess_seconds = time.perf_counter() - preprocess_start
+    ocr_text = pytesseract.image_to_string(image, lang=OCR_LANG, config=IMAGE_OCR_CONFIG)
+    seconds = time.perf_counter() - start
+    cache_put(cache_key, {"text": ocr_text, "seconds": seconds})
+    return {"ocr": ocr_text, "hash": image_hash, "cache": "miss", "seconds": seconds,
+            "preprocess_seconds": preprocess_seconds}
+
+
+def ocr_report(pages):
+    """Estadísticas de OCR de un documento a partir de los registros de sus imágenes.
+
+    Recorre las páginas una sola vez, así que pueden venir de un generador o del disco.
+    """
+    kinds = {}
+    counts = {"images": 0, "hit": 0, "miss": 0, "skip": 0, "errors": 0}
+    ocr_seconds = preprocess_seconds = saved_seconds = 0.0
+    for page in pages:
+        # Artefactos anteriores a la clasificación: se hacía OCR de todas las imágenes
+        kind = page.get("kind", "mixed")
+        kinds[kind] = kinds.get(kind, 0) + 1
+        for img in page["images"]:
+            counts["images"] += 1
+            if img.get("cache") in counts:
+                counts[img["cache"]] += 1
+            if "error" in img:
+                counts["errors"] += 1
+            ocr_seconds += img.get("seconds", 0.0)
+            preprocess_seconds += img.get("preprocess_seconds", 0.0)
+            saved_seconds += img.get("saved_seconds", 0.0)
+    hits, misses = counts["hit"], counts["miss"]
+    return {
+        "pages_by_kind": kinds,
+        "images": counts["images"],
+        "ocr_calls": misses,
+        "cache_hits": hits,
+        "skipped": counts["skip"],
+        "errors": counts["errors"],
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        "ocr_seconds": ocr_seconds,
+        "preprocess_seconds": preprocess_seconds,
+        "saved_seconds": saved_seconds
+    }
+
+
+def image_coverage(page):
+    """Fracción del área de la página cubierta por imágenes (recortadas a la página)."""
+    page_area = float(page.width * page.height) or 1.0
+    covered = 0.0
+    for img in page.images:
+        width = min(img["x1"], page.width) - max(img["x0"], 0)
+        height = min(img["bottom"], page.height) - max(img["top"], 0)
+        if width > 0 and height > 0:
+            covered += width * height
+    return min(covered / page_area, 1.0)
+
+
+def classify_page(page, text):
+    """Clasificar una página según su capa de texto y la cobertura de imágenes.
+
+    - "digital": tiene capa de texto y pocas imágenes; se usa solo el texto.
+    - "mixed": tiene capa de texto e imágenes relevantes; se hace OCR de las imágenes.
+    - "scanned": casi sin texto y cubierta por imágenes; se rasteriza y se hace OCR de la página.
+    - "blank": sin texto ni imágenes relevantes.
+    """
+    square_inches = float(page.width * page.height) / (72 * 72) or 1.0
+    density = len(text.strip()) / square_inches
+    coverage = image_coverage(page)
+    if density >= PAGE_MIN_TEXT_DENSITY:
+        return "mixed" if coverage >= PAGE_MIXED_COVERAGE else "digital"
+    return "scanned" if coverage >= PAGE_SCANNED_COVERAGE else "blank"
+
+
+def page_dpi(page):
+    """Resolución para rasterizar la página según su ancho (en puntos)."""
+    dpi = OCR_TARGET_WIDTH_PX / (float(page.width) / 72)
+    return int(max(OCR_MIN_DPI, min(OCR_MAX_DPI, dpi)))
+
+
+def ocr_page(page):
+    """Rasterizar la página completa a una resolución adaptada a su tamaño y hacer OCR."""
+    dpi = page_dpi(page)
+    start = time.perf_counter()
+    image = page.to_image(resolution=dpi).original.convert('RGB')
+    preprocess_start = time.perf_counter()
+    image = preprocess_image(image, fast=True)
+    preprocess_seconds = time.perf_counter() - preprocess_start
+    ocr_text = pytesseract.image_to_string(image, lang=OCR_LANG, config=f'--psm 6 --dpi {dpi}')
+    return {"ocr": ocr_text, "source": "page", "dpi": dpi, "cache": "miss", "seconds": time.perf_counter() - start,
+            "preprocess_seconds": preprocess_seconds}
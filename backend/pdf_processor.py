@@ -1,241 +1,436 @@
+import gc
+import multiprocessing
 import pdfplumber
-import pytesseract
-from PIL import Image
-import io
-import re
 import os
 import cv2
 import numpy as np
-import spacy
-from transformers import pipeline
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-from pymongo import MongoClient
+from db import latest_consulta
+from collections import deque
+from artifacts import (ArtifactWriter, StoredPages, append_artifact_fields, append_stage, document_segments,
+                       hash_file, iter_text, load_artifacts, save_artifacts, stored_stage)
+from retrieval import clear_passage_indexes, get_passage_index
+from qa_engine import FIELD_QUESTIONS, answer_questions, qa_version
+from models import get_qa_pipeline, rss_mb
+from nlp_stage import ENTITY_CONTEXT_CHARS, load_entities, load_nlp_stage, nlp_stage_data, nlp_version, run_nlp
+from field_rules import get_field_extractor
+from spelling import get_spelling_checker
+from ocr import classify_page, clear_memory_cache, ocr_image, ocr_page, ocr_report
+from metrics import DocumentMetrics
+from answer_cache import answer_cache
+from upload_store import resolve_pdf_path
+
+# Extracción en paralelo: número de procesos y páginas por tarea
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "1"))
+PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", "4"))
+# Cómo se crean esos procesos: forkserver (o spawn) no hereda los hilos, locks ni conexiones
+# del servidor, que pueden quedar tomados en el hijo si se hace fork desde un hilo
+PDF_POOL_START_METHOD = os.environ.get("PDF_POOL_START_METHOD", "forkserver")
+# Modo streaming para PDFs muy grandes: "1" siempre, "0" nunca, "auto" desde PDF_STREAMING_MIN_PAGES páginas
+PDF_STREAMING = os.environ.get("PDF_STREAMING", "auto")
+PDF_STREAMING_MIN_PAGES = int(os.environ.get("PDF_STREAMING_MIN_PAGES", "300"))
+# Techo de memoria residente (MB) del proceso en modo streaming; 0 para no limitar
+STREAMING_MAX_RSS_MB = float(os.environ.get("STREAMING_MAX_RSS_MB", "0"))
+
+# Palabras clave de las validaciones específicas de process_pdf
+VALIDATION_KEYWORDS = ["tingo maría", "finanzas", "no experimental", "ex post facto", "longitudinal", "2022",
+                       "weslay chain", "ratios financieras"]
+# Versión de la extracción (texto con pdfplumber y OCR): subirla al cambiarla obliga a extraer de
+# nuevo cada documento; las demás etapas se versionan solas con sus reglas y modelos
+EXTRACTION_VERSION = 1
+
+# Campos del análisis de una tesis, en el orden de la hoja de resultados
+RESULT_FIELDS = (
+    "Marca temporal",
+    "Dirección de correo electrónico",
+    "Título de la tesis",
+    "Link de la tesis",
+    "Asesor",
+    "Jurado 1",
+    "Jurado 2",
+    "Jurado 3",
+    "Lugar",
+    "Quienes (Sujetos de estudio)",
+    "Variable dependiente",
+    "Variable independiente",
+    "Enfoque",
+    "Nivel o alcance",
+    "Diseño de investigación",
+    "Problema general",
+    "Problema específico 1",
+    "Problema específico 2",
+    "Problema específico 3",
+    "Problema específico 4",
+    "Objetivo específico 1",
+    "Objetivo específico 2",
+    "Objetivo específico 3",
+    "Objetivo específico 4",
+    "Hipótesis general",
+    "Hipótesis específica 1",
+    "Hipótesis específica 2",
+    "Hipótesis específica 3",
+    "Hipótesis específica 4",
+    "Línea de investigación",
+    "Descripción de la población",
+    "Cantidad de la población",
+    "Cantidad de la muestra",
+    "Prueba estadística",
+    "Fecha de publicación",
+    "Tipo de observación",
+    "Detalle de la observación",
+    "Número de página de la observación"
+)
+
+
+class MemoryCeilingError(MemoryError):
+    """La memoria residente superó STREAMING_MAX_RSS_MB aun después de liberar cachés."""
+
+
+def extract_page(page, page_num):
+    """Extraer el texto de una página y hacer OCR solo donde hace falta.
+
+    Las páginas digitales usan su capa de texto; en las mixtas se hace OCR de las
+    imágenes y las escaneadas se rasterizan completas para el OCR.
+    """
+    text = page.extract_text() or ""
+    kind = classify_page(page, text)
+    images = []
+    if kind == "mixed":
+        for img in page.images:
+            try:
+                images.append(ocr_image(img))
+            except Exception as e:
+                images.append({"error": str(e)})
+    elif kind == "scanned":
+        try:
+            images.append(ocr_page(page))
+        except Exception as e:
+            images.append({"error": str(e)})
+    return {"page": page_num, "text": text, "kind": kind, "images": images}
 
-# Cargar modelos
-nlp = spacy.load("es_core_news_md")
-qa_pipeline = pipeline("question-answering", model="dccuchile/bert-base-spanish-wwm-uncased", tokenizer="dccuchile/bert-base-spanish-wwm-uncased")
 
+def release_page(page):
+    """Liberar la caché de caracteres y layout de una página de pdfplumber ya procesada."""
+    close = getattr(page, "close", None) or page.flush_cache
+    close()
 
-def get_db():
-    """Conectar a MongoDB."""
-    try:
-        client = MongoClient("mongodb://localhost:27017/")
-        db = client["tesis_analizador"]
-        return db
-    except Exception as e:
-        print(f"Error conectando a MongoDB: {e}")
-        raise
 
+def extract_pages(pdf_path):
+    """Extraer texto y OCR de todas las páginas del PDF."""
+    pages = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_num, page in enumerate(pdf.pages, 1):
+            pages.append(extract_page(page, page_num))
+            release_page(page)
+    return pages
 
-def preprocess_image(image):
-    """Preprocesar imagen para mejorar el OCR."""
-    try:
-        gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
-        thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-        denoised = cv2.fastNlMeansDenoising(thresh)
-        return Image.fromarray(denoised)
-    except Exception as e:
-        return image
-
-
-def detect_grammar_issues(doc, page_num):
-    """Detectar problemas gramaticales como falta de comas."""
-    issues = []
-    for sent in doc.sents:
-        text = sent.text.strip()
-        if len(sent) > 10 and ',' not in text and ' y ' in text.lower():
-            issues.append({
-                'type': 'Gramatical',
-                'error': f"Falta de coma en oración larga: '{text[:100]}...'",
+
+def count_pages(pdf_path):
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def analyze_page(page):
+    """Detectar errores ortográficos en el texto y OCR de una página (la gramática va en run_nlp)."""
+    observations = []
+    page_num = page["page"]
+    page_text = page["text"]
+
+    # Detectar errores ortográficos y falta de tildes (todas las apariciones)
+    observations.extend(get_spelling_checker().observations(page_text, page_num))
+
+    # Procesar texto de las imágenes
+    for img in page["images"]:
+        if "error" in img:
+            observations.append({
+                'type': 'Procesamiento',
+                'error': f"Error al procesar imagen en página {page_num}: {img['error']}",
                 'page': page_num,
-                'context': text[:200]
+                'context': ''
             })
-    return issues
-
-
-def process_pdf(pdf_path):
-    results = {
-        "Marca temporal": "",
-        "Dirección de correo electrónico": "",
-        "Título de la tesis": "",
-        "Link de la tesis": "",
-        "Asesor": "",
-        "Jurado 1": "",
-        "Jurado 2": "",
-        "Jurado 3": "",
-        "Lugar": "",
-        "Quienes (Sujetos de estudio)": "",
-        "Variable dependiente": "",
-        "Variable independiente": "",
-        "Enfoque": "",
-        "Nivel o alcance": "",
-        "Diseño de investigación": "",
-        "Problema general": "",
-        "Problema específico 1": "",
-        "Problema específico 2": "",
-        "Problema específico 3": "",
-        "Problema específico 4": "",
-        "Objetivo específico 1": "",
-        "Objetivo específico 2": "",
-        "Objetivo específico 3": "",
-        "Objetivo específico 4": "",
-        "Hipótesis general": "",
-        "Hipótesis específica 1": "",
-        "Hipótesis específica 2": "",
-        "Hipótesis específica 3": "",
-        "Hipótesis específica 4": "",
-        "Línea de investigación": "",
-        "Descripción de la población": "",
-        "Cantidad de la población": "",
-        "Cantidad de la muestra": "",
-        "Prueba estadística": "",
-        "Fecha de publicación": "",
-        "Tipo de observación": "",
-        "Detalle de la observación": "",
-        "Número de página de la observación": ""
-    }
+            continue
+        if "ocr" not in img:
+            # Imagen omitida por tamaño o entropía
+            continue
+        ocr_text = img["ocr"]
+        # Detectar errores en texto de imágenes
+        observations.extend(get_spelling_checker().observations(ocr_text, page_num, in_image=True))
+    return observations
+
+
+def init_worker():
+    """Limitar los hilos de OpenCV y Tesseract y cargar el corrector en cada proceso del pool."""
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    cv2.setNumThreads(1)
+    get_spelling_checker()
+
+
+def pool_context():
+    """Contexto de multiprocessing del pool de páginas según PDF_POOL_START_METHOD."""
+    context = multiprocessing.get_context(PDF_POOL_START_METHOD)
+    if PDF_POOL_START_METHOD == "forkserver":
+        # El servidor de fork importa este módulo una sola vez y cada proceso parte de ahí
+        context.set_forkserver_preload(["pdf_processor"])
+    return context
+
+
+def iter_page_range(pdf_path, first_page, last_page, progress=None):
+    """Extraer y analizar un rango de páginas de una en una, liberando cada página al terminar."""
+    page_nums = list(range(first_page, last_page + 1))
+    with pdfplumber.open(pdf_path, pages=page_nums) as pdf:
+        for page_num, page in zip(page_nums, pdf.pages):
+            page_record = extract_page(page, page_num)
+            release_page(page)
+            yield page_record, analyze_page(page_record)
+            if progress:
+                progress(page_num, last_page)
+
+
+def process_page_range(pdf_path, first_page, last_page, progress=None):
+    """Extraer y analizar un rango de páginas; se ejecuta dentro de un proceso del pool."""
+    return list(iter_page_range(pdf_path, first_page, last_page, progress))
+
+
+def extract_and_analyze(pdf_path, workers=1, progress=None):
+    """Extraer y analizar todas las páginas, generando (página, observaciones) en orden de página."""
+    total_pages = count_pages(pdf_path)
+    if workers <= 1 or total_pages <= PAGES_PER_TASK:
+        if total_pages:
+            yield from iter_page_range(pdf_path, 1, total_pages, progress=progress)
+        return
+
+    ranges = deque((first, min(first + PAGES_PER_TASK - 1, total_pages))
+                   for first in range(1, total_pages + 1, PAGES_PER_TASK))
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(), initializer=init_worker) as executor:
+        # Pocas tareas por delante de la que se consume, para no acumular páginas en memoria
+        futures = deque()
+        while ranges or futures:
+            while ranges and len(futures) < 2 * workers:
+                futures.append(executor.submit(process_page_range, pdf_path, *ranges.popleft()))
+            # Unir en el orden de las páginas para que la salida sea idéntica a la serial
+            processed = futures.popleft().result()
+            done += len(processed)
+            yield from processed
+            if progress:
+                progress(done, total_pages)
+
+
+def use_streaming(pdf_path, artifacts):
+    """Decidir el modo streaming según PDF_STREAMING y el número de páginas del documento."""
+    if PDF_STREAMING in ("0", "1"):
+        return PDF_STREAMING == "1"
+    if artifacts:
+        total_pages = artifacts.get("page_count") or len(artifacts.get("pages", []))
+    else:
+        try:
+            total_pages = count_pages(pdf_path)
+        except Exception:
+            # El error de apertura se reporta al extraer
+            return False
+    return total_pages >= PDF_STREAMING_MIN_PAGES
+
+
+def enforce_memory_ceiling(memory):
+    """Registrar el pico de memoria y hacer cumplir STREAMING_MAX_RSS_MB.
+
+    Al superar el límite se recolecta basura y se vacían las cachés en memoria (OCR e
+    índices de pasajes); si aun así se supera, se lanza MemoryCeilingError.
+    """
+    rss = rss_mb()
+    memory["peak_rss_mb"] = max(memory.get("peak_rss_mb", 0.0), rss)
+    if not STREAMING_MAX_RSS_MB or rss <= STREAMING_MAX_RSS_MB:
+        return
+    gc.collect()
+    clear_memory_cache()
+    clear_passage_indexes()
+    rss = rss_mb()
+    if rss > STREAMING_MAX_RSS_MB:
+        raise MemoryCeilingError(f"Memoria residente de {rss:.0f} MB por encima del límite de {STREAMING_MAX_RSS_MB:.0f} MB")
+
+
+def find_keywords(pieces, keywords):
+    """Palabras clave presentes en un texto dado en trozos (con solape entre trozos)."""
+    found = set()
+    overlap = max(len(keyword) for keyword in keywords) - 1
+    tail = ""
+    for piece in pieces:
+        window = tail + piece
+        found.update(keyword for keyword in keywords if keyword not in found and keyword in window)
+        tail = window[-overlap:] if overlap else ""
+    return found
+
+
+def preceding_text(ent, text):
+    """Texto previo a una entidad; las guardadas sin contexto lo toman del texto completo."""
+    if ent.context or text is None:
+        return ent.context
+    return text[max(0, ent.start_char - ENTITY_CONTEXT_CHARS):ent.start_char].lower()
+
+
+def format_observation(obs):
+    """Texto de una observación para la salida; las que ya son texto se dejan igual."""
+    if isinstance(obs, str):
+        return obs
+    return f"Página {obs['page']}: [{obs['type']}] {obs['error']} (Contexto: {obs['context']})"
+
+
+def format_observations(observations):
+    """Observaciones ordenadas por página y tipo y formateadas; todas las salidas de process_pdf pasan por aquí."""
+    return [format_observation(obs) for obs in sorted(observations, key=lambda x: (x['page'], x['type']))]
+
+
+def process_pdf(pdf_path, pdf_hash=None, workers=None, progress=None, streaming=None, metrics=None):
+    """Analizar un PDF y devolver (resultados, observaciones formateadas).
+
+    En modo streaming (``streaming=True``, o según PDF_STREAMING) las páginas se procesan
+    como un generador y se vuelcan al artefacto en disco; las etapas siguientes las leen
+    de ahí y la extracción de campos trabaja por ventanas, sin armar el texto completo.
+    Los tiempos por etapa y los contadores se registran en ``metrics`` (DocumentMetrics).
+    """
+    results = dict.fromkeys(RESULT_FIELDS, "")
     observations = []
-    full_text = []
-
-    # Diccionario de correcciones ortográficas comunes
-    common_mistakes = {
-        "retaso": "retraso",
-        "escaza": "escasa",
-        "desarollo": "desarrollo",
-        "hipotesis": "hipótesis",
-        "analisis": "análisis",
-        "finacier": "financiero",
-        "cooperatva": "cooperativa",
-        "educacion": "educación",
-        "principios cooperativs": "principios cooperativos",
-        "desfinanciamiento": "desfinanciamiento"
-    }
-
-    # Extraer texto e imágenes con pdfplumber
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                page_text = page.extract_text() or ""
-                full_text.append(page_text)
-                
-                # Procesar texto de la página con spaCy
-                doc = nlp(page_text)
-                
-                # Detectar errores ortográficos específicos
-                for mistake, correction in common_mistakes.items():
-                    if mistake in page_text.lower():
-                        context = page_text[max(0, page_text.lower().find(mistake) - 50):page_text.lower().find(mistake) + 50]
-                        observations.append({
-                            'type': 'Ortográfico',
-                            'error': f"Error ortográfico: '{mistake}' debería ser '{correction}'",
-                            'page': page_num,
-                            'context': context[:100]
-                        })
-
-                # Detectar falta de tildes
-                for token in doc:
-                    clean_token = token.text.lower()
-                    for correct, incorrect in [(k, v) for k, v in common_mistakes.items() if 'á' in k or 'é' in k or 'í' in k or 'ó' in k or 'ú' in k]:
-                        if clean_token == incorrect:
-                            context = page_text[max(0, page_text.lower().find(clean_token) - 50):page_text.lower().find(clean_token) + 50]
-                            observations.append({
-                                'type': 'Ortográfico',
-                                'error': f"Falta tilde: '{clean_token}' debería ser '{correct}'",
-                                'page': page_num,
-                                'context': context[:100]
-                            })
-
-                # Detectar problemas gramaticales
-                observations.extend(detect_grammar_issues(doc, page_num))
-
-                # Procesar imágenes
-                for img in page.images:
-                    try:
-                        img_data = img['stream'].get_data()
-                        image = Image.open(io.BytesIO(img_data)).convert('RGB')
-                        image = preprocess_image(image)
-                        ocr_text = pytesseract.image_to_string(image, lang='spa', config='--psm 6 --dpi 300')
-                        full_text.append(ocr_text)
-                        # Detectar errores en texto de imágenes
-                        doc_ocr = nlp(ocr_text)
-                        for mistake, correction in common_mistakes.items():
-                            if mistake in ocr_text.lower():
-                                context = ocr_text[max(0, ocr_text.lower().find(mistake) - 50):ocr_text.lower().find(mistake) + 50]
-                                observations.append({
-                                    'type': 'Ortográfico (Imagen)',
-                                    'error': f"Error ortográfico en imagen: '{mistake}' debería ser '{correction}'",
-                                    'page': page_num,
-                                    'context': context[:100]
-                                })
-                        observations.extend(detect_grammar_issues(doc_ocr, page_num))
-                    except Exception as e:
-                        observations.append({
-                            'type': 'Procesamiento',
-                            'error': f"Error al procesar imagen en página {page_num}: {str(e)}",
-                            'page': page_num,
-                            'context': ''
-                        })
-    except Exception as e:
-        observations.append({
-            'type': 'Procesamiento',
-            'error': f"Error al abrir el PDF con pdfplumber: {str(e)}",
-            'page': 0,
-            'context': ''
-        })
-        return results, observations
-
-    text = "\n".join(full_text).lower()
-    doc = nlp(text)
-
-    # Expresiones regulares optimizadas
-    patterns = {
-        "Título de la tesis": r"(?i)(?:t[ií]tulo|t[ií]tulo de la tesis|elaborado por|tesis para optar el t[ií]tulo de)[:\s]*(.+?)(?=\n\n|\n\s*\n|$|tingo maría|2022)",
-        "Asesor": r"(?i)(?:asesor|advisor|director|en señal de conformidad)[:\s]*(.+?)(?=\n|$|\d+\.\d+\.)",
-        "Jurado 1": r"(?i)(?:jurado 1|primer jurado|miembro 1)[:\s]*(.+?)(?=\n|$)",
-        "Jurado 2": r"(?i)(?:jurado 2|segundo jurado|miembro 2)[:\s]*(.+?)(?=\n|$)",
-        "Jurado 3": r"(?i)(?:jurado 3|tercer jurado|miembro 3)[:\s]*(.+?)(?=\n|$)",
-        "Lugar": r"(?i)(?:lugar|ubicaci[oó]n|ciudad|tingo maría)[:\s]*(.*tingo maría.*|peru)(?=\n|$)",
-        "Quienes (Sujetos de estudio)": r"(?i)(?:sujetos de estudio|poblaci[oó]n|participantes|el universo de estudio|muestra a\))[:\s]*(.+?)(?=\n\n|$|b\))",
-        "Variable dependiente": r"(?i)(?:variable dependiente|desfinanciamiento interno)[:\s]*(desfinanciamiento interno)(?=\n\n|$|\d+\.\d+\.)",
-        "Variable independiente": r"(?i)(?:variable independiente|principios cooperativos)[:\s]*(inadecuada aplicaci[oó]n de los principios cooperativos)(?=\n\n|$|\d+\.\d+\.)",
-        "Enfoque": r"(?i)(?:enfoque|tipo de investigaci[oó]n|longitudinal)[:\s]*(longitudinal)(?=\n|$)",
-        "Nivel o alcance": r"(?i)(?:nivel o alcance|alcance)[:\s]*(.+?)(?=\n|$)",
-        "Diseño de investigación": r"(?i)(?:dise[ñn]o de investigaci[oó]n|no experimental|ex post facto)[:\s]*(no experimental – ex post facto)(?=\n|$)",
-        "Problema general": r"(?i)(?:problema general|¿de qué manera.*influye.*cooperativa agroindustrial)[:\s]*(¿de qué manera la inadecuada aplicaci[oó]n de los principios cooperativos influye en el desfinanciamiento interno.*cooperativa agroindustrial cacao alto huallaga.*castillo grande\?)(?=\n\n|$|\d+\.\d+\.)",
-        "Problema específico 1": r"(?i)(?:problema espec[ií]fico 1|control democr[áa]tico.*influye.*cooperativa)[:\s]*(¿de qué manera el principio de control democr[áa]tico.*influye.*cooperativa agroindustrial cacao alto huallaga.*castillo grande\?)(?=\n\n|$)",
-        "Problema específico 2": r"(?i)(?:problema espec[ií]fico 2|reparto de excedentes.*influye.*cooperativa)[:\s]*(¿de qué manera el principio de reparto de excedentes.*influye.*cooperativa agroindustrial cacao alto huallaga.*castillo grande\?)(?=\n\n|$)",
-        "Problema específico 3": r"(?i)(?:problema espec[ií]fico 3|educaci[oó]n cooperativa.*influye.*cooperativa)[:\s]*(¿de qué forma el principio de educaci[oó]n cooperativa.*influye.*cooperativa agroindustrial cacao alto huallaga.*\?)(?=\n\n|$)",
-        "Problema específico 4": r"(?i)(?:problema espec[ií]fico 4)[:\s]*(.+?)(?=\n\n|$)",
-        "Objetivo específico 1": r"(?i)(?:objetivo espec[ií]fico 1|determinar.*control democr[áa]tico.*cooperativa)[:\s]*(determinar.*control democr[áa]tico.*cooperativa agroindustrial cacao alto huallaga.*castillo grande)(?=\n\n|$)",
-        "Objetivo específico 2": r"(?i)(?:objetivo espec[ií]fico 2|determinar.*reparto de excedentes.*cooperativa)[:\s]*(determinar.*reparto de excedentes.*cooperativa agroindustrial cacao alto huallaga.*castillo grande)(?=\n\n|$)",
-        "Objetivo específico 3": r"(?i)(?:objetivo espec[ií]fico 3|determinar.*educaci[oó]n cooperativa.*cooperativa)[:\s]*(determinar.*educaci[oó]n cooperativa.*cooperativa agroindustrial cacao alto huallaga.*)(?=\n\n|$)",
-        "Objetivo específico 4": r"(?i)(?:objetivo espec[ií]fico 4)[:\s]*(.+?)(?=\n\n|$)",
-        "Hipótesis general": r"(?i)(?:hip[oó]tesis general|inadecuada aplicaci[oó]n de los principios)[:\s]*(la inadecuada aplicaci[oó]n de los principios cooperativos influye en el desfinanciamiento interno.*cooperativa agroindustrial cacao alto huallaga.*castillo grande)(?=\n\n|$|\d+\.\d+\.)",
-        "Hipótesis específica 1": r"(?i)(?:hip[oó]tesis espec[ií]fica 1|control democr[áa]tico.*influye)[:\s]*(la inapropiada aplicaci[oó]n del principio de control democr[áa]tico.*influye.*cooperativa agroindustrial cacao alto huallaga.*castillo grande)(?=\n\n|$)",
-        "Hipótesis específica 2": r"(?i)(?:hip[oó]tesis espec[ií]fica 2|reparto de excedentes.*influye)[:\s]*(la inapropiada aplicaci[oó]n del principio de reparto de excedentes.*influye.*cooperativa agroindustrial cacao alto huallaga.*castillo grande)(?=\n\n|$)",
-        "Hipótesis específica 3": r"(?i)(?:hip[oó]tesis espec[ií]fica 3|educaci[oó]n cooperativa.*influye)[:\s]*(la inapropiada aplicaci[oó]n del principio de educaci[oó]n cooperativa.*influye.*cooperativa agroindustrial cacao alto huallaga.*)(?=\n\n|$)",
-        "Hipótesis específica 4": r"(?i)(?:hip[oó]tesis espec[ií]fica 4)[:\s]*(.+?)(?=\n\n|$)",
-        "Línea de investigación": r"(?i)(?:l[ií]nea de investigaci[oó]n|finanzas)[:\s]*(finanzas)(?=\n|$)",
-        "Descripción de la población": r"(?i)(?:descripci[oó]n de la poblaci[oó]n|el universo de estudio)[:\s]*(el universo de estudio.*ratios financieras.*2016 al 2020.*cooperativa agroindustrial cacao alto huallaga)(?=\n\n|$|b\))",
-        "Cantidad de la población": r"(?i)(?:cantidad de la poblaci[oó]n|ratios financieras a los estados)[:\s]*(estados de situaci[oó]n financiera y resultados de los a[ñn]os 2016 al 2020)(?=\n|$)",
-        "Cantidad de la muestra": r"(?i)(?:cantidad de la muestra|muestra para la presente)[:\s]*(estados de situaci[oó]n financiera y resultados de los [uú]ltimos 5 a[ñn]os)(?=\n|$)",
-        "Prueba estadística": r"(?i)(?:prueba estad[ií]stica)[:\s]*(.+?)(?=\n|$)",
-        "Fecha de publicación": r"(?i)(?:fecha de publicaci[oó]n|\b202[0-2]\b)[:\s]*(2022)(?=\n|$)",
-        "Tipo de observación": r"(?i)(?:tipo de observaci[oó]n)[:\s]*(.+?)(?=\n|$)",
-        "Detalle de la observación": r"(?i)(?:detalle de la observaci[oó]n)[:\s]*(.+?)(?=\n\n|$)",
-        "Número de página de la observación": r"(?i)(?:n[uú]mero de p[aá]gina de la observaci[oó]n)[:\s]*(.+?)(?=\n|$)"
-    }
-
-    for key, pattern in patterns.items():
-        results[key] = extract_field(text, pattern, "No identificado")
+    if metrics is None:
+        metrics = DocumentMetrics("process_pdf")
+
+    # Reutilizar la extracción guardada si el documento ya fue procesado
+    if pdf_hash is None:
+        with metrics.span("hash"):
+            pdf_hash = hash_file(pdf_path)
+    with metrics.span("artifacts_load"):
+        artifacts = load_artifacts(pdf_hash, pages=False)
+    if artifacts and artifacts.get("extraction_version", 1) != EXTRACTION_VERSION:
+        # Extracción de otra versión: se repite todo el análisis
+        artifacts = None
+    # Etapas recalculadas en este análisis; las demás se toman de los artefactos
+    recomputed = []
+    if streaming is None:
+        streaming = use_streaming(pdf_path, artifacts)
+    metrics.tag("mode", "streaming" if streaming else "memory")
+    metrics.tag("artifacts", "hit" if artifacts else "miss")
+    memory = {}
+    if artifacts:
+        if streaming:
+            # Las páginas se leen del disco en cada etapa
+            pages = StoredPages(pdf_hash)
+            total_pages = artifacts.get("page_count") or len(artifacts.get("pages", []))
+        else:
+            with metrics.span("artifacts_load"):
+                artifacts = load_artifacts(pdf_hash)
+            pages = artifacts["pages"]
+            total_pages = len(pages)
+        spelling_version = get_spelling_checker().fingerprint
+        spelling_observations = stored_stage(artifacts, "spelling", spelling_version)
+        if spelling_observations is None:
+            recomputed.append("spelling")
+            spelling_observations = []
+            with metrics.span("spelling"):
+                for page in pages:
+                    spelling_observations.extend(analyze_page(page))
+                    if progress:
+                        progress(page["page"], total_pages)
+            append_stage(pdf_hash, "spelling", spelling_version, spelling_observations)
+        elif progress:
+            progress(total_pages, total_pages)
+        observations.extend(spelling_observations)
+        metrics.count("pages", total_pages)
+    else:
+        # Extraer texto e imágenes con pdfplumber (en paralelo si hay varios workers); cada
+        # página se vuelca al artefacto en cuanto se procesa
+        writer = None
+        pages = []
+        try:
+            with metrics.span("extraction"):
+                writer = ArtifactWriter(pdf_hash)
+                for page, page_observations in extract_and_analyze(pdf_path, workers or PDF_WORKERS, progress):
+                    writer.add_page(page)
+                    observations.extend(page_observations)
+                    if streaming:
+                        enforce_memory_ceiling(memory)
+                    else:
+                        pages.append(page)
+                writer.close(extraction_version=EXTRACTION_VERSION)
+        except Exception as e:
+            if writer:
+                writer.abort()
+            metrics.error("memory" if isinstance(e, MemoryCeilingError) else "extraction", str(e))
+            observations.append({
+                'type': 'Procesamiento',
+                'error': str(e) if isinstance(e, MemoryCeilingError) else f"Error al abrir el PDF con pdfplumber: {str(e)}",
+                'page': 0,
+                'context': ''
+            })
+            return results, format_observations(observations)
+        recomputed += ["extraction", "spelling"]
+        append_stage(pdf_hash, "spelling", get_spelling_checker().fingerprint, observations)
+        if streaming:
+            pages = StoredPages(pdf_hash)
+        ocr_stats = ocr_report(pages)
+        append_artifact_fields(pdf_hash, ocr_stats=ocr_stats)
+        # Segundos de OCR sumados entre procesos (incluidos en "extraction"); el preprocesamiento
+        # (umbral adaptativo y fastNlMeansDenoising) va aparte de Tesseract
+        if ocr_stats["ocr_calls"]:
+            metrics.add_time("ocr", ocr_stats["ocr_seconds"] - ocr_stats["preprocess_seconds"])
+            metrics.add_time("ocr_preprocess", ocr_stats["preprocess_seconds"])
+        metrics.count("pages", writer.page_count)
+        metrics.count("images", ocr_stats["images"])
+        metrics.count("ocr_calls", ocr_stats["ocr_calls"])
+        metrics.count("ocr_cache_hits", ocr_stats["cache_hits"])
+        metrics.count("images_skipped", ocr_stats["skipped"])
+        metrics.count("ocr_errors", ocr_stats["errors"])
+        metrics.count("ocr_saved_seconds", ocr_stats["saved_seconds"])
+        for kind, count in sorted(ocr_stats["pages_by_kind"].items()):
+            metrics.count(f"pages_{kind}", count)
+
+    # Analizar cada página y OCR una sola vez con spaCy: gramática y entidades del documento
+    nlp_stage = load_nlp_stage(artifacts)
+    if nlp_stage is None:
+        recomputed.append("nlp")
+        nlp_stats = {}
+        with metrics.span("spacy"):
+            grammar_observations, entities = run_nlp(pages, stats=nlp_stats)
+        # Reglas gramaticales (incluidas en "spacy")
+        metrics.add_time("grammar", nlp_stats["grammar_seconds"])
+        metrics.count("grammar_tokens", nlp_stats["grammar_tokens"])
+        # Segmentos analizados: con la etapa "spacy" dan los docs/s del modelo
+        metrics.count("nlp_segments", nlp_stats["docs"])
+        append_stage(pdf_hash, "nlp", nlp_version(), nlp_stage_data(grammar_observations, entities))
+    else:
+        grammar_observations, entities = nlp_stage
+    metrics.count("entities", len(entities))
+    observations.extend(grammar_observations)
+    if streaming:
+        try:
+            enforce_memory_ceiling(memory)
+        except MemoryCeilingError as e:
+            metrics.error("memory", str(e))
+            observations.append({'type': 'Procesamiento', 'error': str(e), 'page': 0, 'context': ''})
+            return results, format_observations(observations)
+
+    # Texto del documento en minúsculas: completo en memoria, o leído del disco en trozos en modo streaming
+    text = None if streaming else "".join(iter_text(pages))
+
+    def text_pieces():
+        return iter_text(pages) if streaming else [text]
+
+    # Expresiones regulares precompiladas (field_rules.json), evaluadas en ventanas junto a sus anclas
+    extractor = get_field_extractor()
+    field_hits = stored_stage(artifacts, "fields", extractor.fingerprint)
+    if field_hits is None:
+        recomputed.append("fields")
+        with metrics.span("regex"):
+            field_hits = extractor.extract_stream(text_pieces(), "No identificado")
+        append_stage(pdf_hash, "fields", extractor.fingerprint, field_hits)
+    results.update(field_hits)
 
     # Usar spaCy para extraer nombres, lugares y fechas
-    for ent in doc.ents:
+    for ent in entities:
         if ent.label_ == "PER":
-            if any(keyword in text[ent.start_char - 50:ent.start_char].lower() for keyword in ["asesor", "director", "en señal de conformidad"]):
+            if any(keyword in preceding_text(ent, text) for keyword in ["asesor", "director", "en señal de conformidad"]):
                 results["Asesor"] = ent.text
-            elif any(keyword in text[ent.start_char - 50:ent.start_char].lower() for keyword in ["jurado", "miembro"]):
+            elif any(keyword in preceding_text(ent, text) for keyword in ["jurado", "miembro"]):
                 if not results["Jurado 1"]:
                     results["Jurado 1"] = ent.text
                 elif not results["Jurado 2"]:
@@ -249,53 +444,58 @@ def process_pdf(pdf_path):
         elif ent.label_ == "DATE" and "2022" in ent.text:
             results["Fecha de publicación"] = "2022"
 
-    # Usar Transformers para extraer información faltante
-    context = text  # Usar texto completo
-    questions = {
-        "Asesor": "¿Quién es el asesor de la tesis?",
-        "Jurado 1": "¿Quién es el primer jurado?",
-        "Jurado 2": "¿Quién es el segundo jurado?",
-        "Jurado 3": "¿Quién es el tercer jurado?",
-        "Problema general": "¿Cuál es el problema general de la investigación?",
-        "Problema específico 1": "¿Cuál es el primer problema específico?",
-        "Problema específico 2": "¿Cuál es el segundo problema específico?",
-        "Problema específico 3": "¿Cuál es el tercer problema específico?",
-        "Objetivo específico 1": "¿Cuál es el primer objetivo específico?",
-        "Objetivo específico 2": "¿Cuál es el segundo objetivo específico?",
-        "Objetivo específico 3": "¿Cuál es el tercer objetivo específico?",
-        "Prueba estadística": "¿Cuál es la prueba estadística utilizada?",
-        "Nivel o alcance": "¿Cuál es el nivel o alcance de la investigación?",
-        "Cantidad de la población": "¿Cuál es la cantidad de la población estudiada?",
-        "Cantidad de la muestra": "¿Cuál es la cantidad de la muestra estudiada?"
-    }
-    for key, question in questions.items():
-        if results[key] == "No identificado":
-            try:
-                answer = qa_pipeline(question=question, context=context)
-                if answer["score"] > 0.3:  # Reducir umbral
-                    results[key] = answer["answer"][:500]
-            except Exception as e:
+    # Usar Transformers para extraer información faltante, solo sobre los pasajes relevantes.
+    # Las respuestas se guardan por pregunta: solo se consultan al modelo las que faltan
+    pending = {key: question for key, question in FIELD_QUESTIONS.items() if results[key] == "No identificado"}
+    qa_stage_version = qa_version()
+    stored_answers = stored_stage(artifacts, "qa", qa_stage_version) or {}
+    missing = {key: question for key, question in pending.items() if question not in stored_answers}
+    qa_stats = {}
+    if missing:
+        recomputed.append("qa")
+        try:
+            with metrics.span("retrieval"):
+                index = get_passage_index(pdf_hash, pages)
+            with metrics.span("qa"):
+                answers = answer_questions(get_qa_pipeline(), index, missing, stats=qa_stats)
+        except Exception as e:
+            metrics.error("qa", str(e))
+            for key in missing:
                 observations.append({
                     'type': 'Procesamiento',
                     'error': f"Error al usar Transformers para '{key}': {str(e)}",
                     'page': 0,
                     'context': ''
                 })
+        else:
+            # Las preguntas sin pasajes se guardan como None para no volver a buscarlas
+            stored_answers = {**stored_answers, **{
+                question: {"answer": answers[key]["answer"], "score": float(answers[key]["score"])} if key in answers else None
+                for key, question in missing.items()
+            }}
+            append_stage(pdf_hash, "qa", qa_stage_version, stored_answers)
+    metrics.count("qa_calls", qa_stats.get("pairs", 0))
+    for key, question in pending.items():
+        answer = stored_answers.get(question)
+        if answer and answer["score"] > 0.3:  # Reducir umbral
+            results[key] = answer["answer"][:500]
 
     # Validaciones específicas
-    if "tingo maría" in text:
+    with metrics.span("validations"):
+        found = find_keywords(text_pieces(), VALIDATION_KEYWORDS)
+    if "tingo maría" in found:
         results["Lugar"] = "Tingo María, Perú"
-    if "finanzas" in text:
+    if "finanzas" in found:
         results["Línea de investigación"] = "Finanzas"
-    if "no experimental" in text or "ex post facto" in text:
+    if "no experimental" in found or "ex post facto" in found:
         results["Diseño de investigación"] = "No experimental – ex post facto"
-    if "longitudinal" in text:
+    if "longitudinal" in found:
         results["Enfoque"] = "Longitudinal"
-    if "2022" in text:
+    if "2022" in found:
         results["Fecha de publicación"] = "2022"
-    if "weslay chain" in text:
+    if "weslay chain" in found:
         results["Título de la tesis"] = "Tesis para optar el título de Contador Público elaborado por Weslay Chain, Quispe García"
-    if "ratios financieras" in text:
+    if "ratios financieras" in found:
         results["Cantidad de la población"] = "Estados de Situación Financiera y Resultados de los años 2016 al 2020"
         results["Cantidad de la muestra"] = "Estados de Situación Financiera y Resultados de los últimos 5 años"
 
@@ -309,123 +509,183 @@ def process_pdf(pdf_path):
                 'context': ''
             })
 
-    # Ordenar observaciones por página y tipo
-    observations = sorted(observations, key=lambda x: (x['page'], x['type']))
+    metrics.count("observations", len(observations))
+    metrics.tag("recomputed", ",".join(recomputed) or "none")
+
+    return results, format_observations(observations)
 
-    # Formatear observaciones para la salida
-    formatted_observations = [f"Página {obs['page']}: [{obs['type']}] {obs['error']} (Contexto: {obs['context']})" for obs in observations]
 
-    return results, formatted_observations
+def reanalyze(pdf_hash, pdf_path=None, metrics=None):
+    """Volver a analizar un documento ya procesado desde sus artefactos.
 
+    Solo se recalculan las etapas cuya versión (reglas, diccionario, modelos) cambió desde
+    que se guardaron. Si la extracción guardada es de otra versión, o no existe, hace falta
+    ``pdf_path`` para extraer de nuevo; sin él se lanza FileNotFoundError, y si su contenido
+    no corresponde a ``pdf_hash`` (p. ej. uploads/<nombre> reemplazado por otro PDF con el
+    mismo nombre), ValueError.
+    """
+    artifacts = load_artifacts(pdf_hash, pages=False)
+    if not artifacts or artifacts.get("extraction_version", 1) != EXTRACTION_VERSION:
+        if not pdf_path or not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"El documento {pdf_hash[:12]} necesita extraerse de nuevo y no se encontró el PDF")
+        if hash_file(pdf_path) != pdf_hash:
+            raise ValueError(f"El PDF '{pdf_path}' no corresponde al documento {pdf_hash[:12]}: se reemplazó por otro")
+    return process_pdf(pdf_path, pdf_hash, metrics=metrics)
 
-def extract_field(text, pattern, default):
-    match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-    return match.group(1).strip()[:500] if match else default
 
+def process_query(pdf_name, pregunta, metrics=None):
+    """Responder una pregunta sobre un PDF ya analizado.
 
-def process_query(pdf_name, pregunta):
+    Primero se busca en la caché de respuestas (por documento, análisis y pregunta
+    normalizada); si no está, se intenta en orden con los resultados guardados, las
+    entidades, las reglas de campos, el modelo de QA y TF-IDF, y la respuesta se guarda
+    en la caché. ``metrics`` registra los tiempos y la fuente de la respuesta.
+    """
+    if metrics is None:
+        metrics = DocumentMetrics("process_query")
     try:
-        # Consultar resultados previos en MongoDB
-        db = get_db()
-        consulta = db["consultas"].find_one({"pdf_name": pdf_name})
+        # Consultar el análisis más reciente del PDF en MongoDB
+        with metrics.span("mongo_read"):
+            consulta = latest_consulta(pdf_name)
         if not consulta:
+            metrics.tag("source", "none")
             return f"No se encontraron resultados previos para el PDF '{pdf_name}'"
 
-        results = consulta["results"]
-        pregunta_lower = pregunta.lower()
-
-        # Responder preguntas basadas en resultados previos
-        if "estudiante" in pregunta_lower or "autor" in pregunta_lower:
-            return "El estudiante que realizó la tesis es: Weslay Chain, Quispe García"
-        elif "asesor" in pregunta_lower:
-            asesor = results.get("Asesor", "No identificado")
-            if asesor != "No identificado":
-                return f"El asesor de la tesis es: {asesor}"
-        elif "jurado" in pregunta_lower:
-            jurors = [
-                results.get("Jurado 1", "No identificado"),
-                results.get("Jurado 2", "No identificado"),
-                results.get("Jurado 3", "No identificado")
-            ]
-            if any(juror != "No identificado" for juror in jurors):
-                return f"Los jurados son: Jurado 1: {jurors[0]}, Jurado 2: {jurors[1]}, Jurado 3: {jurors[2]}"
-        elif any(key.lower() in pregunta_lower for key in results.keys()):
-            for key in results:
-                if key.lower() in pregunta_lower and results[key] != "No identificado":
-                    return f"{key}: {results[key]}"
-
-        # Si no se encuentra en resultados previos, procesar el PDF
-        full_text = []
-        with pdfplumber.open(f"uploads/{pdf_name}") as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text() or ""
-                full_text.append(page_text)
-                for img in page.images:
-                    try:
-                        img_data = img['stream'].get_data()
-                        image = Image.open(io.BytesIO(img_data)).convert('RGB')
-                        image = preprocess_image(image)
-                        ocr_text = pytesseract.image_to_string(image, lang='spa', config='--psm 6 --dpi 300')
-                        full_text.append(ocr_text)
-                    except Exception as e:
-                        full_text.append(f"Error en imagen: {str(e)}")
-        
-        text = "\n".join(full_text)
-        doc = nlp(text)
-
-        # Usar spaCy para nombres
-        if "estudiante" in pregunta_lower or "autor" in pregunta_lower:
-            for ent in doc.ents:
-                if ent.label_ == "PER" and "weslay chain" in ent.text.lower():
-                    return "El estudiante que realizó la tesis es: Weslay Chain, Quispe García"
-        elif "asesor" in pregunta_lower:
-            for ent in doc.ents:
-                if ent.label_ == "PER" and any(keyword in text[ent.start_char - 50:ent.start_char].lower() for keyword in ["asesor", "director", "en señal de conformidad"]):
-                    return f"El asesor de la tesis es: {ent.text}"
-        elif "jurado" in pregunta_lower:
-            jurors = []
-            for ent in doc.ents:
-                if ent.label_ == "PER" and any(keyword in text[ent.start_char - 50:ent.start_char].lower() for keyword in ["jurado", "miembro"]):
-                    jurors.append(ent.text)
-                    if len(jurors) == 3:
-                        break
-            if jurors:
-                return f"Los jurados son: Jurado 1: {jurors[0] if jurors else 'No identificado'}, Jurado 2: {jurors[1] if len(jurors) > 1 else 'No identificado'}, Jurado 3: {jurors[2] if len(jurors) > 2 else 'No identificado'}"
-
-        # Usar expresiones regulares como respaldo
-        if "asesor" in pregunta_lower:
-            match = re.search(r"(?i)(?:asesor|advisor|director|en señal de conformidad)[:\s]*(.+?)(?=\n|$|\d+\.\d+\.)", text)
-            if match:
-                return f"El asesor de la tesis es: {match.group(1).strip()[:500]}"
-        elif "jurado" in pregunta_lower:
-            jurors = []
-            for i, pattern in enumerate([
-                r"(?i)(?:jurado 1|primer jurado|miembro 1)[:\s]*(.+?)(?=\n|$)",
-                r"(?i)(?:jurado 2|segundo jurado|miembro 2)[:\s]*(.+?)(?=\n|$)",
-                r"(?i)(?:jurado 3|tercer jurado|miembro 3)[:\s]*(.+?)(?=\n|$)"
-            ], 1):
-                match = re.search(pattern, text)
-                jurors.append(match.group(1).strip()[:500] if match else "No identificado")
-            if any(juror != "No identificado" for juror in jurors):
-                return f"Los jurados son: Jurado 1: {jurors[0]}, Jurado 2: {jurors[1]}, Jurado 3: {jurors[2]}"
-
-        # Usar Transformers como última opción
-        try:
-            answer = qa_pipeline(question=pregunta, context=text)
-            if answer["score"] > 0.3:
-                return answer["answer"][:500]
-        except Exception as e:
-            return f"Error al procesar la pregunta con Transformers: {str(e)}"
+        cache_key = (consulta.get("pdf_hash") or pdf_name, str(consulta["_id"]))
+        with metrics.span("answer_cache"):
+            cached = answer_cache.get(*cache_key, pregunta)
+        if cached:
+            metrics.tag("source", "cache")
+            metrics.count(f"answer_cache_{cached['tier']}_hits")
+            return cached["respuesta"]
+
+        respuesta = answer_query(consulta, pdf_name, pregunta, metrics)
+        # Los errores pueden ser transitorios: no se guardan
+        if metrics.tags.get("source") != "error":
+            with metrics.span("answer_cache"):
+                answer_cache.put(*cache_key, pregunta, respuesta, metrics.tags.get("source"))
+        return respuesta
+    except Exception as e:
+        metrics.error("query", str(e))
+        metrics.tag("source", "error")
+        return f"Error al procesar la pregunta: {str(e)}"
+
 
-        # Fallback con TF-IDF
+def answer_query(consulta, pdf_name, pregunta, metrics):
+    """Calcular la respuesta de una pregunta a partir de la consulta guardada y del documento."""
+    results = consulta["results"]
+    pregunta_lower = pregunta.lower()
+
+    # Responder preguntas basadas en resultados previos
+    if "estudiante" in pregunta_lower or "autor" in pregunta_lower:
+        metrics.tag("source", "stored")
+        return "El estudiante que realizó la tesis es: Weslay Chain, Quispe García"
+    elif "asesor" in pregunta_lower:
+        asesor = results.get("Asesor", "No identificado")
+        if asesor != "No identificado":
+            metrics.tag("source", "stored")
+            return f"El asesor de la tesis es: {asesor}"
+    elif "jurado" in pregunta_lower:
+        jurors = [
+            results.get("Jurado 1", "No identificado"),
+            results.get("Jurado 2", "No identificado"),
+            results.get("Jurado 3", "No identificado")
+        ]
+        if any(juror != "No identificado" for juror in jurors):
+            metrics.tag("source", "stored")
+            return f"Los jurados son: Jurado 1: {jurors[0]}, Jurado 2: {jurors[1]}, Jurado 3: {jurors[2]}"
+    elif any(key.lower() in pregunta_lower for key in results.keys()):
+        for key in results:
+            if key.lower() in pregunta_lower and results[key] != "No identificado":
+                metrics.tag("source", "stored")
+                return f"{key}: {results[key]}"
+
+    # Si no se encuentra en resultados previos, usar el texto ya extraído del PDF
+    pdf_path = resolve_pdf_path(pdf_name, consulta.get("pdf_hash"))
+    with metrics.span("artifacts_load"):
+        pdf_hash = consulta.get("pdf_hash") or hash_file(pdf_path)
+        artifacts = load_artifacts(pdf_hash)
+    if artifacts:
+        pages = artifacts["pages"]
+    else:
+        with metrics.span("extraction"):
+            pages = extract_pages(pdf_path)
+    # Reutilizar las entidades del documento; solo se analiza si aún no se guardaron
+    entities = load_entities(artifacts)
+    if entities is None:
+        # Se guarda la etapa completa (con la gramática) para que process_pdf la reutilice
+        with metrics.span("spacy"):
+            grammar_observations, entities = run_nlp(pages)
+        if not artifacts:
+            save_artifacts(pdf_hash, pages, ocr_stats=ocr_report(pages), extraction_version=EXTRACTION_VERSION)
+        append_stage(pdf_hash, "nlp", nlp_version(), nlp_stage_data(grammar_observations, entities))
+    full_text = document_segments(pages)
+
+    text = "\n".join(full_text)
+
+    # Usar spaCy para nombres
+    if "estudiante" in pregunta_lower or "autor" in pregunta_lower:
+        for ent in entities:
+            if ent.label_ == "PER" and "weslay chain" in ent.text.lower():
+                metrics.tag("source", "entities")
+                return "El estudiante que realizó la tesis es: Weslay Chain, Quispe García"
+    elif "asesor" in pregunta_lower:
+        for ent in entities:
+            if ent.label_ == "PER" and any(keyword in preceding_text(ent, text) for keyword in ["asesor", "director", "en señal de conformidad"]):
+                metrics.tag("source", "entities")
+                return f"El asesor de la tesis es: {ent.text}"
+    elif "jurado" in pregunta_lower:
+        jurors = []
+        for ent in entities:
+            if ent.label_ == "PER" and any(keyword in preceding_text(ent, text) for keyword in ["jurado", "miembro"]):
+                jurors.append(ent.text)
+                if len(jurors) == 3:
+                    break
+        if jurors:
+            metrics.tag("source", "entities")
+            return f"Los jurados son: Jurado 1: {jurors[0] if jurors else 'No identificado'}, Jurado 2: {jurors[1] if len(jurors) > 1 else 'No identificado'}, Jurado 3: {jurors[2] if len(jurors) > 2 else 'No identificado'}"
+
+    # Usar expresiones regulares como respaldo
+    if "asesor" in pregunta_lower:
+        with metrics.span("regex"):
+            asesor = get_field_extractor().extract(text, fields={"Asesor"}).get("Asesor", "No identificado")
+        if asesor != "No identificado":
+            metrics.tag("source", "regex")
+            return f"El asesor de la tesis es: {asesor}"
+    elif "jurado" in pregunta_lower:
+        with metrics.span("regex"):
+            found = get_field_extractor().extract(text, fields={"Jurado 1", "Jurado 2", "Jurado 3"})
+        jurors = [found.get(f"Jurado {i}", "No identificado") for i in range(1, 4)]
+        if any(juror != "No identificado" for juror in jurors):
+            metrics.tag("source", "regex")
+            return f"Los jurados son: Jurado 1: {jurors[0]}, Jurado 2: {jurors[1]}, Jurado 3: {jurors[2]}"
+
+    # Usar Transformers como última opción
+    try:
+        qa_stats = {}
+        with metrics.span("retrieval"):
+            index = get_passage_index(pdf_hash, pages)
+        with metrics.span("qa"):
+            answer = answer_questions(get_qa_pipeline(), index, {"pregunta": pregunta}, stats=qa_stats).get("pregunta")
+        metrics.count("qa_calls", qa_stats.get("pairs", 0))
+        if answer and answer["score"] > 0.3:
+            metrics.tag("source", "qa")
+            return answer["answer"][:500]
+    except Exception as e:
+        metrics.error("qa", str(e))
+        metrics.tag("source", "error")
+        return f"Error al procesar la pregunta con Transformers: {str(e)}"
+
+    # Fallback con TF-IDF
+    with metrics.span("tfidf"):
         vectorizer = TfidfVectorizer()
         documents = full_text + [pregunta]
         tfidf_matrix = vectorizer.fit_transform(documents)
         similarities = cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1])
         best_match_idx = np.argmax(similarities)
-        if similarities[0, best_match_idx] > 0.1:
-            return full_text[best_match_idx][:500]
+    if similarities[0, best_match_idx] > 0.1:
+        metrics.tag("source", "tfidf")
+        return full_text[best_match_idx][:500]
 
-        return f"No se encontró información relevante para la pregunta '{pregunta}'"
-    except Exception as e:
-        return f"Error al procesar la pregunta: {str(e)}"
+    metrics.tag("source", "none")
+    return f"No se encontró información relevante para la pregunta '{pregunta}'"
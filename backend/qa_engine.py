@@ -0,0 +1,86 @@
+import os
+
+from artifacts import fingerprint
+from retrieval import PASSAGE_MAX_CHARS, QA_TOP_K
+
+# Modelo de QA y backend de inferencia en CPU: "eager" (fp32), "int8" (cuantizado dinámico) u "onnx"
+QA_MODEL = "dccuchile/bert-base-spanish-wwm-uncased"
+QA_BACKEND = os.environ.get("QA_BACKEND", "eager")
+QA_BATCH_SIZE = int(os.environ.get("QA_BATCH_SIZE", "8"))
+
+# Preguntas para completar los campos que no encontraron las expresiones regulares
+FIELD_QUESTIONS = {
+    "Asesor": "¿Quién es el asesor de la tesis?",
+    "Jurado 1": "¿Quién es el primer jurado?",
+    "Jurado 2": "¿Quién es el segundo jurado?",
+    "Jurado 3": "¿Quién es el tercer jurado?",
+    "Problema general": "¿Cuál es el problema general de la investigación?",
+    "Problema específico 1": "¿Cuál es el primer problema específico?",
+    "Problema específico 2": "¿Cuál es el segundo problema específico?",
+    "Problema específico 3": "¿Cuál es el tercer problema específico?",
+    "Objetivo específico 1": "¿Cuál es el primer objetivo específico?",
+    "Objetivo específico 2": "¿Cuál es el segundo objetivo específico?",
+    "Objetivo específico 3": "¿Cuál es el tercer objetivo específico?",
+    "Prueba estadística": "¿Cuál es la prueba estadística utilizada?",
+    "Nivel o alcance": "¿Cuál es el nivel o alcance de la investigación?",
+    "Cantidad de la población": "¿Cuál es la cantidad de la población estudiada?",
+    "Cantidad de la muestra": "¿Cuál es la cantidad de la muestra estudiada?"
+}
+
+
+def qa_version(backend=QA_BACKEND):
+    """Versión de las respuestas de QA: modelo, backend y selección de pasajes.
+
+    Las respuestas se guardan por texto de pregunta, así que cambiar FIELD_QUESTIONS solo
+    obliga a responder las preguntas nuevas o modificadas.
+    """
+    return fingerprint(QA_MODEL, backend, PASSAGE_MAX_CHARS, QA_TOP_K)
+
+
+def load_qa_pipeline(backend=QA_BACKEND):
+    """Cargar el pipeline de QA con el backend de inferencia indicado."""
+    # Importaciones pesadas diferidas hasta que se necesita el modelo
+    import torch
+    from transformers import AutoModelForQuestionAnswering, AutoTokenizer, pipeline
+
+    tokenizer = AutoTokenizer.from_pretrained(QA_MODEL)
+    if backend == "onnx":
+        # Dependencia opcional: pip install optimum[onnxruntime]
+        from optimum.onnxruntime import ORTModelForQuestionAnswering
+        model = ORTModelForQuestionAnswering.from_pretrained(QA_MODEL, export=True)
+    else:
+        model = AutoModelForQuestionAnswering.from_pretrained(QA_MODEL)
+        if backend == "int8":
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif backend != "eager":
+            raise ValueError(f"Backend de QA desconocido: '{backend}'")
+    return pipeline("question-answering", model=model, tokenizer=tokenizer)
+
+
+def answer_questions(qa_pipeline, index, questions, batch_size=QA_BATCH_SIZE, stats=None):
+    """Responder varias preguntas en una sola llamada al modelo.
+
+    Cada pregunta se empareja con sus pasajes más relevantes del índice y todos los
+    pares se procesan en lotes compartidos. Devuelve {clave: mejor respuesta} solo
+    para las preguntas que tuvieron pasajes. Si se pasa ``stats`` (dict), se completa
+    con el número de preguntas y de pares pregunta–pasaje evaluados.
+    """
+    keys, contexts, pair_questions = [], [], []
+    for key, question in questions.items():
+        for passage in index.search(question):
+            keys.append(key)
+            pair_questions.append(question)
+            contexts.append(passage["text"])
+    if stats is not None:
+        stats.update({"questions": len(questions), "pairs": len(keys)})
+    if not keys:
+        return {}
+
+    answers = qa_pipeline(question=pair_questions, context=contexts, batch_size=batch_size)
+    if isinstance(answers, dict):
+        answers = [answers]
+    best = {}
+    for key, answer in zip(keys, answers):
+        if key not in best or answer["score"] > best[key]["score"]:
+            best[key] = answer
+    return best
@@ -0,0 +1,83 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Tamaño máximo de un pasaje y número de pasajes que se pasan al modelo de QA
+PASSAGE_MAX_CHARS = int(os.environ.get("PASSAGE_MAX_CHARS", "1200"))
+QA_TOP_K = int(os.environ.get("QA_TOP_K", "3"))
+# Índices construidos recientemente, por hash del documento
+INDEX_CACHE_SIZE = 32
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def split_passages(pages, max_chars=PASSAGE_MAX_CHARS):
+    """Dividir el texto (y OCR) de cada página en pasajes de párrafos agrupados."""
+    passages = []
+    for page in pages:
+        texts = [page["text"]] + [img["ocr"] for img in page["images"] if "ocr" in img]
+        for text in texts:
+            current = ""
+            for paragraph in re.split(r"\n\s*\n", text):
+                paragraph = paragraph.strip()
+                if not paragraph:
+                    continue
+                if current and len(current) + len(paragraph) + 1 > max_chars:
+                    passages.append({"page": page["page"], "text": current})
+                    current = ""
+                # Párrafos más largos que el máximo se cortan en trozos
+                while len(paragraph) > max_chars:
+                    passages.append({"page": page["page"], "text": paragraph[:max_chars]})
+                    paragraph = paragraph[max_chars:]
+                current = f"{current}\n{paragraph}" if current else paragraph
+            if current:
+                passages.append({"page": page["page"], "text": current})
+    return passages
+
+
+class PassageIndex:
+    """Índice TF-IDF sobre los pasajes de un documento."""
+
+    def __init__(self, passages):
+        self.passages = passages
+        self.vectorizer = TfidfVectorizer(strip_accents="unicode", lowercase=True, sublinear_tf=True)
+        try:
+            self.matrix = self.vectorizer.fit_transform([p["text"] for p in passages])
+        except ValueError:
+            # Documento sin texto indexable
+            self.matrix = None
+
+    def search(self, query, k=QA_TOP_K):
+        """Devolver los k pasajes más relevantes para la consulta."""
+        if self.matrix is None:
+            return []
+        scores = (self.matrix @ self.vectorizer.transform([query]).T).toarray().ravel()
+        top = np.argsort(-scores)[:k]
+        return [self.passages[i] for i in top if scores[i] > 0]
+
+
+def get_passage_index(pdf_hash, pages):
+    """Obtener el índice de pasajes de un documento, construyéndolo una sola vez."""
+    with _indexes_lock:
+        index = _indexes.get(pdf_hash)
+        if index is not None:
+            _indexes.move_to_end(pdf_hash)
+            return index
+    # El índice se construye fuera del lock; si otro hilo lo construyó antes, se usa el suyo
+    index = PassageIndex(split_passages(pages))
+    with _indexes_lock:
+        index = _indexes.setdefault(pdf_hash, index)
+        _indexes.move_to_end(pdf_hash)
+        if len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def clear_passage_indexes():
+    """Descartar los índices de pasajes en memoria; se reconstruyen cuando se necesiten."""
+    with _indexes_lock:
+        _indexes.clear()
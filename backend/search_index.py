@@ -0,0 +1,251 @@
+"""Índice de búsqueda entre tesis (SQLite FTS5) sobre los campos extraídos y el texto de las páginas.
+
+Se actualiza al guardar cada consulta (una fila por documento, la del último análisis) y se
+consulta desde /search. Para construirlo desde las consultas ya guardadas (desde backend/):
+    python search_index.py --rebuild
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from artifacts import iter_pages, iter_segments
+
+SEARCH_INDEX_PATH = os.environ.get("SEARCH_INDEX_PATH", "search_index.sqlite3")
+# Indexar también el texto completo de las páginas (el índice crece con el corpus)
+SEARCH_INDEX_TEXT = os.environ.get("SEARCH_INDEX_TEXT", "1") == "1"
+SEARCH_MAX_PER_PAGE = 100
+# Largo mínimo de una búsqueda por prefijo ("eco*"); las más cortas abarcan demasiadas palabras
+SEARCH_MIN_PREFIX = 3
+
+# Columnas del índice: campos de resultados que van en cada una; "campos" recibe el resto
+SEARCH_COLUMNS = {
+    "titulo": ["Título de la tesis"],
+    "asesor": ["Asesor"],
+    "jurado": ["Jurado 1", "Jurado 2", "Jurado 3"],
+    "campos": None,
+    "texto": None
+}
+# Peso de cada columna en el ranking bm25, en el orden de SEARCH_COLUMNS
+SEARCH_WEIGHTS = (8.0, 6.0, 4.0, 2.0, 1.0)
+NOT_FOUND = "No identificado"
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS documentos (
+    id INTEGER PRIMARY KEY,
+    doc_key TEXT UNIQUE NOT NULL,
+    pdf_hash TEXT,
+    pdf_name TEXT,
+    user_id TEXT,
+    timestamp TEXT,
+    results TEXT
+);
+CREATE INDEX IF NOT EXISTS documentos_timestamp ON documentos (timestamp);
+CREATE VIRTUAL TABLE IF NOT EXISTS documentos_fts USING fts5(
+    {", ".join(SEARCH_COLUMNS)}, tokenize = 'unicode61 remove_diacritics 2', prefix = '{SEARCH_MIN_PREFIX}'
+);
+"""
+_initialized = set()
+_lock = threading.Lock()
+_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def _connect(path=None):
+    # Una conexión por operación; WAL permite leer mientras otro proceso escribe
+    path = path or SEARCH_INDEX_PATH
+    connection = sqlite3.connect(path, timeout=30)
+    if path not in _initialized:
+        with _lock:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            _initialized.add(path)
+    return connection
+
+
+def fts_query(text):
+    """Consulta FTS5 segura a partir del texto del usuario.
+
+    Cada palabra (o frase entre comillas) se busca tal cual y todas deben aparecer; un
+    ``*`` final busca por prefijo (de al menos SEARCH_MIN_PREFIX caracteres).
+    """
+    terms = []
+    for phrase, word in _TERM.findall(text):
+        term = phrase or word
+        prefix = not phrase and term.endswith("*")
+        term = term.rstrip("*") if prefix else term
+        prefix = prefix and len(term) >= SEARCH_MIN_PREFIX
+        if term.strip():
+            terms.append('"' + term.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def _document_text(pdf_hash):
+    if not SEARCH_INDEX_TEXT or not pdf_hash:
+        return ""
+    return "\n".join(iter_segments(iter_pages(pdf_hash)))
+
+
+def _columns(results, pdf_hash):
+    values = {key: value for key, value in (results or {}).items() if value and value != NOT_FOUND}
+    columns = {}
+    used = set()
+    for column, fields in SEARCH_COLUMNS.items():
+        if fields:
+            columns[column] = "\n".join(str(values[field]) for field in fields if field in values)
+            used.update(fields)
+    columns["campos"] = "\n".join(f"{key}: {value}" for key, value in values.items() if key not in used)
+    columns["texto"] = _document_text(pdf_hash)
+    return [columns[column] for column in SEARCH_COLUMNS]
+
+
+def index_consultas(consultas, path=None):
+    """Agregar o reemplazar en el índice los documentos de estas consultas, en una sola transacción."""
+    connection = _connect(path)
+    try:
+        with connection:
+            for consulta in consultas:
+                pdf_hash = consulta.get("pdf_hash")
+                doc_key = pdf_hash or consulta["pdf_name"]
+                timestamp = consulta.get("timestamp")
+                row = connection.execute("SELECT id FROM documentos WHERE doc_key = ?", (doc_key,)).fetchone()
+                if row:
+                    connection.execute("DELETE FROM documentos_fts WHERE rowid = ?", row)
+                    connection.execute("DELETE FROM documentos WHERE id = ?", row)
+                cursor = connection.execute(
+                    "INSERT INTO documentos (doc_key, pdf_hash, pdf_name, user_id, timestamp, results) VALUES (?, ?, ?, ?, ?, ?)",
+                    (doc_key, pdf_hash, consulta["pdf_name"], consulta.get("user_id"),
+                     timestamp.isoformat() if timestamp else None,
+                     json.dumps(consulta.get("results") or {}, ensure_ascii=False)))
+                connection.execute(
+                    f"INSERT INTO documentos_fts (rowid, {', '.join(SEARCH_COLUMNS)}) VALUES (?{', ?' * len(SEARCH_COLUMNS)})",
+                    (cursor.lastrowid, *_columns(consulta.get("results"), pdf_hash)))
+    finally:
+        connection.close()
+
+
+def search(q=None, filters=None, user_id=None, desde=None, hasta=None, page=1, per_page=20, path=None):
+    """Buscar documentos por texto libre (``q``) y por columna (``filters``: {columna: texto}).
+
+    Los resultados se ordenan por relevancia (bm25 ponderado por columna) o, sin texto que
+    buscar, del más reciente al más antiguo. ``desde``/``hasta`` son datetimes (hasta exclusivo).
+    """
+    started = time.perf_counter()
+    clauses = []
+    if q and fts_query(q):
+        clauses.append(f"({fts_query(q)})")
+    for column, value in (filters or {}).items():
+        if column not in SEARCH_COLUMNS:
+            raise ValueError(f"Columna de búsqueda desconocida: '{column}'")
+        if value and fts_query(value):
+            clauses.append(f"{column} : ({fts_query(value)})")
+    where, params = [], []
+    if user_id:
+        where.append("d.user_id = ?")
+        params.append(user_id)
+    if desde:
+        where.append("d.timestamp >= ?")
+        params.append(desde.isoformat())
+    if hasta:
+        where.append("d.timestamp < ?")
+        params.append(hasta.isoformat())
+    per_page = max(1, min(per_page, SEARCH_MAX_PER_PAGE))
+    page = max(1, page)
+    offset = (page - 1) * per_page
+    filtered = " AND ".join(where)
+
+    connection = _connect(path)
+    try:
+        if clauses:
+            match = " AND ".join(clauses)
+            # Se ordena solo sobre el índice FTS; la tabla de documentos y los fragmentos se leen
+            # únicamente para la página pedida
+            restrict = f" AND rowid IN (SELECT id FROM documentos d WHERE {filtered})" if where else ""
+            base = f"FROM documentos_fts WHERE documentos_fts MATCH ?{restrict}"
+            params = [match] + params
+            total = connection.execute(f"SELECT COUNT(*) {base}", params).fetchone()[0]
+            ranked = connection.execute(
+                f"SELECT rowid, bm25(documentos_fts, {', '.join(str(weight) for weight in SEARCH_WEIGHTS)}) AS score "
+                f"{base} ORDER BY score LIMIT ? OFFSET ?", params + [per_page, offset]).fetchall()
+            ids = [rowid for rowid, _ in ranked]
+            marks = ", ".join("?" * len(ids))
+            snippets = dict(connection.execute(
+                f"SELECT rowid, snippet(documentos_fts, -1, '[', ']', '…', 16) FROM documentos_fts "
+                f"WHERE documentos_fts MATCH ? AND rowid IN ({marks})", [match] + ids).fetchall())
+            documents = {row[0]: row[1:] for row in connection.execute(
+                f"SELECT id, pdf_name, pdf_hash, timestamp, results FROM documentos WHERE id IN ({marks})", ids)}
+            rows = [(*documents[rowid], score, snippets.get(rowid)) for rowid, score in ranked]
+        else:
+            base = "FROM documentos d" + (f" WHERE {filtered}" if where else "")
+            total = connection.execute(f"SELECT COUNT(*) {base}", params).fetchone()[0]
+            rows = connection.execute(
+                f"SELECT d.pdf_name, d.pdf_hash, d.timestamp, d.results, NULL, NULL {base} "
+                f"ORDER BY d.timestamp DESC LIMIT ? OFFSET ?", params + [per_page, offset]).fetchall()
+    finally:
+        connection.close()
+    results = []
+    for pdf_name, pdf_hash, timestamp, fields, score, snippet in rows:
+        fields = json.loads(fields)
+        results.append({
+            "pdf_name": pdf_name,
+            "pdf_hash": pdf_hash,
+            "timestamp": timestamp,
+            "titulo": fields.get("Título de la tesis"),
+            "asesor": fields.get("Asesor"),
+            # bm25 es menor cuanto más relevante; se invierte para que mayor sea mejor
+            "score": -score if score is not None else None,
+            "snippet": snippet
+        })
+    return {
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "results": results,
+        "took_ms": (time.perf_counter() - started) * 1000
+    }
+
+
+def rebuild(path=None, batch_size=200):
+    """Reconstruir el índice desde las consultas de MongoDB (la última de cada documento)."""
+    from db import get_db
+
+    path = path or SEARCH_INDEX_PATH
+    connection = _connect(path)
+    with connection:
+        connection.execute("DELETE FROM documentos_fts")
+        connection.execute("DELETE FROM documentos")
+    connection.close()
+    cursor = get_db()["consultas"].find({}, {"pdf_name": 1, "pdf_hash": 1, "user_id": 1, "timestamp": 1, "results": 1})
+    batch, total = [], 0
+    # En orden cronológico: la última consulta de cada documento reemplaza a las anteriores
+    for consulta in cursor.sort("timestamp", 1).batch_size(batch_size):
+        batch.append(consulta)
+        if len(batch) >= batch_size:
+            index_consultas(batch, path)
+            total += len(batch)
+            batch = []
+    index_consultas(batch, path)
+    # Fusionar los segmentos del índice FTS en uno solo acelera las búsquedas
+    connection = _connect(path)
+    with connection:
+        connection.execute("INSERT INTO documentos_fts (documentos_fts) VALUES ('optimize')")
+    connection.close()
+    return total + len(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruir el índice desde MongoDB")
+    parser.add_argument("q", nargs="?", help="Probar una búsqueda")
+    args = parser.parse_args()
+    if args.rebuild:
+        start = time.perf_counter()
+        print(f"{rebuild()} consultas indexadas en {time.perf_counter() - start:.1f}s")
+    if args.q:
+        print(json.dumps(search(args.q), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
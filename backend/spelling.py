@@ -0,0 +1,156 @@
+import os
+import unicodedata
+from collections import deque
+
+from artifacts import fingerprint
+
+try:
+    # Dependencia opcional: pip install pyahocorasick (misma búsqueda, implementada en C)
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Diccionario de errores ortográficos: una línea "incorrecto<TAB>correcto", '#' para comentarios.
+# Un error terminado en '*' es una raíz: se reporta toda palabra que empiece con ella
+# ("finacier*" encuentra "finaciero", "finacieras", ...)
+PREFIX_MARKER = "*"
+SPELLING_DICTIONARY_PATH = os.environ.get("SPELLING_DICTIONARY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "diccionario_ortografia.tsv"))
+
+
+def strip_accents(text):
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+
+def load_dictionary(path=SPELLING_DICTIONARY_PATH):
+    """Leer los pares error → corrección del diccionario."""
+    pairs = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            mistake, correction = line.split("\t")[:2]
+            mistake = mistake.strip().lower()
+            # Entradas sin corrección real marcarían como error el texto correcto
+            if mistake.rstrip(PREFIX_MARKER) and mistake != correction.strip().lower():
+                pairs[mistake] = correction.strip()
+    return pairs
+
+
+class SpellingChecker:
+    """Buscador de errores ortográficos con un autómata de Aho–Corasick.
+
+    Encuentra todas las apariciones de todas las entradas del diccionario en una sola
+    pasada lineal sobre el texto. Solo se reportan palabras completas o, para las raíces
+    (entradas terminadas en PREFIX_MARKER), palabras que empiezan con la raíz.
+    """
+
+    def __init__(self, pairs):
+        # Versión del diccionario: las observaciones guardadas con otra se recalculan
+        self.fingerprint = fingerprint(pairs)
+        self.corrections = list(pairs.values())
+        self.prefix = [mistake.endswith(PREFIX_MARKER) for mistake in pairs]
+        self.mistakes = [mistake.rstrip(PREFIX_MARKER) for mistake in pairs]
+        # Errores que solo difieren de la corrección en las tildes
+        self.missing_accent = [strip_accents(m) == strip_accents(c.lower()) for m, c in zip(self.mistakes, self.corrections)]
+        if ahocorasick is not None:
+            self.automaton = ahocorasick.Automaton()
+            for idx, mistake in enumerate(self.mistakes):
+                self.automaton.add_word(mistake, idx)
+            if self.mistakes:
+                self.automaton.make_automaton()
+        else:
+            self.automaton = None
+            self._build(self.mistakes)
+
+    def _build(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for idx, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[node][ch] = nxt
+                node = nxt
+            self.out[node].append(idx)
+
+        # Enlaces de fallo en orden de anchura
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                fail = self.fail[node]
+                while fail and ch not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[nxt] = self.goto[fail].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def _iter_matches(self, lowered):
+        """Pares (posición final, índice de entrada) de todas las apariciones."""
+        if self.automaton is not None:
+            if self.mistakes:
+                yield from self.automaton.iter(lowered)
+            return
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for end, ch in enumerate(lowered):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for idx in out[node]:
+                yield end, idx
+
+    def find(self, text):
+        """Todas las apariciones como (inicio, fin, error, corrección, falta_tilde), ordenadas por posición."""
+        lowered = text.lower()
+        matches = []
+        for end, idx in self._iter_matches(lowered):
+            start = end - len(self.mistakes[idx]) + 1
+            end += 1
+            if start > 0 and lowered[start - 1].isalnum():
+                continue
+            mistake = self.mistakes[idx]
+            if self.prefix[idx]:
+                # Una raíz se extiende hasta el final de la palabra, que es lo que se reporta
+                while end < len(lowered) and lowered[end].isalnum():
+                    end += 1
+                mistake = lowered[start:end]
+            elif end < len(lowered) and lowered[end].isalnum():
+                continue
+            matches.append((start, end, mistake, self.corrections[idx], self.missing_accent[idx]))
+        matches.sort()
+        return matches
+
+    def observations(self, text, page_num, in_image=False):
+        """Observaciones de ortografía para el texto de una página o de una imagen."""
+        observations = []
+        for start, _, mistake, correction, missing_accent in self.find(text):
+            if missing_accent:
+                error = f"Falta tilde{' en imagen' if in_image else ''}: '{mistake}' debería ser '{correction}'"
+            else:
+                error = f"Error ortográfico{' en imagen' if in_image else ''}: '{mistake}' debería ser '{correction}'"
+            observations.append({
+                'type': 'Ortográfico (Imagen)' if in_image else 'Ortográfico',
+                'error': error,
+                'page': page_num,
+                'context': text[max(0, start - 50):start + 50][:100]
+            })
+        return observations
+
+
+_checker = None
+
+
+def get_spelling_checker():
+    """Corrector compartido, compilado una sola vez desde SPELLING_DICTIONARY_PATH."""
+    global _checker
+    if _checker is None:
+        _checker = SpellingChecker(load_dictionary())
+    return _checker
@@ -1,8 +1,7 @@
-from pymongo import MongoClient
+from db import get_db
 
 try:
-    client = MongoClient("mongodb://localhost:27017/")
-    db = client["tesis_analizador"]
+    db = get_db()
     print("Colecciones:", db.list_collection_names())
 except Exception as e:
     print("Error:", e)
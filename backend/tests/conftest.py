@@ -0,0 +1,74 @@
+"""Configuración común de las pruebas del backend (se corren desde backend/ con ``python -m pytest``).
+
+MongoDB en memoria (mongomock), un pipeline de spaCy en blanco con NER y carpetas
+temporales para artefactos, subidas e índice de búsqueda; nada toca los datos reales.
+"""
+import os
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+_workdir = tempfile.mkdtemp(prefix="tesis_tests_")
+os.environ["MONGO_URI"] = "mongomock://"
+os.environ["ARTIFACTS_FOLDER"] = os.path.join(_workdir, "artifacts")
+os.environ["UPLOAD_FOLDER"] = os.path.join(_workdir, "uploads")
+os.environ["SEARCH_INDEX_PATH"] = os.path.join(_workdir, "search_index.sqlite3")
+os.environ["INGEST_JOURNAL"] = os.path.join(_workdir, "ingest_journal.jsonl")
+os.environ.setdefault("SPACY_MODEL", os.path.join(_workdir, "es_blank"))
+
+import pytest  # noqa: E402
+
+SAMPLE_PDFS = sorted(os.path.join(BACKEND, "uploads", name) for name in os.listdir(os.path.join(BACKEND, "uploads"))
+                     if name.endswith(".pdf"))
+
+
+def _blank_spacy_model(path):
+    # Modelo en español sin entrenar, con un NER que conoce la etiqueta PER
+    import spacy
+    nlp = spacy.blank("es")
+    nlp.add_pipe("ner").add_label("PER")
+    nlp.initialize()
+    nlp.to_disk(path)
+
+
+if not os.path.exists(os.environ["SPACY_MODEL"]):
+    _blank_spacy_model(os.environ["SPACY_MODEL"])
+
+
+@pytest.fixture(autouse=True)
+def clean_state(tmp_path, monkeypatch):
+    """Base de datos vacía y almacén de artefactos propio en cada prueba."""
+    import artifacts
+    from db import get_client, MONGO_DB
+    get_client().drop_database(MONGO_DB)
+    monkeypatch.setattr(artifacts, "ARTIFACTS_FOLDER", str(tmp_path / "artifacts"))
+    yield
+    get_client().drop_database(MONGO_DB)
+
+
+@pytest.fixture
+def thesis_pdf(tmp_path):
+    """Fábrica de tesis sintéticas pequeñas (solo texto digital)."""
+    from benchmarks.synthetic_thesis import generate_thesis
+
+    def make(name="tesis.pdf", pages=4, seed=0):
+        path = str(tmp_path / name)
+        generate_thesis(path, pages, 0.0, 0, seed)
+        return path
+    return make
+
+
+@pytest.fixture
+def fake_qa(monkeypatch):
+    """Reemplaza el modelo de QA por uno que responde al instante; devuelve las preguntas recibidas."""
+    import pdf_processor
+    asked = []
+
+    def pipeline(question, context, batch_size=None):
+        asked.extend(question)
+        return [{"answer": f"respuesta {q[:10]}", "score": 0.9} for q in question]
+
+    monkeypatch.setattr(pdf_processor, "get_qa_pipeline", lambda: pipeline)
+    return asked
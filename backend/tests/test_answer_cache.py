@@ -0,0 +1,57 @@
+from answer_cache import AnswerCache, normalize_question
+from metrics import DocumentMetrics
+from pdf_processor import process_pdf, process_query
+from db import save_consulta
+
+
+def test_normalize_question():
+    assert normalize_question("¿Cuáles son los JURADOS?") == normalize_question("quienes son el jurado") == "jurado"
+    assert normalize_question("¿Qué es?") == ""
+
+
+def test_memory_then_mongo_tiers():
+    cache = AnswerCache(size=1)
+    cache.put("h", "v1", "¿Quién es el asesor?", "Dra. Rojas", "stored")
+    assert cache.get("h", "v1", "quien es el ASESOR") == {"respuesta": "Dra. Rojas", "source": "stored", "tier": "memory"}
+    cache.put("h", "v1", "¿Cuál es el título?", "Principios", "fields")
+    # El LRU de tamaño 1 ya descartó el asesor: se lee de MongoDB
+    assert cache.get("h", "v1", "¿Quién es el asesor?")["tier"] == "mongo"
+    assert cache.get("h", "v2", "¿Quién es el asesor?") is None
+    assert AnswerCache().get("h", "v1", "¿Cuál es el título?")["tier"] == "mongo"
+
+
+def test_similar_questions_need_threshold():
+    cache = AnswerCache(similarity=0.3)
+    cache.put("h", "v1", "¿Cuál es la población de estudio?", "Socios", "qa")
+    assert cache.get("h", "v1", "población del estudio")["tier"] == "memory"
+    assert cache.get("h", "v1", "¿Cuál es la población de la investigación?")["tier"] == "similar"
+    assert cache.get("h", "v1", "¿Cuál es la hipótesis?") is None
+    assert AnswerCache(similarity=0).get("h", "v1", "¿Cuál es la población de la investigación?") is None
+
+
+def test_invalidate_drops_memory_and_mongo():
+    cache = AnswerCache()
+    cache.put("h", "v1", "¿Quién es el asesor?", "Dra. Rojas")
+    cache.invalidate("h")
+    assert cache.get("h", "v1", "¿Quién es el asesor?") is None
+
+
+def test_process_query_uses_cache(thesis_pdf, fake_qa):
+    pdf_path = thesis_pdf()
+    results, observations = process_pdf(pdf_path, "hash_cache")
+    save_consulta("tesis.pdf", results, observations, "test", "hash_cache")
+    first, second = DocumentMetrics("process_query"), DocumentMetrics("process_query")
+    answer = process_query("tesis.pdf", "¿Quién es el asesor?", metrics=first)
+    assert process_query("tesis.pdf", "quien es el asesor", metrics=second) == answer
+    assert first.tags["source"] == "stored"
+    assert second.tags["source"] == "cache" and second.counters == {"answer_cache_memory_hits": 1}
+
+
+def test_numbered_questions_are_not_near_duplicates():
+    cache = AnswerCache(similarity=0.8)
+    cache.put("h", "v1", "¿Quién es el jurado 1?", "Jurado 1: Pérez", "stored")
+    cache.put("h", "v1", "¿Cuál es el problema específico 1?", "P1", "fields")
+    assert cache.get("h", "v1", "¿Quién es el jurado 2?") is None
+    assert cache.get("h", "v1", "¿Cuál es el problema específico 3?") is None
+    similar = AnswerCache(similarity=0.5).get("h", "v1", "¿Quién es el jurado 1 evaluador?")
+    assert (similar["respuesta"], similar["tier"]) == ("Jurado 1: Pérez", "similar")
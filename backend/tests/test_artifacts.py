@@ -0,0 +1,85 @@
+import os
+import threading
+
+from artifacts import (ArtifactWriter, append_stage, artifact_path, document_segments, iter_pages, load_artifacts,
+                       save_artifacts, stored_stage)
+from pdf_processor import process_pdf
+
+PAGES = [
+    {"page": 1, "text": "Primera página", "images": [{"ocr": "texto de imagen"}]},
+    {"page": 2, "text": "Segunda página con tildes: acción, año", "images": []}
+]
+
+
+def test_round_trip():
+    save_artifacts("abc123", [dict(page) for page in PAGES], ocr_stats={"images": 1})
+    loaded = load_artifacts("abc123")
+    assert [page["text"] for page in loaded["pages"]] == [page["text"] for page in PAGES]
+    assert loaded["ocr_stats"] == {"images": 1}
+    assert loaded["page_count"] == 2
+    # Los límites de página apuntan al texto unido del documento
+    text = "\n".join(document_segments(loaded["pages"]))
+    for page in loaded["pages"]:
+        assert text[page["start"]:page["end"]] == "\n".join(document_segments([page]))
+    assert [page["page"] for page in iter_pages("abc123")] == [1, 2]
+    assert "pages" not in load_artifacts("abc123", pages=False)
+
+
+def test_last_stage_wins():
+    save_artifacts("abc123", [dict(page) for page in PAGES])
+    append_stage("abc123", "fields", "v1", {"Año": "2020"})
+    append_stage("abc123", "fields", "v2", {"Año": "2021"})
+    loaded = load_artifacts("abc123", pages=False)
+    assert stored_stage(loaded, "fields", "v2") == {"Año": "2021"}
+    assert stored_stage(loaded, "fields", "v1") is None
+
+
+def test_aborted_writer_leaves_nothing():
+    writer = ArtifactWriter("abc123")
+    writer.add_page(dict(PAGES[0]))
+    writer.abort()
+    assert os.listdir(os.path.dirname(artifact_path("abc123"))) == []
+
+
+def test_concurrent_writers_do_not_share_temp_files():
+    errors = []
+    barrier = threading.Barrier(8)
+
+    def write():
+        try:
+            writer = ArtifactWriter("abc123")
+            barrier.wait()
+            for page in PAGES:
+                writer.add_page(dict(page))
+            writer.close()
+            append_stage("abc123", "spelling", "v1", [])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(load_artifacts("abc123")["pages"]) == 2
+    assert [name for name in os.listdir(os.path.dirname(artifact_path("abc123"))) if name.endswith(".tmp")] == []
+
+
+def test_concurrent_process_pdf_on_same_document(thesis_pdf, fake_qa):
+    pdf_path = thesis_pdf()
+    outputs = []
+
+    def run():
+        outputs.append(process_pdf(pdf_path, workers=1))
+
+    threads = [threading.Thread(target=run) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(outputs) == 3
+    for results, observations in outputs:
+        assert results == outputs[0][0]
+        assert results["Título de la tesis"]
+        assert all(isinstance(observation, str) for observation in observations)
@@ -0,0 +1,68 @@
+import pytest
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+import db
+from db import PreguntaBuffer, get_db
+
+
+def pregunta(i):
+    return {"pdf_name": "a.pdf", "pregunta": f"p{i}", "respuesta": "r", "user_id": "u"}
+
+
+@pytest.fixture
+def failing_insert(monkeypatch):
+    """Hace fallar las próximas ``failures[0]`` inserciones en bloque."""
+    failures = [1]
+    save = db.save_preguntas_bulk
+
+    def flaky(preguntas):
+        if failures[0]:
+            failures[0] -= 1
+            raise ServerSelectionTimeoutError("sin servidor")
+        save(preguntas)
+
+    monkeypatch.setattr(db, "save_preguntas_bulk", flaky)
+    return failures
+
+
+def test_failed_flush_keeps_pending(failing_insert):
+    buffer = PreguntaBuffer(max_size=2, max_seconds=60)
+    buffer.add(pregunta(1))
+    buffer.add(pregunta(2))  # lleno: el vaciado falla sin lanzar
+    assert [p["pregunta"] for p in buffer.pending] == ["p1", "p2"]
+    buffer.add(pregunta(3))  # en espera de reintento: no se intenta otra vez
+    assert len(buffer.pending) == 3
+    assert buffer.flush() is True
+    assert buffer.pending == []
+    assert [p["pregunta"] for p in get_db()["preguntas"].find().sort("pregunta")] == ["p1", "p2", "p3"]
+
+
+def test_partial_bulk_failure_requeues_only_failed(monkeypatch):
+    buffer = PreguntaBuffer(max_size=10, max_seconds=60)
+    for i in range(3):
+        buffer.add(pregunta(i))
+
+    def partial(preguntas):
+        get_db()["preguntas"].insert_one(preguntas[0])
+        raise BulkWriteError({"writeErrors": [{"index": 1, "code": 11000}, {"index": 2, "code": 91}]})
+
+    monkeypatch.setattr(db, "save_preguntas_bulk", partial)
+    assert buffer.flush() is False
+    assert [p["pregunta"] for p in buffer.pending] == ["p2"]
+
+
+def test_pending_is_bounded(failing_insert):
+    failing_insert[0] = 100
+    buffer = PreguntaBuffer(max_size=1, max_seconds=60, max_pending=5)
+    for i in range(8):
+        buffer.add(pregunta(i))
+        buffer.flush()
+    assert [p["pregunta"] for p in buffer.pending] == ["p3", "p4", "p5", "p6", "p7"]
+
+
+def test_save_pregunta_does_not_raise(monkeypatch):
+    def broken():
+        raise ServerSelectionTimeoutError("sin servidor")
+
+    monkeypatch.setattr(db, "get_db", broken)
+    db.save_pregunta("a.pdf", "¿asesor?", "r", "u")
@@ -0,0 +1,62 @@
+import csv
+import io
+from datetime import datetime
+
+from openpyxl import load_workbook
+
+import app as backend
+from db import get_db
+
+FAILED_OBSERVATION = {'type': 'Procesamiento', 'error': 'Error al abrir el PDF con pdfplumber: basura', 'page': 0,
+                      'context': ''}
+FORMATTED = "Página 0: [Procesamiento] Error al abrir el PDF con pdfplumber: basura (Contexto: )"
+
+
+def insert_consultas():
+    get_db()["consultas"].insert_many([
+        {"pdf_name": "bien.pdf", "results": {"Asesor": "Ana Ruiz", "Año": "2021"},
+         "observations": ["Página 1: [Ortográfico] Falta tilde: 'tambien' (Contexto: tambien)"],
+         "user_id": "u1", "timestamp": datetime(2024, 1, 1)},
+        {"pdf_name": "fallido.pdf", "results": {"Asesor": ""}, "observations": [FAILED_OBSERVATION],
+         "user_id": "u1", "timestamp": datetime(2024, 1, 2)},
+        {"pdf_name": "malformado.pdf", "results": {}, "observations": [{"type": "sin página"}],
+         "user_id": "u1", "timestamp": datetime(2024, 1, 3)},
+        {"pdf_name": "ultimo.pdf", "results": {"Asesor": {"nombre": "raro"}}, "observations": [],
+         "user_id": "u2", "timestamp": datetime(2024, 1, 4)}
+    ])
+
+
+def test_xlsx_export_with_failed_consulta():
+    insert_consultas()
+    response = backend.app.test_client().get("/export?formato=xlsx")
+    assert response.status_code == 200
+    workbook = load_workbook(io.BytesIO(response.data))
+    results = list(workbook["Resultados"].values)
+    observations = list(workbook["Observaciones"].values)
+    # La consulta que no se puede convertir se omite y el resto se exporta completo
+    assert [row[0] for row in results[1:]] == ["bien.pdf", "fallido.pdf", "ultimo.pdf"]
+    assert [row[3] for row in observations[1:]][1] == FORMATTED
+    asesor = results[0].index("Asesor")
+    assert results[3][asesor] == "{'nombre': 'raro'}"
+
+
+def test_csv_export_formats_dict_observations():
+    insert_consultas()
+    response = backend.app.test_client().get("/export?formato=csv&hoja=observaciones&user_id=u1")
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.data.decode("utf-8-sig"))))
+    assert [row[3] for row in rows[1:]] == [
+        "Página 1: [Ortográfico] Falta tilde: 'tambien' (Contexto: tambien)", FORMATTED]
+
+
+def test_export_filters():
+    insert_consultas()
+    client = backend.app.test_client()
+    response = client.get("/export?formato=csv&desde=2024-01-02&hasta=2024-01-02")
+    rows = list(csv.reader(io.StringIO(response.data.decode("utf-8-sig"))))
+    assert [row[0] for row in rows[1:]] == ["fallido.pdf"]
+    response = client.get("/export?formato=csv&asesor=ruiz")
+    rows = list(csv.reader(io.StringIO(response.data.decode("utf-8-sig"))))
+    assert [row[0] for row in rows[1:]] == ["bien.pdf"]
+    assert client.get("/export?desde=ayer").status_code == 400
+    assert client.get("/export?formato=pdf").status_code == 400
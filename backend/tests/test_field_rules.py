@@ -0,0 +1,51 @@
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from artifacts import iter_text
+from conftest import SAMPLE_PDFS
+from field_rules import FIELD_RULES_PATH, FieldExtractor, bound_pattern
+from pdf_processor import extract_pages
+
+with open(FIELD_RULES_PATH, encoding="utf-8") as f:
+    RULES = json.load(f)["rules"]
+
+
+@pytest.fixture(scope="module")
+def sample_texts():
+    # Texto en minúsculas de cada PDF de ejemplo, como lo arma process_pdf
+    with ProcessPoolExecutor(max_workers=len(SAMPLE_PDFS)) as executor:
+        pages = list(executor.map(extract_pages, SAMPLE_PDFS))
+    return {path: "".join(iter_text(document)) for path, document in zip(SAMPLE_PDFS, pages)}
+
+
+def baseline(text):
+    # Las expresiones de antes del motor: re.search de cada patrón sobre el texto completo
+    results = {}
+    for rule in RULES:
+        match = re.search(rule["pattern"], text, re.IGNORECASE | re.DOTALL)
+        results[rule["field"]] = match.group(1).strip()[:500] if match else "No identificado"
+    return results
+
+
+def test_sample_pdfs_match_baseline_regexes(sample_texts):
+    extractor = FieldExtractor.from_file()
+    for path, text in sample_texts.items():
+        expected = baseline(text)
+        assert extractor.extract(text) == expected, path
+        pieces = [text[i:i + 4096] for i in range(0, len(text), 4096)]
+        assert extractor.extract_stream(pieces, chunk_chars=20000) == expected, path
+
+
+def test_dollar_does_not_match_at_window_end():
+    extractor = FieldExtractor({"window": 10, "rules": [
+        {"field": "Lugar", "anchors": ["lugar"], "pattern": "lugar: (\\w+)$"}]})
+    text = "lugar: " + "a" * 30 + "\nresto"
+    assert extractor.extract(text) == {"Lugar": "No identificado"}
+    assert extractor.extract("lugar: huánuco") == {"Lugar": "huánuco"}
+
+
+def test_bound_pattern():
+    assert bound_pattern(r"a[:\s]*(.+?)x{2,}\d{4}", 100) == (r"a[:\s]{0,100}(.{1,100}?)x{2,100}\d{4}", 308)
@@ -0,0 +1,102 @@
+import json
+import random
+
+import pytest
+import spacy
+
+from benchmarks.synthetic_thesis import filler
+from grammar_rules import GRAMMAR_RULES_PATH, GrammarEngine
+
+WORDS = ["la", "cooperativa", "y", "Y", "el", "socio", "de", "los", "estados", "1,5", "financieros", "en", "2020",
+         "muy", "capital", ",", ";", ":", "(", ")", "\n", "  ", "ya", "que", "se", "relaciona", "con", "e", "o"]
+
+
+@pytest.fixture(scope="module")
+def nlp():
+    nlp = spacy.blank("es")
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+
+@pytest.fixture(scope="module")
+def rules():
+    with open(GRAMMAR_RULES_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def engine_with(rules, *ids):
+    return GrammarEngine({"rules": [rule for rule in rules["rules"] if rule["id"] in ids]})
+
+
+def baseline_comma_issues(doc, page_num):
+    # Regla original de detect_grammar_issues (pdf_processor.py antes del motor de reglas)
+    issues = []
+    for sent in doc.sents:
+        text = sent.text.strip()
+        if len(sent) > 10 and ',' not in text and ' y ' in text.lower():
+            issues.append({
+                'type': 'Gramatical',
+                'error': f"Falta de coma en oración larga: '{text[:100]}...'",
+                'page': page_num,
+                'context': text[:200]
+            })
+    return issues
+
+
+def fixed_corpus():
+    rng = random.Random(20)
+    texts = ["\n".join(filler(random.Random(seed), [], 40)) for seed in range(5)]
+    for _ in range(400):
+        sentences = []
+        for _ in range(10):
+            words = rng.choices(WORDS, k=rng.randint(3, 25))
+            sentences.append(" ".join(words) + rng.choice([".", ".", "?", ""]))
+        texts.append(" ".join(sentences))
+    texts += ["Y luego la cooperativa y el socio de los estados financieros en 2020 sin coma alguna.",
+              "La cooperativa y\nel socio de los estados financieros en 2020 sin coma alguna hoy.",
+              "La cooperativa Y el socio de los estados financieros en 2020 con 1,5 de capital."]
+    return texts
+
+
+def test_comma_rule_matches_baseline(nlp, rules):
+    engine = engine_with(rules, "coma_oracion_larga")
+    checked = 0
+    for text in fixed_corpus():
+        doc = nlp(text)
+        assert engine.check(doc, 1, text=text) == baseline_comma_issues(doc, 1)
+        checked += len(list(doc.sents))
+    assert checked > 3000
+
+
+def test_repeated_words_are_reported_once_per_run(nlp, rules):
+    engine = engine_with(rules, "palabra_repetida", "signo_duplicado")
+    text = "El resultado es muy muy muy claro y la la muestra nos nos sirve,, ;; bien."
+    errors = [issue["error"] for issue in engine.check(nlp(text), 2, text=text)]
+    assert errors == ["Palabra repetida: 'muy muy'", "Palabra repetida: 'la la'",
+                      "Signo de puntuación duplicado: ',,'", "Signo de puntuación duplicado: ';;'"]
+    text = "Datos,,, y más datos"
+    assert len(engine.check(nlp(text), 2, text=text)) == 1
+
+
+def test_punctuation_spacing(nlp, rules):
+    engine = engine_with(rules, "espacio_antes_de_signo", "falta_espacio_despues_de_signo")
+    text = "La muestra , el universo,la población; los datos."
+    errors = [issue["error"] for issue in engine.check(nlp(text), 1, text=text)]
+    assert errors == ["Espacio antes de ','", "Falta espacio después de ','"]
+
+
+def test_accents_are_left_to_the_spelling_checker(rules):
+    # La falta de tildes la reporta solo spelling.py (categoría "Ortográfico")
+    assert all(rule["type"] != "token_in" for rule in rules["rules"])
+    assert all("tilde" not in rule["message"].lower() for rule in rules["rules"])
+
+
+def test_fingerprint_changes_with_rules(rules):
+    changed = json.loads(json.dumps(rules))
+    changed["rules"][0]["min_tokens"] += 1
+    assert GrammarEngine(rules).fingerprint != GrammarEngine(changed).fingerprint
+
+
+def test_unknown_rule_type():
+    with pytest.raises(ValueError):
+        GrammarEngine({"rules": [{"id": "x", "type": "desconocida", "message": ""}]})
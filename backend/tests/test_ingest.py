@@ -0,0 +1,96 @@
+import io
+import os
+import shutil
+import time
+import zipfile
+
+import pytest
+
+import app as backend
+import ingest as ingest_module
+from artifacts import hash_file
+from db import archivo_hash, get_db
+from ingest import ingest
+from upload_store import UPLOAD_FOLDER, stored_pdf_path
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Los trabajos corren en los hilos de la cola; sin pool de procesos para usar fake_qa
+    monkeypatch.setattr(ingest_module, "INGEST_WORKERS", 1)
+    return backend.app.test_client()
+
+
+def wait_job(client, status_url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(status_url).get_json()
+        if job["state"] in ("done", "failed"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError("El trabajo no terminó")
+
+
+def zip_bytes(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_upload_batch_stores_by_content_and_queues(client, thesis_pdf, fake_qa):
+    first = open(thesis_pdf("a.pdf", seed=1), "rb").read()
+    second = open(thesis_pdf("b.pdf", seed=2), "rb").read()
+    response = client.post("/upload_batch", data={"files": [
+        (io.BytesIO(first), "uno.pdf"),
+        (io.BytesIO(zip_bytes({"carpeta/dos.pdf": second, "leeme.txt": b"x"})), "lote.zip")]})
+    assert response.status_code == 202
+    job = wait_job(client, response.get_json()["status_url"])
+    assert job["state"] == "done" and job["result"]["processed"] == 2
+    names = sorted(c["pdf_name"] for c in get_db()["consultas"].find())
+    assert names == ["dos.pdf", "uno.pdf"]
+    for name in names:
+        assert os.path.exists(stored_pdf_path(archivo_hash(name), UPLOAD_FOLDER))
+        assert not os.path.exists(os.path.join(UPLOAD_FOLDER, name))
+
+
+def test_upload_batch_rejects_non_pdf(client):
+    response = client.post("/upload_batch", data={"files": [(io.BytesIO(b"hola"), "falso.pdf")]})
+    assert response.status_code == 400
+    assert "falso.pdf" in response.get_json()["error"]
+    response = client.post("/upload_batch", data={"files": [(io.BytesIO(b"no es zip"), "lote.zip")]})
+    assert response.status_code == 400
+
+
+def test_journal_resumes_and_skips_known_hashes(tmp_path, thesis_pdf, fake_qa):
+    folder = tmp_path / "corpus"
+    folder.mkdir()
+    paths = [str(folder / f"t{i}.pdf") for i in range(2)]
+    for i, path in enumerate(paths):
+        shutil.copy(thesis_pdf(f"src{i}.pdf", seed=i), path)
+    journal = str(tmp_path / "journal.jsonl")
+    assert ingest(paths[:1], workers=1, journal_path=journal)["processed"] == 1
+    summary = ingest(paths, workers=1, journal_path=journal)
+    assert (summary["resumed"], summary["processed"]) == (1, 1)
+    shutil.copy(paths[0], str(folder / "copia.pdf"))
+    summary = ingest([str(folder / "copia.pdf")], workers=1, journal_path=journal)
+    assert (summary["skipped"], summary["processed"]) == (1, 0)
+    assert get_db()["consultas"].count_documents({}) == 2
+
+
+def test_failed_consulta_does_not_skip_hash(tmp_path, thesis_pdf, fake_qa):
+    path = thesis_pdf("t.pdf")
+    pdf_hash = hash_file(path)
+    get_db()["consultas"].insert_one({"pdf_name": "t.pdf", "pdf_hash": pdf_hash, "results": {},
+                                      "metrics": {"errors": [{"stage": "extraction", "error": "roto"}]}})
+    summary = ingest([path], workers=1)
+    assert (summary["skipped"], summary["processed"]) == (0, 1)
+
+
+def test_reanalyze_whole_corpus_is_queued(client, thesis_pdf, fake_qa):
+    ingest([thesis_pdf("t.pdf")], workers=1)
+    response = client.post("/reanalyze", json={})
+    assert response.status_code == 202
+    job = wait_job(client, response.get_json()["status_url"])
+    assert job["state"] == "done" and job["result"]["processed"] == 1
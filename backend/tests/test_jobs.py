@@ -0,0 +1,92 @@
+import io
+import threading
+import time
+
+import pytest
+
+import app as backend
+import jobs
+from jobs import JobQueue, QueueFullError
+
+
+def wait(queue, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["state"] in ("done", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("El trabajo no terminó")
+
+
+def test_job_result_and_progress():
+    queue = JobQueue(workers=1)
+
+    def work(n, progress):
+        for i in range(n):
+            progress(i + 1, n)
+        return n * 2
+
+    job = wait(queue, queue.submit(work, 3))
+    assert job["state"] == "done" and job["result"] == 6
+    assert job["progress"] == {"done": 3, "total": 3}
+    assert job["started"] <= job["finished"]
+
+
+def test_failed_job_keeps_error():
+    queue = JobQueue(workers=1)
+
+    def work(progress):
+        raise ValueError("PDF dañado")
+
+    job = wait(queue, queue.submit(work))
+    assert job["state"] == "failed" and job["error"] == "PDF dañado"
+    assert queue.counts() == {"failed": 1}
+
+
+def test_full_queue_rejects_jobs():
+    queue = JobQueue(workers=1, max_queued=1)
+    started, release = threading.Event(), threading.Event()
+
+    def block(progress):
+        started.set()
+        release.wait(10)
+
+    running = queue.submit(block)
+    started.wait(10)
+    queue.submit(block)
+    with pytest.raises(QueueFullError):
+        queue.submit(block)
+    release.set()
+    assert wait(queue, running)["state"] == "done"
+
+
+def test_finished_jobs_expire(monkeypatch):
+    queue = JobQueue(workers=1)
+    job_id = queue.submit(lambda progress: None)
+    wait(queue, job_id)
+    monkeypatch.setattr(jobs, "JOB_TTL_SECONDS", -1)
+    queue.submit(lambda progress: None)
+    assert queue.get(job_id) is None
+
+
+def test_job_state_is_shared_between_workers():
+    # Dos colas hacen de dos workers de gunicorn: el estado se lee de MongoDB
+    first, second = JobQueue(workers=1), JobQueue(workers=1)
+    job_id = first.submit(lambda progress: "hecho")
+    wait(first, job_id)
+    assert second.get(job_id)["result"] == "hecho"
+    assert second.counts() == {"done": 1}
+    assert JobQueue(workers=1, persist=False).get(job_id) is None
+
+
+def test_async_upload_reports_job(thesis_pdf, fake_qa):
+    client = backend.app.test_client()
+    data = open(thesis_pdf(), "rb").read()
+    response = client.post("/upload?async=1", data={"file": (io.BytesIO(data), "tesis.pdf")})
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    job = wait(backend.job_queue, job_id)
+    assert job["state"] == "done" and job["result"]["pdf_name"] == "tesis.pdf"
+    assert client.get(f"/jobs/{job_id}").get_json()["state"] == "done"
+    assert client.get("/jobs/desconocido").status_code == 404
@@ -0,0 +1,49 @@
+import io
+
+import app as backend
+import metrics
+from metrics import STAGE_BUCKETS, Registry
+
+
+def test_render_counters_histograms_and_gauges():
+    registry = Registry()
+    registry.inc("analyzer_errors_total", 2, "Errores por etapa", stage="ocr")
+    registry.inc("analyzer_errors_total", 1, "Errores por etapa", stage="ocr")
+    registry.observe("analyzer_stage_seconds", 0.2, "Duración", stage="nlp")
+    registry.observe("analyzer_stage_seconds", 700, "Duración", stage="nlp")
+    lines = registry.render({"analyzer_models_loaded": (2, "Modelos cargados")}).splitlines()
+    assert lines[:3] == ["# HELP analyzer_errors_total Errores por etapa", "# TYPE analyzer_errors_total counter",
+                         'analyzer_errors_total{stage="ocr"} 3']
+    assert lines.count("# TYPE analyzer_stage_seconds histogram") == 1
+    assert 'analyzer_stage_seconds_bucket{le="0.1",stage="nlp"} 0' in lines
+    assert 'analyzer_stage_seconds_bucket{le="0.5",stage="nlp"} 1' in lines
+    assert f'analyzer_stage_seconds_bucket{{le="{STAGE_BUCKETS[-1]}",stage="nlp"}} 1' in lines
+    assert 'analyzer_stage_seconds_bucket{le="+Inf",stage="nlp"} 2' in lines
+    assert 'analyzer_stage_seconds_sum{stage="nlp"} 700.2' in lines
+    assert 'analyzer_stage_seconds_count{stage="nlp"} 2' in lines
+    assert lines[-3:] == ["# HELP analyzer_models_loaded Modelos cargados", "# TYPE analyzer_models_loaded gauge",
+                          "analyzer_models_loaded 2"]
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.inc("analyzer_answers_total", 1, "Respuestas", source='tesis "final"\\v2\nbis')
+    assert 'analyzer_answers_total{source="tesis \\"final\\"\\\\v2\\nbis"} 1' in registry.render().splitlines()
+
+
+def test_metrics_endpoint_after_one_document(thesis_pdf, fake_qa, monkeypatch):
+    registry = Registry()
+    monkeypatch.setattr(metrics, "registry", registry)
+    monkeypatch.setattr(backend, "registry", registry)
+    client = backend.app.test_client()
+    data = open(thesis_pdf(pages=3), "rb").read()
+    assert client.post("/upload", data={"file": (io.BytesIO(data), "tesis.pdf")}).status_code == 200
+    response = client.get("/metrics")
+    assert response.mimetype == "text/plain"
+    lines = response.get_data(as_text=True).splitlines()
+    assert 'analyzer_operations_total{operation="process_pdf"} 1' in lines
+    assert "analyzer_pages_total 3" in lines
+    assert "# TYPE analyzer_operation_seconds histogram" in lines
+    assert 'analyzer_operation_seconds_count{operation="process_pdf"} 1' in lines
+    assert "# TYPE analyzer_process_resident_memory_bytes gauge" in lines
+    assert "analyzer_jobs_queued 0" in lines
@@ -0,0 +1,58 @@
+import importlib.util
+import os
+
+import db
+import models
+
+
+def test_model_with_sentencizer_loads(tmp_path, monkeypatch):
+    # Un modelo guardado con su propio sentencizer no debe fallar al cargarse (spaCy E007)
+    import spacy
+    nlp = spacy.blank("es")
+    nlp.add_pipe("sentencizer")
+    nlp.to_disk(tmp_path / "es_sentencizer")
+    monkeypatch.setattr(models, "SPACY_MODEL", str(tmp_path / "es_sentencizer"))
+    loaded = models._load_nlp()
+    assert loaded.pipe_names == ["sentencizer"]
+    assert len(list(loaded("Primera oración. Segunda oración.").sents)) == 2
+
+
+def test_blank_model_gets_sentencizer():
+    assert "sentencizer" in models._load_nlp().pipe_names
+
+
+def test_shared_memory_from_smaps_rollup(tmp_path):
+    rollup = tmp_path / "smaps_rollup"
+    rollup.write_text("55c5d9ff5000-7ffc4ae61000 ---p 00000000 00:00 0  [rollup]\n"
+                      "Rss:    4096 kB\nPss:    2048 kB\nShared_Clean:   3072 kB\n"
+                      "Private_Clean:   512 kB\nPrivate_Dirty:   512 kB\n")
+    assert models.shared_memory_mb(str(rollup)) == {"pss_mb": 2.0, "uss_mb": 1.0}
+    assert models.shared_memory_mb(str(tmp_path / "no_existe")) == {"pss_mb": None, "uss_mb": None}
+
+
+class FakeLog:
+    def __init__(self):
+        self.messages = []
+
+    def info(self, message):
+        self.messages.append(message)
+
+
+class FakeServer:
+    log = FakeLog()
+
+
+class FakeWorker:
+    pid = 1234
+
+
+def test_post_fork_drops_master_mongo_client(monkeypatch):
+    monkeypatch.setenv("PRELOAD_MODELS", "0")
+    path = os.path.join(os.path.dirname(models.__file__), "gunicorn.conf.py")
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", path)
+    conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(conf)
+    monkeypatch.setattr(db, "_client", db.get_client())
+    conf.post_fork(FakeServer, FakeWorker)
+    assert db._client is None
+    assert FakeServer.log.messages[-1].startswith("Worker 1234 iniciado, ")
@@ -0,0 +1,40 @@
+import pytest
+import spacy
+
+import nlp_stage
+from nlp_stage import ENTITY_CONTEXT_CHARS, run_nlp
+
+PAGES = [
+    {"page": 1, "text": "Tesis de Quispe García", "images": [{"ocr": "Firma de Quispe García"}]},
+    {"page": 2, "text": "Asesor: Ana Torres", "images": [{"error": "sin OCR"}]},
+]
+
+
+@pytest.fixture
+def nlp(monkeypatch):
+    # Pipeline mínimo: oraciones y entidades por patrón
+    nlp = spacy.blank("es")
+    nlp.add_pipe("sentencizer")
+    nlp.add_pipe("entity_ruler").add_patterns([{"label": "PER", "pattern": "Quispe García"},
+                                               {"label": "PER", "pattern": "Ana Torres"}])
+    monkeypatch.setattr(nlp_stage, "get_nlp", lambda: nlp)
+    return nlp
+
+
+def test_entity_offsets_span_segments(nlp):
+    _, entities = run_nlp(iter(PAGES), grammar=False)
+    text = "\n".join(["Tesis de Quispe García", "Firma de Quispe García", "Asesor: Ana Torres"])
+    assert [(ent.text, ent.page) for ent in entities] == [("Quispe García", 1), ("Quispe García", 1),
+                                                          ("Ana Torres", 2)]
+    for ent in entities:
+        assert text[ent.start_char:ent.end_char] == ent.text
+        assert ent.context == text[:ent.start_char][-ENTITY_CONTEXT_CHARS:].lower()
+
+
+def test_stats_are_returned_not_printed(nlp, capsys):
+    stats = {}
+    run_nlp(PAGES, stats=stats)
+    assert stats["docs"] == 3
+    assert stats["grammar_tokens"] > 0 and stats["grammar_rules"] > 0
+    assert stats["docs_per_second"] > 0
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,133 @@
+import io
+import os
+import threading
+
+import cv2
+import pdfplumber
+import pytesseract
+import pytest
+from PIL import Image
+
+import ocr
+from conftest import SAMPLE_PDFS
+
+SCANNED_PDF = next(path for path in SAMPLE_PDFS if path.endswith("TS_TYMS_2021.pdf"))
+
+
+def test_full_page_ocr_skips_nl_means(monkeypatch):
+    calls = []
+    monkeypatch.setattr(cv2, "fastNlMeansDenoising", lambda *args, **kwargs: calls.append(args) or args[0])
+    monkeypatch.setattr(pytesseract, "image_to_string", lambda image, **kwargs: f"{image.mode} {image.size[0]}")
+    with pdfplumber.open(SCANNED_PDF) as pdf:
+        page = pdf.pages[1]
+        assert ocr.classify_page(page, page.extract_text() or "") == "scanned"
+        record = ocr.ocr_page(page)
+    assert not calls
+    assert record["source"] == "page" and record["dpi"] == ocr.page_dpi(page)
+    assert record["ocr"].startswith("L ")
+
+
+def test_embedded_images_keep_nl_means(monkeypatch):
+    calls = []
+    monkeypatch.setattr(cv2, "fastNlMeansDenoising", lambda *args, **kwargs: calls.append(args) or args[0])
+    image = ocr.preprocess_image(Image.new("RGB", (64, 64), "white"))
+    assert calls and image.size == (64, 64)
+
+
+class FakeStream:
+    def __init__(self, data):
+        self.data = data
+
+    def get_rawdata(self):
+        return self.data
+
+    def get_data(self):
+        return self.data
+
+
+def png_image(size=(200, 200), text=True):
+    from PIL import ImageDraw
+    image = Image.new("RGB", size, "white")
+    if text:
+        draw = ImageDraw.Draw(image)
+        for y in range(10, size[1] - 10, 20):
+            draw.text((10, y), "Principios cooperativos", fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return {"srcsize": size, "stream": FakeStream(buffer.getvalue())}
+
+
+@pytest.fixture
+def ocr_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, "OCR_CACHE_FOLDER", str(tmp_path / "ocr_cache"))
+    ocr.clear_memory_cache()
+    calls = []
+    monkeypatch.setattr(pytesseract, "image_to_string", lambda image, **kwargs: calls.append(kwargs) or "texto")
+    yield calls
+    ocr.clear_memory_cache()
+
+
+def test_image_ocr_cache_miss_then_hit(ocr_cache):
+    img = png_image()
+    first = ocr.ocr_image(img)
+    assert (first["cache"], first["ocr"]) == ("miss", "texto")
+    assert ocr.ocr_image(img)["cache"] == "hit"
+    ocr.clear_memory_cache()
+    second = ocr.ocr_image(img)
+    assert (second["cache"], second["ocr"], second["hash"]) == ("hit", "texto", first["hash"])
+    assert len(ocr_cache) == 1 and ocr_cache[0]["config"] == ocr.IMAGE_OCR_CONFIG
+
+
+def test_cache_key_includes_ocr_settings(ocr_cache, monkeypatch):
+    img = png_image()
+    ocr.ocr_image(img)
+    monkeypatch.setattr(ocr, "OCR_CACHE_SETTINGS", ocr.fingerprint("otro preprocesamiento"))
+    assert ocr.ocr_image(img)["cache"] == "miss"
+    assert len(ocr_cache) == 2
+
+
+def test_skip_rules(ocr_cache):
+    assert ocr.ocr_image(png_image(size=(20, 400))) == {"skipped": "tamaño", "cache": "skip"}
+    blank = png_image(text=False)
+    assert ocr.ocr_image(blank)["skipped"] == "entropía"
+    # La omisión por entropía queda en la caché
+    assert ocr.ocr_image(blank) == {**ocr.ocr_image(blank), "cache": "hit"}
+    assert not ocr_cache
+
+
+def test_concurrent_cache_writes_same_key(ocr_cache, capsys):
+    errors = []
+
+    def write(n):
+        try:
+            for i in range(50):
+                ocr.cache_put("ab" * 8, {"text": f"{n}-{i}", "seconds": 0.0})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ocr.clear_memory_cache()
+    assert not errors and "Error guardando" not in capsys.readouterr().out
+    assert ocr.cache_get("ab" * 8)["text"].endswith("-49")
+    assert os.listdir(os.path.dirname(ocr._cache_path("ab" * 8))) == ["ab" * 8 + ".json"]
+
+
+def test_ocr_report():
+    pages = [
+        {"kind": "digital", "images": []},
+        {"kind": "mixed", "images": [
+            {"cache": "miss", "seconds": 2.0, "preprocess_seconds": 0.5},
+            {"cache": "hit", "saved_seconds": 1.5},
+            {"cache": "skip", "skipped": "tamaño"},
+            {"error": "imagen dañada"}]},
+        {"images": [{"cache": "hit", "saved_seconds": 0.5}]}
+    ]
+    report = ocr.ocr_report(iter(pages))
+    assert report["pages_by_kind"] == {"digital": 1, "mixed": 2}
+    assert (report["images"], report["ocr_calls"], report["cache_hits"], report["skipped"], report["errors"]) == (5, 1, 2, 1, 1)
+    assert report["hit_rate"] == 2 / 3
+    assert (report["ocr_seconds"], report["preprocess_seconds"], report["saved_seconds"]) == (2.0, 0.5, 2.0)
@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pdf_processor
+import spelling
+from metrics import DocumentMetrics, registry
+from pdf_processor import MemoryCeilingError, extract_and_analyze, process_pdf
+
+
+def test_extraction_failure_returns_formatted_observations(tmp_path):
+    pdf_path = tmp_path / "roto.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4\nbasura")
+    results, observations = process_pdf(str(pdf_path))
+    assert len(observations) == 1
+    assert observations[0].startswith("Página 0: [Procesamiento] Error al abrir el PDF")
+
+
+def test_memory_ceiling_returns_formatted_observations(thesis_pdf, monkeypatch):
+    pdf_path = thesis_pdf(pages=4)
+    calls = []
+
+    def ceiling(memory):
+        # Se cumple durante la extracción (una vez por página) y se supera después del NLP
+        calls.append(1)
+        if len(calls) > 4:
+            raise MemoryCeilingError("Memoria por encima del límite")
+
+    monkeypatch.setattr(pdf_processor, "enforce_memory_ceiling", ceiling)
+    results, observations = process_pdf(pdf_path, workers=1, streaming=True)
+    assert observations
+    assert all(isinstance(observation, str) for observation in observations)
+    assert "Página 0: [Procesamiento] Memoria por encima del límite (Contexto: )" in observations
+
+
+def test_observations_sorted_by_page_and_type():
+    observations = [
+        {'type': 'Ortográfico', 'error': 'b', 'page': 2, 'context': ''},
+        {'type': 'Completitud', 'error': 'a', 'page': 0, 'context': ''},
+        "Página 1: [Gramatical] ya formateada (Contexto: )"
+    ]
+    formatted = pdf_processor.format_observations(observations[:2])
+    assert formatted == ["Página 0: [Completitud] a (Contexto: )", "Página 2: [Ortográfico] b (Contexto: )"]
+    assert pdf_processor.format_observation(observations[2]) == observations[2]
+
+
+def test_parallel_extraction_matches_serial(thesis_pdf):
+    pdf_path = thesis_pdf(pages=10)
+    serial = list(extract_and_analyze(pdf_path, workers=1))
+    calls = []
+    parallel = list(extract_and_analyze(pdf_path, workers=2, progress=lambda done, total: calls.append((done, total))))
+    assert [page["page"] for page, _ in parallel] == list(range(1, len(serial) + 1))
+    assert parallel == serial
+    assert calls[-1] == (len(serial), len(serial))
+    assert [done for done, _ in calls] == sorted(done for done, _ in calls)
+
+
+def worker_state():
+    return os.getpid(), spelling._checker is not None
+
+
+def test_page_pool_workers_start_from_forkserver(monkeypatch):
+    monkeypatch.setattr(spelling, "_checker", None)
+    with ProcessPoolExecutor(max_workers=1, mp_context=pdf_processor.pool_context(),
+                             initializer=pdf_processor.init_worker) as executor:
+        pid, checker_loaded = executor.submit(worker_state).result()
+    assert pdf_processor.pool_context().get_start_method() == "forkserver"
+    # El corrector lo carga el initializer en el proceso, no se hereda del servidor
+    assert pid != os.getpid() and checker_loaded
+    assert spelling._checker is None
+
+
+def test_parallel_process_pdf_matches_serial(thesis_pdf, fake_qa):
+    pdf_path = thesis_pdf(pages=10)
+    serial = process_pdf(pdf_path, "serial", workers=1)
+    assert process_pdf(pdf_path, "paralelo", workers=2) == serial
+
+
+def test_ocr_stats_are_published_as_metrics(thesis_pdf, fake_qa):
+    metrics = DocumentMetrics("process_pdf")
+    process_pdf(thesis_pdf(pages=3), "tesis", metrics=metrics)
+    counters = metrics.to_dict()["counters"]
+    assert counters["pages_digital"] == counters["pages"]
+    assert "analyzer_pages_digital_total" in registry.render()
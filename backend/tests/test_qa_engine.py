@@ -0,0 +1,44 @@
+from qa_engine import answer_questions
+
+
+class StubIndex:
+    def __init__(self, passages):
+        self.passages = passages
+
+    def search(self, question):
+        return [{"text": text} for text in self.passages.get(question, [])]
+
+
+class StubPipeline:
+    """Responde con el pasaje y un puntaje fijo por pasaje; guarda cada llamada."""
+
+    def __init__(self, scores):
+        self.scores = scores
+        self.calls = []
+
+    def __call__(self, question, context, batch_size):
+        self.calls.append({"question": list(question), "context": list(context), "batch_size": batch_size})
+        answers = [{"answer": text, "score": self.scores[text]} for text in context]
+        # Con un solo par, el pipeline de transformers devuelve un dict
+        return answers[0] if len(answers) == 1 else answers
+
+
+def test_all_pairs_go_in_one_batched_call():
+    index = StubIndex({"¿Autor?": ["a1", "a2"], "¿Año?": ["y1", "y2", "y3"], "¿Lugar?": []})
+    qa = StubPipeline({"a1": 0.2, "a2": 0.9, "y1": 0.5, "y2": 0.1, "y3": 0.7})
+    stats = {}
+    best = answer_questions(qa, index, {"Autor": "¿Autor?", "Año": "¿Año?", "Lugar": "¿Lugar?"},
+                            batch_size=4, stats=stats)
+    assert len(qa.calls) == 1 and qa.calls[0]["batch_size"] == 4
+    assert qa.calls[0]["question"] == ["¿Autor?"] * 2 + ["¿Año?"] * 3
+    # Gana la respuesta de mayor puntaje de cada clave; sin pasajes no hay respuesta
+    assert best == {"Autor": {"answer": "a2", "score": 0.9}, "Año": {"answer": "y3", "score": 0.7}}
+    assert stats == {"questions": 3, "pairs": 5}
+
+
+def test_single_pair_and_no_passages():
+    qa = StubPipeline({"a1": 0.3})
+    assert answer_questions(qa, StubIndex({"¿Autor?": ["a1"]}), {"Autor": "¿Autor?"}) == {
+        "Autor": {"answer": "a1", "score": 0.3}}
+    assert answer_questions(qa, StubIndex({}), {"Autor": "¿Autor?"}) == {}
+    assert len(qa.calls) == 1
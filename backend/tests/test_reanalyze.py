@@ -0,0 +1,77 @@
+import os
+import shutil
+
+import pytest
+
+import artifacts
+import spelling
+from db import get_db
+from ingest import ingest, reanalyze_corpus
+from pdf_processor import reanalyze
+
+
+@pytest.fixture
+def corpus(tmp_path, thesis_pdf, fake_qa):
+    folder = tmp_path / "uploads"
+    folder.mkdir()
+    paths = []
+    for i in range(2):
+        path = str(folder / f"t{i}.pdf")
+        shutil.copy(thesis_pdf(f"src{i}.pdf", seed=i), path)
+        paths.append(path)
+    summary = ingest(paths, workers=1, journal_path=None)
+    assert summary["processed"] == 2
+    return folder, paths
+
+
+def latest(pdf_name):
+    return get_db()["consultas"].find_one({"pdf_name": pdf_name}, sort=[("timestamp", -1)])
+
+
+def test_unchanged_corpus_recomputes_nothing(corpus, fake_qa):
+    folder, _ = corpus
+    asked = len(fake_qa)
+    summary = reanalyze_corpus(workers=1, upload_folder=str(folder))
+    assert summary["processed"] == 2
+    assert len(fake_qa) == asked
+    assert latest("t0.pdf")["metrics"]["tags"]["recomputed"] == "none"
+
+
+def test_only_changed_stage_is_recomputed(corpus, fake_qa, monkeypatch):
+    folder, _ = corpus
+    before = latest("t0.pdf")
+    monkeypatch.setattr(spelling, "_checker", spelling.SpellingChecker({"cooperativa": "Cooperativa"}))
+    reanalyze_corpus(["t0.pdf"], workers=1, upload_folder=str(folder))
+    after = latest("t0.pdf")
+    assert after["metrics"]["tags"]["recomputed"] == "spelling"
+    assert after["results"] == before["results"]
+    assert after["observations"] != before["observations"]
+
+
+def test_missing_pdf_is_reanalyzed_from_artifacts(corpus, fake_qa):
+    folder, paths = corpus
+    os.remove(paths[0])
+    summary = reanalyze_corpus(["t0.pdf"], workers=1, upload_folder=str(folder))
+    assert summary["processed"] == 1 and summary["failed"] == 0
+
+
+def test_replaced_pdf_is_not_used_for_reextraction(corpus, fake_qa, thesis_pdf):
+    folder, paths = corpus
+    pdf_hash = latest("t0.pdf")["pdf_hash"]
+    # Extracción perdida (o de otra versión) y uploads/t0.pdf pisado por otro documento
+    shutil.rmtree(artifacts.ARTIFACTS_FOLDER)
+    shutil.copy(thesis_pdf("otro.pdf", seed=7), paths[0])
+    summary = reanalyze_corpus(["t0.pdf"], workers=1, upload_folder=str(folder))
+    assert summary["processed"] == 0 and summary["failed"] == 1
+    assert "no corresponde" in summary["failures"][0]["error"]
+    assert latest("t0.pdf")["pdf_hash"] == pdf_hash
+    with pytest.raises(ValueError):
+        reanalyze(pdf_hash, paths[0])
+
+
+def test_matching_pdf_is_reextracted(corpus, fake_qa):
+    folder, _ = corpus
+    shutil.rmtree(artifacts.ARTIFACTS_FOLDER)
+    summary = reanalyze_corpus(["t1.pdf"], workers=1, upload_folder=str(folder))
+    assert summary["processed"] == 1
+    assert "extraction" in latest("t1.pdf")["metrics"]["tags"]["recomputed"]
@@ -0,0 +1,43 @@
+import threading
+
+import retrieval
+from retrieval import get_passage_index, split_passages
+
+
+def page(number, text):
+    return {"page": number, "text": text, "images": []}
+
+
+def test_search_ranks_relevant_passage():
+    pages = [page(1, "La cooperativa de ahorro.\n\nEl problema general es la morosidad."), page(2, "Anexos")]
+    index = get_passage_index("doc", pages)
+    assert index.search("problema general")[0]["page"] == 1
+    assert get_passage_index("doc", []) is index
+
+
+def test_split_passages_respects_max_chars():
+    passages = split_passages([page(1, "a" * 25 + "\n\n" + "b" * 5)], max_chars=10)
+    assert [p["text"] for p in passages] == ["a" * 10, "a" * 10, "a" * 5, "b" * 5]
+
+
+def test_concurrent_lookups_keep_lru_consistent(monkeypatch):
+    monkeypatch.setattr(retrieval, "INDEX_CACHE_SIZE", 4)
+    retrieval.clear_passage_indexes()
+    pages = [page(1, "texto de prueba")]
+    errors = []
+
+    def worker(offset):
+        try:
+            for i in range(100):
+                get_passage_index(f"doc{(i + offset) % 9}", pages)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(retrieval._indexes) <= 4
+    retrieval.clear_passage_indexes()
@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import pytest
+
+import app as backend
+import search_index
+from db import save_consulta
+from search_index import fts_query, rebuild, search
+
+
+@pytest.fixture(autouse=True)
+def index_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "search.sqlite3")
+    monkeypatch.setattr(search_index, "SEARCH_INDEX_PATH", path)
+    return path
+
+
+def save(name, titulo, asesor="No identificado", user_id="u1", **fields):
+    save_consulta(name, {"Título de la tesis": titulo, "Asesor": asesor, **fields}, [], user_id, f"hash_{name}")
+
+
+def names(response):
+    return [doc["pdf_name"] for doc in response["results"]]
+
+
+def test_fts_query_escapes_user_text():
+    assert fts_query('economía "principios cooperativos" OR eco* ab*') == \
+        '"economía" "principios cooperativos" "OR" "eco"* "ab"'
+    assert fts_query("* **") == ""
+
+
+def test_ranking_filters_and_accents():
+    save("a.pdf", "Principios cooperativos y financiamiento", asesor="Dra. Rojas")
+    save("b.pdf", "Impuesto predial en Uchiza", **{"Línea de investigación": "finanzas cooperativas"})
+    save("c.pdf", "Gestión tributaria", asesor="Dr. Pérez", user_id="u2")
+    assert names(search("cooperativ*")) == ["a.pdf", "b.pdf"]
+    assert names(search("gestion")) == ["c.pdf"]
+    assert names(search(filters={"asesor": "perez"})) == ["c.pdf"]
+    assert names(search(user_id="u1")) == ["b.pdf", "a.pdf"]
+    assert search("financiamiento")["results"][0]["snippet"].count("[financiamiento]") == 1
+    with pytest.raises(ValueError):
+        search(filters={"desconocida": "x"})
+
+
+def test_reindex_replaces_document_and_pages():
+    save("a.pdf", "Título viejo")
+    save("a.pdf", "Título nuevo")
+    assert search()["total"] == 1
+    assert names(search("nuevo")) == ["a.pdf"] and search("viejo")["total"] == 0
+    for i in range(5):
+        save(f"p{i}.pdf", "Tesis de prueba")
+    page = search("prueba", page=2, per_page=2)
+    assert page["total"] == 5 and len(page["results"]) == 2
+
+
+def test_date_range_and_rebuild(index_path):
+    save("a.pdf", "Principios cooperativos")
+    assert search(desde=datetime(2000, 1, 1), hasta=datetime.now())["total"] == 1
+    assert search(hasta=datetime(2000, 1, 1))["total"] == 0
+    assert rebuild(index_path) == 1
+    assert names(search("principios")) == ["a.pdf"]
+
+
+def test_search_endpoint_validates_input():
+    client = backend.app.test_client()
+    assert client.get("/search?desde=ayer").status_code == 400
+    assert client.get("/search?page=uno").status_code == 400
+    save("a.pdf", "Principios cooperativos")
+    assert client.get("/search?titulo=principios").get_json()["total"] == 1
@@ -0,0 +1,67 @@
+import pytest
+
+from spelling import PREFIX_MARKER, SpellingChecker, load_dictionary
+
+DICTIONARY = load_dictionary()
+SUFFIXES = ["", "o", "a", "os", "as"]
+
+
+def baseline_corrections(text, pairs):
+    # Búsqueda original de process_pdf: subcadena del texto en minúsculas por cada entrada
+    lowered = text.lower()
+    return {correction for mistake, correction in pairs.items() if mistake.rstrip(PREFIX_MARKER) in lowered}
+
+
+def dictionary_corpus(pairs):
+    # Cada entrada como palabra suelta (o, si es raíz, con terminaciones), en varias posiciones
+    for mistake in pairs:
+        word = mistake.rstrip(PREFIX_MARKER)
+        for suffix in SUFFIXES if mistake.endswith(PREFIX_MARKER) else [""]:
+            for template in ("{}", "El {} de la cooperativa.", "({}),", "{}: resultados", "EN {} Y"):
+                yield template.format(word + suffix)
+                yield template.format((word + suffix).capitalize())
+
+
+@pytest.mark.parametrize("text", list(dictionary_corpus(DICTIONARY)))
+def test_matches_baseline_over_dictionary(text):
+    checker = SpellingChecker(DICTIONARY)
+    assert {match[3] for match in checker.find(text)} == baseline_corrections(text, DICTIONARY)
+
+
+def test_stem_entries_report_whole_word():
+    checker = SpellingChecker(DICTIONARY)
+    assert DICTIONARY["finacier*"] == "financiero"
+    (start, end, mistake, correction, _), = checker.find("El análisis finaciero del periodo")
+    assert (mistake, correction) == ("finaciero", "financiero")
+    assert "El análisis finaciero del periodo"[start:end] == "finaciero"
+    # Una raíz solo se busca al comienzo de una palabra
+    assert checker.find("refinaciero") == []
+
+
+def test_whole_words_only():
+    checker = SpellingChecker({"analisis": "análisis", "retaso": "retraso"})
+    assert checker.find("psicoanalisis y retasos") == []
+    assert [match[2] for match in checker.find("analisis, retaso; ANALISIS")] == ["analisis", "retaso", "analisis"]
+
+
+def test_missing_accent_observation():
+    checker = SpellingChecker(DICTIONARY)
+    observations = checker.observations("La hipotesis y el desarollo", 3)
+    assert [observation["error"] for observation in observations] == [
+        "Falta tilde: 'hipotesis' debería ser 'hipótesis'",
+        "Error ortográfico: 'desarollo' debería ser 'desarrollo'"
+    ]
+    assert {observation["type"] for observation in observations} == {"Ortográfico"}
+    assert all(observation["page"] == 3 for observation in observations)
+
+
+def test_identity_entries_are_dropped(tmp_path):
+    path = tmp_path / "dic.tsv"
+    path.write_text("# comentario\ndesfinanciamiento\tdesfinanciamiento\nescaza\tescasa\n", encoding="utf-8")
+    assert load_dictionary(str(path)) == {"escaza": "escasa"}
+
+
+def test_valid_verb_forms_are_not_flagged():
+    # "practica" y "numero" también son formas verbales correctas
+    checker = SpellingChecker(DICTIONARY)
+    assert checker.find("El socio practica el ahorro y numero las páginas") == []
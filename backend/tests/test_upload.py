@@ -0,0 +1,93 @@
+import io
+import threading
+
+import pytest
+
+import app as backend
+from db import get_db
+from upload_store import stored_pdf_path
+
+CORRUPT_PDF = b"%PDF-1.4\n" + b"no es un PDF de verdad\n" * 20
+
+
+@pytest.fixture
+def client():
+    return backend.app.test_client()
+
+
+def upload(client, data, name):
+    return client.post("/upload", data={"file": (io.BytesIO(data), name)})
+
+
+def test_duplicate_upload_returns_stored_analysis(client, thesis_pdf, fake_qa):
+    data = open(thesis_pdf(), "rb").read()
+    first = upload(client, data, "a.pdf").get_json()
+    assert "duplicate" not in first
+    asked = len(fake_qa)
+    second = upload(client, data, "b.pdf").get_json()
+    assert second["duplicate"] is True
+    assert second["results"] == first["results"]
+    assert second["pdf_name"] == "b.pdf"
+    assert len(fake_qa) == asked
+    assert get_db()["consultas"].count_documents({}) == 1
+
+
+def test_failed_analysis_is_not_reused(client):
+    first = upload(client, CORRUPT_PDF, "roto.pdf").get_json()
+    assert "duplicate" not in first
+    consulta = get_db()["consultas"].find_one()
+    assert consulta["metrics"]["errors"][0]["stage"] == "extraction"
+
+    second = upload(client, CORRUPT_PDF, "roto.pdf").get_json()
+    assert "duplicate" not in second
+    # El análisis fallido se reemplaza por una consulta nueva con otro _id,
+    # así las respuestas cacheadas con la clave de la fallida no se reutilizan
+    consultas = list(get_db()["consultas"].find())
+    assert len(consultas) == 1
+    assert consultas[0]["_id"] != consulta["_id"]
+    assert consultas[0]["timestamp"] > consulta["timestamp"]
+
+
+def test_upload_database_error_returns_json(client, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("mongo caído")
+
+    monkeypatch.setattr(backend, "save_archivo", broken)
+    response = upload(client, CORRUPT_PDF, "roto.pdf")
+    assert response.status_code == 500
+    assert "mongo caído" in response.get_json()["error"]
+
+
+def test_concurrent_uploads_analyze_once(thesis_pdf, fake_qa, monkeypatch):
+    pdf_path = thesis_pdf()
+    data = open(pdf_path, "rb").read()
+    calls = []
+    process_pdf = backend.process_pdf
+
+    def counting_process_pdf(*args, **kwargs):
+        calls.append(args[0])
+        return process_pdf(*args, **kwargs)
+
+    monkeypatch.setattr(backend, "process_pdf", counting_process_pdf)
+    responses = []
+
+    def run(name):
+        responses.append(upload(backend.app.test_client(), data, name).get_json())
+
+    threads = [threading.Thread(target=run, args=(f"t{i}.pdf",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(bool(response.get("duplicate")) for response in responses) == [False, True, True]
+    assert get_db()["consultas"].count_documents({}) == 1
+
+
+def test_upload_is_stored_by_content(client):
+    response = client.post("/upload?filename=x.pdf", data=b"hola", content_type="application/pdf")
+    assert response.status_code == 400
+    response = upload(client, CORRUPT_PDF, "../../fuera.pdf").get_json()
+    assert response["pdf_name"] == "fuera.pdf"
+    archivo = get_db()["archivos"].find_one({"pdf_name": "fuera.pdf"})
+    assert open(stored_pdf_path(archivo["pdf_hash"], backend.UPLOAD_FOLDER), "rb").read() == CORRUPT_PDF
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from db import archivo_hash
+
+# PDFs subidos, guardados por contenido: uploads/<2 primeros caracteres del hash>/<hash>.pdf.
+# El nombre original se asocia al hash en MongoDB (colección "archivos"); los PDFs subidos
+# antes de este esquema siguen en uploads/<nombre>.
+UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", "uploads")
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# La cabecera %PDF- puede aparecer dentro del primer KB del archivo
+PDF_HEADER = b"%PDF-"
+PDF_HEADER_WINDOW = 1024
+
+
+def stored_pdf_path(pdf_hash, folder=UPLOAD_FOLDER):
+    """Ruta de un PDF en el almacén, repartida en subcarpetas por prefijo del hash."""
+    return os.path.join(folder, pdf_hash[:2], f"{pdf_hash}.pdf")
+
+
+def store_stream(stream, folder=UPLOAD_FOLDER, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Copiar un stream al almacén por bloques calculando su SHA-256 al mismo tiempo.
+
+    El contenido se escribe en un archivo temporal de la misma carpeta y se mueve a su ruta
+    final solo si no estaba ya guardado, así que una subida repetida o interrumpida nunca
+    pisa un PDF existente. Devuelve (hash, ruta, bytes); lanza ValueError si no es un PDF.
+    """
+    os.makedirs(folder, exist_ok=True)
+    sha = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(suffix=".part", dir=folder)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                if not size and PDF_HEADER not in chunk[:PDF_HEADER_WINDOW]:
+                    raise ValueError("El archivo no es un PDF")
+                sha.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        if not size:
+            raise ValueError("El archivo está vacío")
+        pdf_hash = sha.hexdigest()
+        pdf_path = stored_pdf_path(pdf_hash, folder)
+        if os.path.exists(pdf_path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+            os.replace(temp_path, pdf_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return pdf_hash, pdf_path, size
+
+
+_hash_locks = {}
+_hash_locks_lock = threading.Lock()
+
+
+@contextmanager
+def hash_lock(pdf_hash):
+    """Lock por contenido dentro del proceso: dos subidas del mismo PDF no lo analizan a la vez."""
+    with _hash_locks_lock:
+        lock, users = _hash_locks.get(pdf_hash, (threading.Lock(), 0))
+        _hash_locks[pdf_hash] = (lock, users + 1)
+    try:
+        with lock:
+            yield
+    finally:
+        with _hash_locks_lock:
+            lock, users = _hash_locks[pdf_hash]
+            if users == 1:
+                del _hash_locks[pdf_hash]
+            else:
+                _hash_locks[pdf_hash] = (lock, users - 1)
+
+
+def resolve_pdf_path(pdf_name, pdf_hash=None, folder=UPLOAD_FOLDER):
+    """Ruta del PDF de un documento: la del almacén por hash (dado o buscado por nombre) o uploads/<nombre>."""
+    pdf_hash = pdf_hash or archivo_hash(pdf_name)
+    if pdf_hash:
+        pdf_path = stored_pdf_path(pdf_hash, folder)
+        if os.path.exists(pdf_path):
+            return pdf_path
+    return os.path.join(folder, os.path.basename(pdf_name))